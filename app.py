@@ -1,25 +1,59 @@
-from flask import Flask,request,jsonify,render_template,url_for
+from flask import Flask,request,jsonify,render_template,url_for,Response,stream_with_context
 import pickle
 import pandas as pd
 import numpy as np
-import dill
-from sales.util import read_yaml_file
+from sales.util import get_input_schema,InvalidInputError
 import os
 from sales.constant import *
+from sales.config import Configuration
+from sales.serving.batch_predictor import BatchPredictor,InvalidBatchRequest,NDJSON_CONTENT_TYPES
+from sales.serving.micro_batcher import MicroBatcher
+from sales.serving.model_registry import ModelRegistry,ModelNotLoadedError,NoPreviousVersionError
+from sales.serving.worker_memory import get_memory_report,format_memory_report
 
-MODEL_DIR='saved_models'
-MODEL_FILE_LIST=[eval(i) for i in os.listdir(os.path.join(MODEL_DIR))]
-MODEL_FILE_DIR=os.path.join(MODEL_DIR,str(max(MODEL_FILE_LIST)))
-MODEL_FILE_NAME=os.listdir(MODEL_FILE_DIR)[0]
+serving_config=Configuration().get_model_serving_config()
 
-MODEL_FILE_PATH=os.path.join(MODEL_FILE_DIR,MODEL_FILE_NAME)
+model_registry=ModelRegistry(model_dir=serving_config.model_dir,
+                             model_file_name=serving_config.model_file_name,
+                             poll_interval_s=serving_config.model_poll_interval_s,
+                             warmup_file_path=serving_config.warmup_file_path,
+                             warmup_rows=serving_config.warmup_rows,
+                             compiled_model_enabled=serving_config.compiled_model_enabled,
+                             model_mmap_mode=serving_config.model_mmap_mode,
+                             schema_file_path=serving_config.schema_file_path)
+model_registry.refresh()
 
-print(F'MODEL_FILE_PATH:{MODEL_FILE_PATH}')
+print(F'MODEL_FILE_PATH:{model_registry.active.model_file_path if model_registry.active else None}')
 
 app=Flask(__name__)
+app.config['MAX_CONTENT_LENGTH']=serving_config.batch_max_payload_bytes
 
-with open(MODEL_FILE_PATH,'rb') as obj_file:
-    model=dill.load(obj_file)
+batch_predictor=BatchPredictor(schema_file_path=serving_config.schema_file_path,
+                               chunk_size=serving_config.batch_chunk_size,
+                               max_rows=serving_config.batch_max_rows)
+
+micro_batcher=None
+if serving_config.micro_batch_enabled:
+    micro_batcher=MicroBatcher(predict_fn=lambda data:model_registry.get_predictor().predict(get_input_schema(schema_file_path=serving_config.schema_file_path).cast(data=data)),
+                               max_batch_size=serving_config.micro_batch_max_size,
+                               max_wait_ms=serving_config.micro_batch_max_wait_ms)
+
+@app.before_request
+def start_model_watcher():
+    model_registry.start_watcher()
+
+@app.errorhandler(InvalidInputError)
+def invalid_input(error):
+    return jsonify({'error':str(error)}),400
+
+@app.errorhandler(ModelNotLoadedError)
+def model_not_loaded(error):
+    # the watcher loads the first version exported to model_dir
+    return jsonify({'error':str(error)}),503,{'Retry-After':str(int(serving_config.model_poll_interval_s))}
+
+@app.errorhandler(NoPreviousVersionError)
+def no_previous_version(error):
+    return jsonify({'error':str(error)}),409
 
 @app.route('/')
 def home():
@@ -29,24 +63,73 @@ def home():
 def predict_api():
     data=request.json['data']
     print('data')
-    new_data=pd.DataFrame(dict(data),index=[0])
-    output=model.predict(new_data)[0]
+    input_schema=get_input_schema(schema_file_path=serving_config.schema_file_path)
+    if micro_batcher is not None:
+        # columns are checked per request, dtypes are cast once per coalesced batch
+        input_schema.validate_columns(columns=list(dict(data).keys()))
+        output=micro_batcher.predict(record=dict(data))
+        return jsonify(output)
+    compiled_model=model_registry.get_compiled_model()
+    if compiled_model is not None:
+        # single rows skip the DataFrame and the sklearn pipeline entirely
+        input_schema.validate_columns(columns=list(dict(data).keys()))
+        output=compiled_model.predict(dict(data))[0]
+        return jsonify(output)
+    new_data=input_schema.to_frame(records=dict(data))
+    output=model_registry.get_model().predict(new_data)[0]
     return jsonify(output)
 
+@app.route('/micro_batch_stats',methods=['GET'])
+def micro_batch_stats():
+    if micro_batcher is None:
+        return jsonify({'enabled':False})
+    return jsonify(dict(enabled=True,**micro_batcher.stats()))
+
+@app.route('/model_version',methods=['GET'])
+def model_version():
+    return jsonify(model_registry.status())
+
+@app.route('/model_rollback',methods=['POST'])
+def model_rollback():
+    # checked under the registry lock, a concurrent swap cannot slip in between
+    model_registry.rollback()
+    return jsonify(model_registry.status())
+
+@app.route('/worker_memory',methods=['GET'])
+def worker_memory():
+    # under gunicorn the parent is the master and its children are the workers
+    if os.environ.get('SERVER_SOFTWARE','').startswith('gunicorn'):
+        report=get_memory_report(master_pid=os.getppid())
+    else:
+        report=get_memory_report(master_pid=os.getpid(),worker_pids=[])
+    return jsonify({'pid':os.getpid(),'processes':[memory._asdict() for memory in report],
+                    'summary':format_memory_report(report=report)})
+
+@app.route('/predict_batch',methods=['POST'])
+def predict_batch():
+    # the whole batch is scored by the version active when it arrived
+    model=model_registry.get_model()
+    try:
+        data=batch_predictor.read_batch(body=request.get_data(),content_type=request.mimetype)
+        # errors after this point could only cut the streamed 200 response short
+        first_predictions=batch_predictor.score_first_chunk(model=model,data=data)
+    except InvalidBatchRequest as e:
+        return jsonify({'error':str(e)}),400
+    if request.accept_mimetypes.best in NDJSON_CONTENT_TYPES:
+        return Response(stream_with_context(batch_predictor.stream_ndjson(model=model,data=data,first_predictions=first_predictions)),
+                        mimetype=request.accept_mimetypes.best)
+    return Response(stream_with_context(batch_predictor.stream_json(model=model,data=data,first_predictions=first_predictions)),
+                    mimetype='application/json')
+
 @app.route('/predict',methods=['POST'])
 def predict():
     k1=list(request.form.keys())
     v1=list(request.form.values())
-    CONFIG_DIR='config'
-    SCHEMA_FILE_NAME='schema.yaml'
-    schema=read_yaml_file(file_path=os.path.join(CONFIG_DIR,SCHEMA_FILE_NAME))
-    schema_data=schema[COLUMNS]
-    target_columns=schema[TARGET_COLUMNS]
-    del schema_data[target_columns]
-    data=pd.DataFrame(dict(zip(k1,v1)),index=[0])
-    for col in schema_data.keys():
-        data[col]=data[col].astype(schema_data[col])
-    output=model.predict(data)[0]
+    try:
+        data=get_input_schema(schema_file_path=serving_config.schema_file_path).to_frame(records=dict(zip(k1,v1)))
+    except InvalidInputError as e:
+        return render_template('home.html', prediction_text="Invalid input: {}".format(e))
+    output=model_registry.get_model().predict(data)[0]
     print('output:',output)
     return render_template('home.html', prediction_text="The Sales is  {}".format(output))
 
@@ -0,0 +1,187 @@
+"""
+ASGI entry point serving the same /predict_api contract as app.py.
+
+uvicorn asgi:app --host 0.0.0.0 --port 8000 --timeout-keep-alive 30
+
+The event loop only parses requests and writes responses; predict runs on a
+bounded pool (asgi_executor, asgi_max_workers in model_serving_config). Beyond
+asgi_max_pending requests in flight, new requests get 503 with Retry-After
+instead of queueing without bound. Keep-alive and pipelined requests on one
+connection are handled by the server (uvicorn answers them in order).
+"""
+import os
+import json
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor,ProcessPoolExecutor
+from sales.logger import logging
+from sales.util import get_input_schema,InvalidInputError
+from sales.config import Configuration
+from sales.serving.model_registry import ModelRegistry,ModelNotLoadedError
+
+ASGI_EXECUTORS=['thread','process']
+
+serving_config=Configuration().get_model_serving_config()
+if serving_config.asgi_executor not in ASGI_EXECUTORS:
+    raise ValueError(f'asgi_executor must be one of {ASGI_EXECUTORS}, got [{serving_config.asgi_executor}]')
+
+model_registry=ModelRegistry(model_dir=serving_config.model_dir,
+                             model_file_name=serving_config.model_file_name,
+                             poll_interval_s=serving_config.model_poll_interval_s,
+                             warmup_file_path=serving_config.warmup_file_path,
+                             warmup_rows=serving_config.warmup_rows,
+                             compiled_model_enabled=serving_config.compiled_model_enabled,
+                             model_mmap_mode=serving_config.model_mmap_mode,
+                             schema_file_path=serving_config.schema_file_path)
+# loaded at import, so forked process pool workers start with the model
+model_registry.refresh()
+
+
+def predict_record(record:dict):
+    """
+    One /predict_api record to one prediction; module level so process pool
+    workers can run it. Runs off the event loop.
+    """
+    input_schema=get_input_schema(schema_file_path=serving_config.schema_file_path)
+    compiled_model=model_registry.get_compiled_model()
+    if compiled_model is not None:
+        # single rows skip the DataFrame and the sklearn pipeline entirely
+        input_schema.validate_columns(columns=list(record.keys()))
+        return compiled_model.predict(record)[0]
+    return model_registry.get_model().predict(input_schema.to_frame(records=record))[0]
+
+
+def start_predict_worker():
+    # threads do not survive fork, each pool process polls for new versions itself
+    model_registry.start_watcher()
+
+
+class ServingState:
+
+    def __init__(self)->None:
+        self.executor=None
+        self.pending=0
+        self.completed=0
+        self.rejected=0
+
+    def get_executor(self):
+        if self.executor is None:
+            if serving_config.asgi_executor=='process':
+                self.executor=ProcessPoolExecutor(max_workers=serving_config.asgi_max_workers,
+                                                  mp_context=multiprocessing.get_context('fork'),
+                                                  initializer=start_predict_worker)
+            else:
+                self.executor=ThreadPoolExecutor(max_workers=serving_config.asgi_max_workers,
+                                                 thread_name_prefix='predict')
+        return self.executor
+
+    def stats(self)->dict:
+        return {'executor':serving_config.asgi_executor,
+                'max_workers':serving_config.asgi_max_workers,
+                'max_pending':serving_config.asgi_max_pending,
+                'pending':self.pending,
+                'completed':self.completed,
+                'rejected':self.rejected}
+
+
+state=ServingState()
+
+
+def to_json(payload)->bytes:
+    # NumPy scalars from predict
+    return json.dumps(payload,default=lambda value:value.tolist() if hasattr(value,'tolist') else str(value)).encode()
+
+
+async def send_json(send,status:int,payload,headers:list=None):
+    body=to_json(payload)
+    await send({'type':'http.response.start',
+                'status':status,
+                'headers':[(b'content-type',b'application/json'),
+                           (b'content-length',str(len(body)).encode())]+(headers or [])})
+    await send({'type':'http.response.body','body':body})
+
+
+async def read_body(receive,max_bytes:int)->bytes:
+    """
+    return: the request body, None when it is larger than max_bytes
+    """
+    chunks=[]
+    size=0
+    while True:
+        message=await receive()
+        if message['type']=='http.disconnect':
+            raise ConnectionError('Client disconnected')
+        chunk=message.get('body',b'')
+        size+=len(chunk)
+        if size>max_bytes:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body',False):
+            return b''.join(chunks)
+
+
+async def predict_api(receive,send):
+    if state.pending>=serving_config.asgi_max_pending:
+        state.rejected+=1
+        await send_json(send,503,{'error':'Server is at capacity, retry later'},headers=[(b'retry-after',b'1')])
+        return
+    state.pending+=1
+    try:
+        body=await read_body(receive,max_bytes=serving_config.batch_max_payload_bytes)
+        if body is None:
+            await send_json(send,413,{'error':'Request body too large'})
+            return
+        try:
+            record=dict(json.loads(body)['data'])
+        except (ValueError,KeyError,TypeError) as e:
+            await send_json(send,400,{'error':f'Expected a JSON object with a "data" record: {e}'})
+            return
+        try:
+            output=await asyncio.get_running_loop().run_in_executor(state.get_executor(),predict_record,record)
+        except InvalidInputError as e:
+            await send_json(send,400,{'error':str(e)})
+            return
+        except ModelNotLoadedError as e:
+            # the watcher loads the first version exported to model_dir
+            await send_json(send,503,{'error':str(e)},
+                            headers=[(b'retry-after',str(int(serving_config.model_poll_interval_s)).encode())])
+            return
+        state.completed+=1
+        await send_json(send,200,output)
+    finally:
+        state.pending-=1
+
+
+async def lifespan(receive,send):
+    while True:
+        message=await receive()
+        if message['type']=='lifespan.startup':
+            model_registry.start_watcher()
+            logging.info(f'ASGI serving started: {state.stats()}')
+            await send({'type':'lifespan.startup.complete'})
+        elif message['type']=='lifespan.shutdown':
+            if state.executor is not None:
+                state.executor.shutdown(wait=False,cancel_futures=True)
+            await send({'type':'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope,receive,send):
+    if scope['type']=='lifespan':
+        await lifespan(receive,send)
+        return
+    if scope['type']!='http':
+        return
+
+    path,method=scope['path'],scope['method']
+    if path=='/predict_api':
+        if method!='POST':
+            await send_json(send,405,{'error':'Method not allowed'})
+            return
+        await predict_api(receive,send)
+    elif path=='/model_version' and method=='GET':
+        await send_json(send,200,model_registry.status())
+    elif path=='/serving_stats' and method=='GET':
+        await send_json(send,200,state.stats())
+    else:
+        await send_json(send,404,{'error':f'No route for [{method} {path}]'})
@@ -0,0 +1,64 @@
+"""
+Compares HousingEstimatorModel.predict with the compiled NumPy plan on single
+records and small batches, and checks that both give the same predictions.
+
+python benchmark/compiled_model.py --model saved_models/<version>/model.pkl --data <ingested test csv>
+"""
+import os,sys
+import json
+import time
+import argparse
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sales.util import load_object,get_input_schema
+from sales.serving.compiled_model import compile_model
+import pandas as pd
+import numpy as np
+
+
+def time_calls(fn,inputs:list,repeat:int)->float:
+    start=time.perf_counter()
+    for _ in range(repeat):
+        for item in inputs:
+            fn(item)
+    return (time.perf_counter()-start)/(repeat*len(inputs))
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--model',required=True)
+    parser.add_argument('--data',required=True)
+    parser.add_argument('--schema',default=os.path.join('config','schema.yaml'))
+    parser.add_argument('--rows',type=int,default=200)
+    parser.add_argument('--repeat',type=int,default=3)
+    parser.add_argument('--tolerance',type=float,default=1e-6)
+    args=parser.parse_args()
+
+    model=load_object(file_path=args.model)
+    start=time.perf_counter()
+    compiled_model=compile_model(model=model)
+    print(f'compile time: {(time.perf_counter()-start)*1000:.2f} ms')
+
+    input_schema=get_input_schema(schema_file_path=args.schema)
+    data=input_schema.cast(data=pd.read_csv(args.data,nrows=args.rows))
+    records=json.loads(data.to_json(orient='records'))
+
+    expected=model.predict(data)
+    actual=compiled_model.predict(data)
+    max_diff=float(np.max(np.abs(expected-actual)))
+    print(f'max abs difference over {len(data)} rows: {max_diff:.3e} (tolerance {args.tolerance})')
+
+    print(f"{'batch size':>10} {'predict ms':>12} {'compiled ms':>12} {'speedup':>8}")
+    for batch_size in [1,8,64]:
+        frames=[data.iloc[start:start+batch_size] for start in range(0,len(data),batch_size)]
+        batches=[records[start:start+batch_size] for start in range(0,len(records),batch_size)]
+        predict_time=time_calls(model.predict,frames,args.repeat)
+        # the compiled plan takes the raw records, no DataFrame is built
+        compiled_time=time_calls(compiled_model.predict,batches if batch_size>1 else [batch[0] for batch in batches],args.repeat)
+        print(f'{batch_size:>10} {predict_time*1000:>12.3f} {compiled_time*1000:>12.3f} {predict_time/compiled_time:>7.1f}x')
+
+    if max_diff>args.tolerance:
+        sys.exit(1)
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Writes the same sales rows as csv, gzip csv and (with pyarrow) Parquet shards and
+as a SQLite table, reads each back through sales.data_source and prints rows/s
+and bytes/s per source.
+
+python benchmark/data_sources.py --data <ingested data.csv> --rows 2000000 --shards 16 --n-jobs 1 4
+"""
+import os,sys
+import argparse
+import sqlite3
+import tempfile
+import importlib.util
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sales.data_source import FileDataSource,SQLDataSource
+import pandas as pd
+import numpy as np
+
+
+def make_data(file_path:str,n_rows:int)->pd.DataFrame:
+    data=pd.read_csv(file_path)
+    return data.iloc[np.arange(n_rows)%len(data)].reset_index(drop=True)
+
+
+def write_shards(data:pd.DataFrame,shard_dir:str,n_shards:int,suffix:str):
+    os.makedirs(shard_dir,exist_ok=True)
+    for index,shard in enumerate(np.array_split(np.arange(len(data)),n_shards)):
+        file_path=os.path.join(shard_dir,f'part-{index:05d}{suffix}')
+        if suffix=='.parquet':
+            data.iloc[shard].to_parquet(file_path,index=False)
+        else:
+            data.iloc[shard].to_csv(file_path,index=False)
+
+
+def print_report(report,n_jobs):
+    print(f'{report.source:>48} {str(n_jobs):>6} {report.n_shards:>7} {report.rows:>10} {report.seconds:>8.2f} '
+          f'{report.rows_per_s:>12.0f} {report.bytes_per_s/2**20:>10.1f}')
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--data',required=True)
+    parser.add_argument('--rows',type=int,default=2_000_000)
+    parser.add_argument('--shards',type=int,default=16)
+    parser.add_argument('--n-jobs',type=int,nargs='+',default=[1,-1])
+    parser.add_argument('--batch-size',type=int,default=50000)
+    args=parser.parse_args()
+
+    data=make_data(file_path=args.data,n_rows=args.rows)
+    suffixes=['.csv','.csv.gz']
+    if importlib.util.find_spec('pyarrow') is not None:
+        suffixes.append('.parquet')
+
+    print(f"{'source':>48} {'n_jobs':>6} {'shards':>7} {'rows':>10} {'s':>8} {'rows/s':>12} {'MB/s':>10}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for suffix in suffixes:
+            shard_dir=os.path.join(temp_dir,suffix.strip('.').replace('.','_'))
+            write_shards(data=data,shard_dir=shard_dir,n_shards=args.shards,suffix=suffix)
+            for n_jobs in args.n_jobs:
+                data_source=FileDataSource(path=shard_dir,n_jobs=n_jobs)
+                data_source.read()
+                print_report(report=data_source.report(),n_jobs=n_jobs)
+
+        database_path=os.path.join(temp_dir,'sales.db')
+        with sqlite3.connect(database_path) as connection:
+            data.to_sql('sales',connection,index=False,chunksize=args.batch_size)
+        data_source=SQLDataSource(connection=f'sqlite:///{database_path}',table='sales',batch_size=args.batch_size)
+        data_source.read()
+        print_report(report=data_source.report(),n_jobs='-')
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Times the native drift tests (sales.drift) on synthetic reference/current
+frames with the shape of the sales schema, and the evidently Profile +
+Dashboard on the same frames when evidently is installed.
+
+python benchmark/drift.py --rows 10000000 --sample-rows 100000
+"""
+import os,sys
+import time
+import argparse
+import tempfile
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sales.drift import compute_drift,write_json_report,write_html_report
+import pandas as pd
+import numpy as np
+
+CATEGORIES={
+    'Item_Fat_Content':['Low Fat','Regular'],
+    'Item_Type':['Dairy','Soft Drinks','Meat','Fruits and Vegetables','Household','Baking Goods','Snack Foods','Frozen Foods'],
+    'Outlet_Size':['Small','Medium','High'],
+    'Outlet_Location_Type':['Tier 1','Tier 2','Tier 3'],
+    'Outlet_Type':['Grocery Store','Supermarket Type1','Supermarket Type2','Supermarket Type3'],
+}
+
+
+def make_data(n_rows:int,shift:float,random_state:int)->pd.DataFrame:
+    rng=np.random.default_rng(random_state)
+    data={
+        'Item_Weight':rng.normal(12.8+shift,4.6,n_rows),
+        'Item_Visibility':rng.gamma(2.0,0.033,n_rows),
+        'Item_MRP':rng.uniform(31,267,n_rows)+shift,
+        'Outlet_Establishment_Year':rng.integers(1985,2010,n_rows),
+        'Item_Outlet_Sales':rng.lognormal(7.5,0.9,n_rows),
+    }
+    for col,categories in CATEGORIES.items():
+        data[col]=pd.Categorical.from_codes(rng.integers(0,len(categories),n_rows),categories=categories).astype(object)
+    return pd.DataFrame(data)
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--rows',type=int,default=10_000_000)
+    parser.add_argument('--sample-rows',type=int,default=None)
+    parser.add_argument('--shift',type=float,default=0.1)
+    parser.add_argument('--categorical-method',default='chi2')
+    args=parser.parse_args()
+
+    reference=make_data(n_rows=args.rows,shift=0.0,random_state=0)
+    current=make_data(n_rows=args.rows,shift=args.shift,random_state=1)
+    numerical_columns=[col for col in reference.columns if col not in CATEGORIES]
+    categorical_columns=list(CATEGORIES)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        start=time.perf_counter()
+        drift_report=compute_drift(reference=reference,current=current,
+                                   numerical_columns=numerical_columns,categorical_columns=categorical_columns,
+                                   categorical_method=args.categorical_method,sample_size=args.sample_rows)
+        compute_time=time.perf_counter()-start
+        write_json_report(drift_report=drift_report,file_path=os.path.join(temp_dir,'report.json'))
+        write_html_report(drift_report=drift_report,file_path=os.path.join(temp_dir,'report.html'))
+        native_time=time.perf_counter()-start
+        print(f"native     rows {args.rows:>10} sample {str(args.sample_rows):>8} compute {compute_time:>8.2f}s "
+              f"reports {native_time:>8.2f}s drifted {drift_report['n_drifted_columns']}/{drift_report['n_columns']}")
+
+        try:
+            from evidently.model_profile import Profile
+            from evidently.model_profile.sections import DataDriftProfileSection
+            from evidently.dashboard import Dashboard
+            from evidently.dashboard.tabs import DataDriftTab
+        except ImportError:
+            print('evidently   not installed, skipped')
+            return
+
+        if args.sample_rows is not None:
+            reference=reference.sample(n=min(args.sample_rows,len(reference)),random_state=0)
+            current=current.sample(n=min(args.sample_rows,len(current)),random_state=0)
+        start=time.perf_counter()
+        profile=Profile(sections=[DataDriftProfileSection()])
+        profile.calculate(reference,current)
+        profile.json()
+        dashboard=Dashboard(tabs=[DataDriftTab()])
+        dashboard.calculate(reference,current)
+        dashboard.save(os.path.join(temp_dir,'evidently.html'))
+        print(f"evidently  rows {args.rows:>10} sample {str(args.sample_rows):>8} reports {time.perf_counter()-start:>8.2f}s")
+
+
+if __name__=='__main__':
+    main()
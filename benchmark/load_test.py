@@ -0,0 +1,152 @@
+"""
+Closed-loop HTTP/1.1 load test of /predict_api: --connections keep-alive
+connections each send --pipeline requests back to back, wait for their
+responses and repeat until --duration seconds have passed. Prints throughput,
+p50/p99 latency and the status code counts (503 is the ASGI backpressure) per
+target. Servers that close the connection after a response (the Flask
+development server) are reconnected, and that cost is part of the latency.
+
+python app.py &                                   # Flask, port 5000
+uvicorn asgi:app --port 8000 &                    # ASGI
+python benchmark/load_test.py --record record.json --url http://127.0.0.1:5000 http://127.0.0.1:8000 --connections 32 --pipeline 1 4
+"""
+import os,sys
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter
+from urllib.parse import urlsplit
+import numpy as np
+
+
+class Connection:
+
+    def __init__(self,host:str,port:int)->None:
+        self.host=host
+        self.port=port
+        self.reader=None
+        self.writer=None
+        self.reconnects=0
+
+    async def ensure_open(self):
+        if self.writer is None:
+            self.reader,self.writer=await asyncio.open_connection(self.host,self.port)
+            self.reconnects+=1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader,self.writer=None,None
+
+    async def read_response(self)->tuple:
+        """
+        return: (status, keep the connection open)
+        """
+        head=await self.reader.readuntil(b'\r\n\r\n')
+        lines=head.decode('latin-1').split('\r\n')
+        version,status=lines[0].split(' ')[:2]
+        headers={}
+        for line in lines[1:]:
+            if ':' in line:
+                name,value=line.split(':',1)
+                headers[name.strip().lower()]=value.strip().lower()
+        if 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        else:
+            await self.reader.read()
+        keep_alive=headers.get('connection')!='close' and version=='HTTP/1.1' and 'content-length' in headers
+        return int(status),keep_alive
+
+    async def send_batch(self,request:bytes,n_requests:int)->list:
+        """
+        Sends n_requests requests without waiting in between (pipelining) and
+        reads the responses in order. A server that closes the connection gets the
+        remaining requests on a new one.
+        return: [(status, latency s)]
+        """
+        results=[]
+        while len(results)<n_requests:
+            await self.ensure_open()
+            start=time.perf_counter()
+            n_batch=n_requests-len(results)
+            self.writer.write(request*n_batch)
+            await self.writer.drain()
+            for _ in range(n_batch):
+                try:
+                    status,keep_alive=await self.read_response()
+                except (asyncio.IncompleteReadError,ConnectionError):
+                    self.close()
+                    break
+                results.append((status,time.perf_counter()-start))
+                if not keep_alive:
+                    self.close()
+                    break
+        return results
+
+
+async def run_connection(url:str,request:bytes,pipeline:int,deadline:float,results:list,errors:Counter):
+    parts=urlsplit(url)
+    connection=Connection(host=parts.hostname,port=parts.port or 80)
+    try:
+        while time.perf_counter()<deadline:
+            try:
+                results.extend(await connection.send_batch(request=request,n_requests=pipeline))
+            except OSError as e:
+                errors[type(e).__name__]+=1
+                connection.close()
+                await asyncio.sleep(0.01)
+    finally:
+        connection.close()
+
+
+async def run_load(url:str,record:dict,connections:int,pipeline:int,duration_s:float)->dict:
+    parts=urlsplit(url)
+    body=json.dumps({'data':record}).encode()
+    request=(f'POST /predict_api HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Type: application/json\r\n'
+             f'Content-Length: {len(body)}\r\n\r\n').encode()+body
+    results=[]
+    errors=Counter()
+    start=time.perf_counter()
+    deadline=start+duration_s
+    await asyncio.gather(*[run_connection(url=url,request=request,pipeline=pipeline,deadline=deadline,
+                                          results=results,errors=errors) for _ in range(connections)])
+    elapsed=time.perf_counter()-start
+    statuses=Counter(status for status,_ in results)
+    latencies=np.array([latency for status,latency in results if status==200])*1000
+    return {'url':url,
+            'connections':connections,
+            'pipeline':pipeline,
+            'requests':len(results),
+            'ok_per_s':round(statuses.get(200,0)/elapsed,1),
+            'p50_ms':round(float(np.percentile(latencies,50)),2) if len(latencies)>0 else None,
+            'p99_ms':round(float(np.percentile(latencies,99)),2) if len(latencies)>0 else None,
+            'statuses':dict(statuses),
+            'errors':dict(errors)}
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--record',required=True,help='json file with one /predict_api data record')
+    parser.add_argument('--url',nargs='+',default=['http://127.0.0.1:5000','http://127.0.0.1:8000'])
+    parser.add_argument('--connections',type=int,nargs='+',default=[1,16,64])
+    parser.add_argument('--pipeline',type=int,nargs='+',default=[1])
+    parser.add_argument('--duration',type=float,default=10.0)
+    args=parser.parse_args()
+
+    with open(args.record) as record_file:
+        record=json.load(record_file)
+
+    print(f"{'url':>26} {'conns':>6} {'pipe':>5} {'requests':>9} {'ok/s':>9} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+    for url in args.url:
+        for connections in args.connections:
+            for pipeline in args.pipeline:
+                report=asyncio.run(run_load(url=url,record=record,connections=connections,
+                                            pipeline=pipeline,duration_s=args.duration))
+                print(f"{report['url']:>26} {report['connections']:>6} {report['pipeline']:>5} {report['requests']:>9} "
+                      f"{report['ok_per_s']:>9} {str(report['p50_ms']):>8} {str(report['p99_ms']):>8}  "
+                      f"{report['statuses']} {report['errors'] or ''}")
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Saves an exported HousingEstimatorModel (or the same preprocessing with a random
+forest of --trees trees fitted on synthetic data) as a dill pickle and as a model
+artifact, and prints file sizes, load times and the memory the loaded model adds:
+resident (including mapped blob pages, shared between processes) and anonymous
+(private to the process). sklearn copies tree node arrays out of the blob on
+load, so a forest gains load time but not private memory.
+
+python benchmark/model_artifact.py --model saved_models/<version>/model.pkl --trees 300 --repeat 5
+"""
+import os,sys
+import argparse
+import tempfile
+import subprocess
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sales.util import load_object,save_object
+from sales.serving.model_artifact import save_model_artifact,load_model_artifact,MODEL_BLOB_FILE_NAME,MODEL_PICKLE_FILE_NAME
+from sales.component.model_trainer import HousingEstimatorModel
+import numpy as np
+
+
+def get_memory_bytes()->tuple:
+    """
+    return: (resident bytes, anonymous bytes) from /proc/self/smaps_rollup
+    """
+    memory={}
+    with open('/proc/self/smaps_rollup') as smaps_file:
+        for line in smaps_file:
+            fields=line.split()
+            if fields[0] in ('Rss:','Anonymous:'):
+                memory[fields[0]]=int(fields[1])*1024
+    return memory['Rss:'],memory['Anonymous:']
+
+
+def load_in_subprocess(kind:str,path:str)->tuple:
+    """
+    Loads once in a fresh interpreter, so imports and earlier loads are not counted.
+    return: (seconds, resident bytes added, anonymous bytes added)
+    """
+    code=(f"import sys,time;sys.path.insert(0,{os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r});"
+          "from benchmark.model_artifact import get_memory_bytes;"
+          "from sales.util import load_object;from sales.serving.model_artifact import load_model_artifact;"
+          "import sklearn.ensemble,sales.component.model_trainer;"
+          "rss,anon=get_memory_bytes();start=time.perf_counter();"
+          f"model={'load_object(file_path=' if kind=='dill' else 'load_model_artifact(dir_path='}{path!r});"
+          "seconds=time.perf_counter()-start;rss_after,anon_after=get_memory_bytes();"
+          "print(seconds,rss_after-rss,anon_after-anon)")
+    output=subprocess.run([sys.executable,'-c',code],capture_output=True,text=True,check=True).stdout.split()
+    return float(output[0]),int(output[1]),int(output[2])
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--model',required=True)
+    parser.add_argument('--trees',type=int,default=0,help='replace the estimator with a random forest of this many trees')
+    parser.add_argument('--rows',type=int,default=20000)
+    parser.add_argument('--repeat',type=int,default=5)
+    args=parser.parse_args()
+
+    model=load_object(file_path=args.model)
+    if args.trees>0:
+        from sklearn.ensemble import RandomForestRegressor
+        n_features=int(model.trained_model_object.n_features_in_)
+        rng=np.random.default_rng(0)
+        X=rng.normal(size=(args.rows,n_features))
+        y=X[:,0]+rng.normal(size=args.rows)
+        model=HousingEstimatorModel(preprocessing_object=model.preprocessing_object,
+                                    trained_model_object=RandomForestRegressor(n_estimators=args.trees,n_jobs=-1).fit(X,y))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pickle_file_path=os.path.join(temp_dir,'model.pkl')
+        artifact_dir=os.path.join(temp_dir,'artifact')
+        save_object(file_path=pickle_file_path,obj=model)
+        save_model_artifact(model=model,dir_path=artifact_dir)
+
+        print(f'model: {model}')
+        print(f'dill pickle: {os.path.getsize(pickle_file_path)/2**20:.1f} MB, '
+              f'artifact: {os.path.getsize(os.path.join(artifact_dir,MODEL_PICKLE_FILE_NAME))/2**10:.1f} KB pickle + '
+              f'{os.path.getsize(os.path.join(artifact_dir,MODEL_BLOB_FILE_NAME))/2**20:.1f} MB blob')
+        print(f"{'format':>10} {'load ms p50':>12} {'load ms min':>12} {'RSS MB':>8} {'anon MB':>8}")
+        for kind,path in [('dill',pickle_file_path),('artifact',artifact_dir)]:
+            runs=[load_in_subprocess(kind=kind,path=path) for _ in range(args.repeat)]
+            seconds=np.array([run[0] for run in runs])*1000
+            print(f'{kind:>10} {np.median(seconds):>12.1f} {seconds.min():>12.1f} {np.median([run[1] for run in runs])/2**20:>8.1f} '
+                  f'{np.median([run[2] for run in runs])/2**20:>8.1f}')
+
+
+if __name__=='__main__':
+    main()
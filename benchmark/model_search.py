@@ -0,0 +1,69 @@
+"""
+Runs ModelFactory with every search strategy on the same transformed training
+array and prints fits, wall time and best score per model and strategy.
+
+python benchmark/model_search.py --data <transformed train .npy> --target <target.npy> --base-accuracy 0.5
+Without --target the last column of --data is the target.
+"""
+import os,sys
+import time
+import copy
+import argparse
+import tempfile
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sales.util import read_yaml_file,write_yaml_file,load_numpy_array_data,split_features_target
+from sales.entity.model_factory import ModelFactory,GRID_SEARCH_KEY,CLASS_KEY,PARAM_KEY,SEARCH_BUDGET_KEY
+
+STRATEGIES=['GridSearchCV','RandomizedSearchCV','HalvingGridSearchCV','HalvingRandomSearchCV']
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--data',required=True)
+    parser.add_argument('--target',default=None)
+    parser.add_argument('--config',default=os.path.join('config','model.yaml'))
+    parser.add_argument('--strategies',nargs='+',default=STRATEGIES)
+    parser.add_argument('--base-accuracy',type=float,default=0.5)
+    parser.add_argument('--max-fits',type=int,default=None)
+    parser.add_argument('--max-time-s',type=float,default=None)
+    args=parser.parse_args()
+
+    if args.target is None:
+        X,y=split_features_target(array=load_numpy_array_data(file_path=args.data))
+    else:
+        X,y=load_numpy_array_data(file_path=args.data,mmap_mode='r'),load_numpy_array_data(file_path=args.target,mmap_mode='r')
+    config=read_yaml_file(file_path=args.config)
+
+    print(f"{'strategy':>22} {'model':>32} {'candidates':>10} {'fits':>6} {'wall s':>8} {'best score':>10} {'stopped':>20}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for strategy in args.strategies:
+            strategy_config=copy.deepcopy(config)
+            strategy_config[GRID_SEARCH_KEY][CLASS_KEY]=strategy
+            strategy_config[GRID_SEARCH_KEY][PARAM_KEY]['verbose']=0
+            budget=dict(strategy_config[GRID_SEARCH_KEY].get(SEARCH_BUDGET_KEY) or {})
+            if args.max_fits is not None:
+                budget['max_fits']=args.max_fits
+            if args.max_time_s is not None:
+                budget['max_time_s']=args.max_time_s
+            strategy_config[GRID_SEARCH_KEY][SEARCH_BUDGET_KEY]=budget
+
+            config_file_path=os.path.join(temp_dir,f'{strategy}.yaml')
+            write_yaml_file(file_path=config_file_path,data=strategy_config)
+            model_factory=ModelFactory(model_config_file_path=config_file_path)
+
+            start=time.perf_counter()
+            model_factory.initiate_best_parameter_search_for_initialized_models(
+                initialized_model_list=model_factory.get_initialized_model_list(),
+                input_feature=X,output_feature=y,base_accuracy=args.base_accuracy)
+            total_time=time.perf_counter()-start
+
+            for report in model_factory.model_search_report_list:
+                best_score=f'{report.best_score:.4f}' if report.best_score is not None else '-'
+                print(f'{strategy:>22} {report.model_name.split(".")[-1]:>32} {report.n_candidates:>10} {report.n_fits:>6} '
+                      f'{report.wall_time_s:>8.2f} {best_score:>10} {report.stopped_reason:>20}')
+            total_fits=sum(report.n_fits for report in model_factory.model_search_report_list)
+            print(f'{strategy:>22} {"total":>32} {"":>10} {total_fits:>6} {total_time:>8.2f}')
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Starts the app under gunicorn.conf.py with each worker count, sends a few
+/predict_api requests so every worker has served traffic, and prints the memory
+of the master and the workers from GET /worker_memory. With the heap frozen
+before fork, each added worker should cost little private memory compared with
+the model size.
+
+python benchmark/prefork_memory.py --workers 1 2 4 --record record.json --requests 50
+(run from the project root, record.json holding one /predict_api "data" record)
+"""
+import os,sys
+import json
+import time
+import argparse
+import subprocess
+import urllib.request
+import urllib.error
+
+
+def request_json(url:str,payload:dict=None):
+    data=json.dumps(payload).encode() if payload is not None else None
+    request=urllib.request.Request(url,data=data,headers={'Content-Type':'application/json'})
+    with urllib.request.urlopen(request,timeout=30) as response:
+        return json.loads(response.read())
+
+
+def wait_until_ready(url:str,timeout_s:float=120.0):
+    deadline=time.time()+timeout_s
+    while time.time()<deadline:
+        try:
+            return request_json(url)
+        except (urllib.error.URLError,ConnectionError):
+            time.sleep(0.5)
+    raise TimeoutError(f'[{url}] not ready after [{timeout_s}]s')
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--workers',type=int,nargs='+',default=[1,2,4])
+    parser.add_argument('--port',type=int,default=5055)
+    parser.add_argument('--record',help='json file with one /predict_api data record')
+    parser.add_argument('--requests',type=int,default=50)
+    parser.add_argument('--config',default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'gunicorn.conf.py'))
+    args=parser.parse_args()
+
+    record=None
+    if args.record is not None:
+        with open(args.record) as record_file:
+            record=json.load(record_file)
+
+    base_url=f'http://127.0.0.1:{args.port}'
+    for n_workers in args.workers:
+        env=dict(os.environ,PORT=str(args.port),WEB_CONCURRENCY=str(n_workers))
+        server=subprocess.Popen([sys.executable,'-m','gunicorn','--config',args.config,'app:app'],env=env,
+                                stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(f'{base_url}/model_version')
+            if record is not None:
+                for _ in range(args.requests):
+                    request_json(f'{base_url}/predict_api',{'data':record})
+            # wait for every worker to be forked
+            while True:
+                report=request_json(f'{base_url}/worker_memory')
+                if len(report['processes'])>=n_workers+1:
+                    break
+                time.sleep(0.5)
+            print(f'\n{n_workers} workers')
+            print(report['summary'])
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Allocations per transform call of domain_value and feature_generator, against
+the previous implementations that copied the whole frame on every call.
+
+python benchmark/transformer_allocations.py --data <ingested train csv>
+"""
+import os,sys
+import time
+import argparse
+import warnings
+import tracemalloc
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sales.constant import YEAR,OUTLET_AGE_COLUMN
+from sales.util import get_input_schema
+from sales.component.data_transformation import domain_value,feature_generator,ITEM_FAT_CONTENT_MAPPING
+import pandas as pd
+
+
+class legacy_feature_generator:
+
+    def __init__(self,columns):
+        self.columns=columns
+
+    def transform(self,X):
+        x=X.copy()
+        x[OUTLET_AGE_COLUMN]=YEAR-x[self.columns]
+        x.drop(columns=self.columns,inplace=True)
+        return x
+
+
+class legacy_domain_value:
+
+    def transform(self,X):
+        x=X.copy()
+        x['Item_Fat_Content'].replace(ITEM_FAT_CONTENT_MAPPING,inplace=True)
+        return x
+
+
+def measure(fn,X,repeat:int)->tuple:
+    """
+    Returns (allocated blocks per call, peak bytes per call, seconds per call).
+    """
+    fn(X)
+    tracemalloc.start()
+    blocks=0
+    peak=0
+    for _ in range(repeat):
+        tracemalloc.clear_traces()
+        tracemalloc.reset_peak()
+        before=tracemalloc.get_traced_memory()[0]
+        result=fn(X)
+        snapshot=tracemalloc.take_snapshot()
+        blocks+=sum(stat.count for stat in snapshot.statistics('filename'))
+        peak+=tracemalloc.get_traced_memory()[1]-before
+        del result
+    tracemalloc.stop()
+
+    start=time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return blocks/repeat,peak/repeat,(time.perf_counter()-start)/repeat
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--data',required=True)
+    parser.add_argument('--schema',default=os.path.join('config','schema.yaml'))
+    parser.add_argument('--rows',type=int,nargs='+',default=[1,1000])
+    parser.add_argument('--repeat',type=int,default=20)
+    args=parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    input_schema=get_input_schema(schema_file_path=args.schema)
+    data=input_schema.cast(data=pd.read_csv(args.data))
+    ordinal_columns=['Item_Fat_Content','Outlet_Size','Outlet_Location_Type']
+    year_columns=['Outlet_Establishment_Year']
+
+    cases=[
+        ('domain_value',ordinal_columns,legacy_domain_value().transform,domain_value().fit(data[ordinal_columns]).transform),
+        ('feature_generator',year_columns,legacy_feature_generator(columns=year_columns).transform,
+                             feature_generator(columns=year_columns).fit(data[year_columns]).transform),
+    ]
+    print(f"{'transformer':>18} {'rows':>6} {'':>7} {'blocks':>8} {'peak KiB':>10} {'us/call':>9}")
+    for name,columns,legacy_fn,fn in cases:
+        for rows in args.rows:
+            X=data[columns].iloc[:rows]
+            for label,transform in [('before',legacy_fn),('after',fn)]:
+                blocks,peak,seconds=measure(transform,X,args.repeat)
+                print(f'{name:>18} {rows:>6} {label:>7} {blocks:>8.1f} {peak/1024:>10.1f} {seconds*1e6:>9.1f}')
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Pre-fork serving: the master imports app.py once (preload_app), which loads and
+warms the active model version, freezes the heap and then forks the workers.
+The workers inherit the model copy-on-write instead of each loading its own.
+
+gunicorn --config gunicorn.conf.py app:app
+
+PORT, WEB_CONCURRENCY (workers), GUNICORN_THREADS and GUNICORN_MEMORY_REPORT
+(log the shared and private memory of each worker once it has started) are
+read from the environment. GET /worker_memory reports every worker.
+
+Only the version loaded in the master is shared. A version the workers'
+ModelRegistry watcher activates later is loaded by each worker into private
+memory; restart gunicorn to load it in the master and share it again.
+"""
+import os
+import gc
+from sales.logger import logging
+
+bind=f"0.0.0.0:{os.environ.get('PORT','5000')}"
+workers=int(os.environ.get('WEB_CONCURRENCY',2))
+threads=int(os.environ.get('GUNICORN_THREADS',1))
+preload_app=True
+memory_report=os.environ.get('GUNICORN_MEMORY_REPORT','true').lower()=='true'
+
+# gunicorn reads this file before it imports app.py (preload_app runs ahead of
+# the on_starting hook), so no collections run while the model is loaded and
+# its objects are not scattered over pages a later collection would dirty
+gc.disable()
+
+
+def when_ready(server):
+    from sales.serving.worker_memory import freeze_heap
+    freeze_heap()
+
+
+def pre_fork(server,worker):
+    # objects the master created after when_ready, e.g. for an earlier fork
+    gc.freeze()
+
+
+def post_fork(server,worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    if not memory_report:
+        return
+    from sales.serving.worker_memory import get_memory_report,format_memory_report
+    report=get_memory_report(master_pid=worker.ppid,worker_pids=[worker.pid])
+    logging.info(f'Serving memory after start of worker [{worker.pid}]:\n{format_memory_report(report=report)}')
@@ -1,8 +1,14 @@
 import os,sys
+import json
+import hashlib
+from datetime import datetime
 from sales.exception import SalesException
 from sales.logger import logging
 from sales.entity.config_entity import DataIngestionConfig
 from sales.entity.artifact_entity import DataIngestionArtifact
+from sales.constant import ID_COLUMNS,ROOT_DIR
+from sales.data_source import get_data_source
+from sales.util import DATA_FORMATS,is_data_format_available,get_input_schema,write_data_file,read_data_file
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import StratifiedShuffleSplit
@@ -13,12 +19,26 @@ class DataIngestion:
         try:
             logging.info(f"{'<<'*20} Data ingestion log started {'>>'*20}")
             self.data_ingestion_config=data_ingestion_config
+            self.source_report=None
             print('Data Ingestion config:',self.data_ingestion_config)
         except Exception as e:
             raise SalesException(e,sys) from e
 
     def download_data(self):
+        """
+        Reads the configured source (sales.data_source) into raw_data_dir; without
+        a source the original csv export is copied.
+        """
         try:
+            if self.data_ingestion_config.source is not None:
+                data_source=get_data_source(source_config=self.data_ingestion_config.source,root_dir=ROOT_DIR)
+                data=data_source.read()
+                self.source_report=data_source.report()
+                raw_file_path=os.path.join(self.data_ingestion_config.raw_data_dir,
+                                           f'data{DATA_FORMATS[self.get_data_format()]}')
+                write_data_file(data=data,file_path=raw_file_path)
+                return
+
             file_path=r'E:\ML\stores\artifact\data_ingestion\20-08-2022\raw_data\data.csv'
             data=pd.read_csv(file_path)
             raw_data_dir=self.data_ingestion_config.raw_data_dir
@@ -29,13 +49,45 @@ class DataIngestion:
         except Exception as e:
             raise SalesException(e,sys) from e        
 
+    def get_data_format(self)->str:
+        """
+        The configured data_format, or csv when it needs pyarrow and pyarrow is not installed.
+        """
+        try:
+            data_format=self.data_ingestion_config.data_format
+            if data_format not in DATA_FORMATS:
+                raise Exception(f'data_format must be one of {list(DATA_FORMATS)}, got [{data_format}]')
+            if not is_data_format_available(data_format=data_format):
+                logging.info(f'pyarrow is not installed, ingested data is written as csv instead of {data_format}')
+                return 'csv'
+            return data_format
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def cast_to_schema(self,data:pd.DataFrame)->pd.DataFrame:
+        """
+        Stores the schema dtypes with the data, so columnar readers need no casting.
+        Columns that cannot take their dtype (e.g. missing values in an int64
+        column) keep the inferred one.
+        """
+        try:
+            input_schema=get_input_schema(schema_file_path=self.data_ingestion_config.schema_file_path)
+            dtype={col:value for col,value in input_schema.dtype_map.items() if col in data.columns}
+            try:
+                return data.astype(dtype)
+            except (ValueError,TypeError) as e:
+                logging.info(f'Ingested data kept its inferred dtypes: {e}')
+                return data
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
     def split_data_as_train_test(self)->DataIngestionArtifact:
         try:
             raw_data_dir=self.data_ingestion_config.raw_data_dir
             file_name=os.listdir(raw_data_dir)[0]
             file_path=os.path.join(raw_data_dir,file_name)
 
-            sales=pd.read_csv(file_path)
+            sales=read_data_file(file_path=file_path)
 
             sales['sales_cat']=pd.cut(sales['Item_Outlet_Sales'],
                                    bins=[0,1000,5000,10000,np.inf],
@@ -46,30 +98,32 @@ class DataIngestion:
             strat_train_set=None
             strat_test_set=None
 
-            split=StratifiedShuffleSplit(n_splits=1,test_size=0.3,random_state=42)
+            split=StratifiedShuffleSplit(n_splits=1,test_size=self.data_ingestion_config.test_size,random_state=42)
 
             for train_index,test_index in split.split(sales,sales['sales_cat']):
-                strat_train_set=sales.loc[train_index].drop(columns='sales_cat',axis=1)
-                strat_test_set=sales.loc[test_index].drop(columns='sales_cat',axis=1)
+                strat_train_set=sales.loc[train_index].drop(columns='sales_cat')
+                strat_test_set=sales.loc[test_index].drop(columns='sales_cat')
 
-           
+            data_format=self.get_data_format()
+            file_name=f'{os.path.splitext(file_name)[0]}{DATA_FORMATS[data_format]}'
             train_file_path=os.path.join(self.data_ingestion_config.ingested_train_dir,file_name)
             test_file_path=os.path.join(self.data_ingestion_config.ingested_test_dir,file_name)
 
             if strat_train_set is not None:
-                os.makedirs(self.data_ingestion_config.ingested_train_dir,exist_ok=True)
                 logging.info(f'Exporting Train dataset into file:{train_file_path}')
-                strat_train_set.to_csv(train_file_path,index=False)
+                write_data_file(data=self.cast_to_schema(data=strat_train_set),file_path=train_file_path)
 
             if strat_test_set is not None:
-                os.makedirs(self.data_ingestion_config.ingested_test_dir,exist_ok=True)
                 logging.info(f'Exporting Test dataset into file:{test_file_path}')
-                strat_test_set.to_csv(test_file_path,index=False)
+                write_data_file(data=self.cast_to_schema(data=strat_test_set),file_path=test_file_path)
 
             data_ingestion_artifact=DataIngestionArtifact(is_ingested=True,
                                   message='Data Ingestion Completed Successfully',
                                   train_file_path=train_file_path,
-                                  test_file_path=test_file_path)     
+                                  test_file_path=test_file_path,
+                                  manifest_file_path=None,
+                                  new_partitions=None,
+                                  source_report=self.source_report)     
 
             logging.info(f'Data Ingestion Artifact:{data_ingestion_artifact}')
             return data_ingestion_artifact                         
@@ -80,8 +134,184 @@ class DataIngestion:
         except Exception as e:
             raise SalesException(e,sys) from e
 
+    def get_file_hash(self,file_path:str)->str:
+        try:
+            file_hash=hashlib.blake2b(digest_size=16)
+            with open(file_path,'rb') as file_obj:
+                for block in iter(lambda:file_obj.read(1<<20),b''):
+                    file_hash.update(block)
+            return file_hash.hexdigest()
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def load_manifest(self)->dict:
+        """
+        {source file path relative to source_dir: {size, mtime_ns, hash, rows,
+        train_rows, test_rows, output files, ingested_at}}
+        """
+        try:
+            manifest_file_path=self.data_ingestion_config.manifest_file_path
+            if not os.path.exists(manifest_file_path):
+                return {}
+            with open(manifest_file_path) as manifest_file:
+                return json.load(manifest_file)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def save_manifest(self,manifest:dict):
+        try:
+            manifest_file_path=self.data_ingestion_config.manifest_file_path
+            os.makedirs(os.path.dirname(manifest_file_path),exist_ok=True)
+            temp_file_path=f'{manifest_file_path}.tmp'
+            with open(temp_file_path,'w') as manifest_file:
+                json.dump(manifest,manifest_file,indent=4,sort_keys=True)
+            os.replace(temp_file_path,manifest_file_path)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_source_files(self)->list:
+        """
+        Data files under source_dir, e.g. one per day or one date=... directory per
+        partition, as paths relative to source_dir.
+        """
+        try:
+            source_dir=self.data_ingestion_config.source_dir
+            if not os.path.isdir(source_dir):
+                raise Exception(f'Source directory [{source_dir}] does not exist')
+            source_files=[]
+            for dir_path,dir_names,file_names in os.walk(source_dir):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    if os.path.splitext(file_name)[1].lower() in DATA_FORMATS.values():
+                        source_files.append(os.path.relpath(os.path.join(dir_path,file_name),source_dir))
+            return source_files
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_partition_name(self,source_file:str)->str:
+        return os.path.splitext(source_file)[0].replace(os.sep,'__').replace('/','__')
+
+    def get_test_mask(self,data:pd.DataFrame)->np.ndarray:
+        """
+        A row is in test when the hash of its split key columns, scaled to [0, 1),
+        is below test_size. The hash only depends on the key values, so a row keeps
+        its split whichever run or partition ingests it.
+        """
+        try:
+            key_columns=self.data_ingestion_config.split_key_columns
+            if key_columns is None:
+                key_columns=get_input_schema(schema_file_path=self.data_ingestion_config.schema_file_path).schema[ID_COLUMNS]
+            hashes=pd.util.hash_pandas_object(data[key_columns].astype(str),index=False).to_numpy()
+            return hashes/np.float64(2**64)<self.data_ingestion_config.test_size
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def ingest_partition(self,source_file:str,manifest_entry:dict,data_format:str)->dict:
+        """
+        Copies one source file into the raw store and writes its train and test rows
+        as partition files. Files of an earlier version of the partition are replaced.
+        return: the new manifest entry without the source file stat
+        """
+        try:
+            source_file_path=os.path.join(self.data_ingestion_config.source_dir,source_file)
+            data=self.cast_to_schema(data=read_data_file(file_path=source_file_path))
+            test_mask=self.get_test_mask(data=data)
+
+            for output_file_path in (manifest_entry or {}).get('output_files',[]):
+                if os.path.exists(output_file_path):
+                    os.remove(output_file_path)
+
+            file_name=f'{self.get_partition_name(source_file=source_file)}{DATA_FORMATS[data_format]}'
+            raw_file_path=os.path.join(self.data_ingestion_config.incremental_raw_data_dir,file_name)
+            train_file_path=os.path.join(self.data_ingestion_config.incremental_train_dir,file_name)
+            test_file_path=os.path.join(self.data_ingestion_config.incremental_test_dir,file_name)
+            write_data_file(data=data,file_path=raw_file_path)
+            write_data_file(data=data[~test_mask],file_path=train_file_path)
+            write_data_file(data=data[test_mask],file_path=test_file_path)
+            logging.info(f'Ingested partition [{source_file}]: [{len(data)}] rows, [{int(test_mask.sum())}] in test')
+
+            return {'rows':len(data),
+                    'train_rows':int((~test_mask).sum()),
+                    'test_rows':int(test_mask.sum()),
+                    'output_files':[raw_file_path,train_file_path,test_file_path],
+                    'ingested_at':datetime.now().isoformat(timespec='seconds')}
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def remove_partition(self,source_file:str,manifest_entry:dict):
+        """
+        Deletes the raw, train and test files of a partition whose source file was
+        removed or renamed, so its rows are no longer trained on.
+        """
+        try:
+            for output_file_path in manifest_entry.get('output_files',[]):
+                if os.path.exists(output_file_path):
+                    os.remove(output_file_path)
+            logging.info(f'Removed partition [{source_file}]: source file no longer in [{self.data_ingestion_config.source_dir}]')
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def initiate_incremental_ingestion(self)->DataIngestionArtifact:
+        """
+        Ingests only the source files that are not in the manifest or whose content
+        changed. A file whose size and mtime match the manifest is not read; one
+        whose mtime changed is hashed and only re-ingested if the hash differs.
+        Partitions of source files that no longer exist are removed.
+        Train and test are the partition directories of the incremental store.
+        """
+        try:
+            manifest=self.load_manifest()
+            data_format=self.get_data_format()
+            source_files=self.get_source_files()
+            source_file_set=set(source_files)
+            removed_partitions=[source_file for source_file in manifest if source_file not in source_file_set]
+            for source_file in removed_partitions:
+                self.remove_partition(source_file=source_file,manifest_entry=manifest.pop(source_file))
+            if len(removed_partitions)>0:
+                self.save_manifest(manifest=manifest)
+
+            new_partitions=[]
+            for source_file in source_files:
+                stat=os.stat(os.path.join(self.data_ingestion_config.source_dir,source_file))
+                manifest_entry=manifest.get(source_file)
+                if (manifest_entry is not None and manifest_entry['size']==stat.st_size
+                        and manifest_entry['mtime_ns']==stat.st_mtime_ns):
+                    continue
+
+                file_hash=self.get_file_hash(file_path=os.path.join(self.data_ingestion_config.source_dir,source_file))
+                if manifest_entry is not None and manifest_entry['hash']==file_hash:
+                    manifest_entry.update(size=stat.st_size,mtime_ns=stat.st_mtime_ns)
+                    continue
+
+                entry=self.ingest_partition(source_file=source_file,manifest_entry=manifest_entry,data_format=data_format)
+                entry.update(size=stat.st_size,mtime_ns=stat.st_mtime_ns,hash=file_hash)
+                manifest[source_file]=entry
+                new_partitions.append(source_file)
+                self.save_manifest(manifest=manifest)
+
+            self.save_manifest(manifest=manifest)
+            logging.info(f'Incremental ingestion: [{len(new_partitions)}] new or changed, [{len(removed_partitions)}] removed, '
+                         f'[{len(manifest)}] partitions')
+            if len(manifest)==0:
+                raise Exception(f'No data files in [{self.data_ingestion_config.source_dir}]')
+
+            data_ingestion_artifact=DataIngestionArtifact(is_ingested=True,
+                                  message=f'Data Ingestion Completed Successfully, {len(new_partitions)} new partitions, '
+                                          f'{len(removed_partitions)} removed',
+                                  train_file_path=self.data_ingestion_config.incremental_train_dir,
+                                  test_file_path=self.data_ingestion_config.incremental_test_dir,
+                                  manifest_file_path=self.data_ingestion_config.manifest_file_path,
+                                  new_partitions=new_partitions,
+                                  source_report=None)
+            logging.info(f'Data Ingestion Artifact:{data_ingestion_artifact}')
+            return data_ingestion_artifact
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
     def initiate_data_ingestion(self)->DataIngestionArtifact:
         try:
+            if self.data_ingestion_config.incremental_enabled:
+                return self.initiate_incremental_ingestion()
             self.download_data()
             return self.split_data_as_train_test()
         except Exception as e:
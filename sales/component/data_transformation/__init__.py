@@ -10,87 +10,154 @@ from sales.constant import *
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler,OneHotEncoder,OrdinalEncoder
 from sklearn.impute import SimpleImputer
+from scipy import sparse
 from sales.util import *
 from sales.constant import *
 import numpy as np
 
+TRANSFORMED_TARGET_FILE_NAME='target.npy'
+ITEM_FAT_CONTENT_MAPPING={'low fat':'Low Fat','LF':'Low Fat','reg':'Regular'}
+
 
 class OutlierRemover(BaseEstimator,TransformerMixin):
     
-    def __init__(self,factor=1.5):
+    def __init__(self,factor=1.5,copy=True):
+        """
+        Clips every column to [q1-factor*iqr, q3+factor*iqr] learned at fit time.
+        copy=False clips a float64 ndarray input in place instead of allocating a new one.
+        """
         self.factor=factor
-
-    def outlier_detector(self,X,y=None):
-        try:
-            X=pd.Series(X).copy()
-            q1=X.quantile(0.25)
-            q3=X.quantile(0.75)
-            iqr=q3-q1
-            self.lower_bound.append(q1-self.factor*iqr)
-            self.upper_bound.append(q3+self.factor*iqr)
-
-        except Exception as e:
-            raise SalesException(e,sys) from e  
+        self.copy=copy
 
     def fit(self,X,y=None):
         try:
-            self.lower_bound=list()
-            self.upper_bound=list()
-            X.apply(self.outlier_detector)
+            X=np.asarray(X,dtype=np.float64)
+            q1,q3=np.nanquantile(X,[0.25,0.75],axis=0)
+            iqr=q3-q1
+            self.lower_bound=q1-self.factor*iqr
+            self.upper_bound=q3+self.factor*iqr
+            self.n_features_in_=X.shape[1]
             return self
         except Exception as e:
             raise SalesException(e,sys) from e  
 
     def transform(self,X,y=None):
         try:
-            X=pd.DataFrame(X).copy()
-            for index in range(X.shape[1]):
-                x=X.iloc[:,index].copy()
-                x[x<self.lower_bound[index]]=self.lower_bound[index]
-                x[x>self.upper_bound[index]]=self.upper_bound[index]
-                X.iloc[:,index]=x
-            return X    
+            # models pickled before the bounds were arrays still hold lists
+            lower_bound=np.asarray(self.lower_bound,dtype=np.float64)
+            upper_bound=np.asarray(self.upper_bound,dtype=np.float64)
+            if (not getattr(self,'copy',True) and isinstance(X,np.ndarray)
+                    and X.dtype==np.float64 and X.flags.writeable):
+                return np.clip(X,lower_bound,upper_bound,out=X)
+            return np.clip(np.asarray(X,dtype=np.float64),lower_bound,upper_bound)
         except Exception as e:
             raise SalesException(e,sys) from e    
 
 
 class feature_generator(BaseEstimator, TransformerMixin):
-    def __init__(self, columns):
+    def __init__(self, columns, reference_year=None, output_column=None):
+        """
+        Replaces the year column with its age relative to reference_year.
+        reference_year: defaults to sales.constant.YEAR
+        output_column: defaults to sales.constant.OUTLET_AGE_COLUMN
+        Both are resolved at fit time and stored as reference_year_ / output_column_.
+        """
         try:
             self.columns = columns
+            self.reference_year = reference_year
+            self.output_column = output_column
         except Exception as e:
             raise SalesException(e, sys) from e
 
+    def __setstate__(self, state):
+        # models pickled before the settings were learned at fit time
+        state.setdefault('reference_year', None)
+        state.setdefault('output_column', None)
+        state.setdefault('reference_year_', YEAR)
+        state.setdefault('output_column_', OUTLET_AGE_COLUMN)
+        super().__setstate__(state)
+
     def fit(self, X, y=None):
         try:
+            self.reference_year_ = YEAR if self.reference_year is None else self.reference_year
+            self.output_column_ = OUTLET_AGE_COLUMN if self.output_column is None else self.output_column
+            self.n_features_in_ = X.shape[1]
             return self
         except Exception as e:
             raise SalesException(e, sys) from e
 
     def transform(self, X, y=None):
         try:
-            x = X.copy()
-            x[OUTLET_AGE_COLUMN] = YEAR-x[self.columns]
-            x.drop(columns=self.columns, axis=1, inplace=True)
-            return x
+            if not isinstance(X, pd.DataFrame):
+                return self.reference_year_-np.asarray(X)
+
+            age = self.reference_year_-X[self.columns].to_numpy()
+            other_columns = [column for column in X.columns if column not in self.columns]
+            if len(other_columns) == 0:
+                return pd.DataFrame(age, columns=[self.output_column_], index=X.index, copy=False)
+            return X[other_columns].assign(**{self.output_column_: age[:, 0]})
         except Exception as e:
             raise SalesException(e, sys) from e
 
+    def get_feature_names_out(self, input_features=None):
+        if input_features is None:
+            return np.asarray([self.output_column_], dtype=object)
+        return np.asarray([column for column in input_features if column not in self.columns]+[self.output_column_], dtype=object)
+
 class domain_value(BaseEstimator,TransformerMixin):
 
-    def __init__(self):
-        pass
+    def __init__(self,column='Item_Fat_Content',mapping=None):
+        """
+        Normalizes the spellings of one categorical column, e.g. 'LF' -> 'Low Fat'.
+        mapping: defaults to ITEM_FAT_CONTENT_MAPPING
+        The mapping is turned into a category index at fit time, so transform is
+        one hash lookup per row and leaves the other columns untouched.
+        """
+        self.column=column
+        self.mapping=mapping
+
+    def __setstate__(self,state):
+        # models pickled before the mapping was learned at fit time
+        state.setdefault('column','Item_Fat_Content')
+        state.setdefault('mapping',None)
+        super().__setstate__(state)
+        if not hasattr(self,'mapping_'):
+            self.set_mapping(column=self.column,mapping=ITEM_FAT_CONTENT_MAPPING,column_index=0)
+
+    def set_mapping(self,column:str,mapping:dict,column_index:int):
+        self.column_=column
+        self.column_index_=column_index
+        self.mapping_=dict(mapping)
+        self.categories_=pd.Index(list(self.mapping_.keys()),dtype=object)
+        self.normalized_categories_=np.asarray(list(self.mapping_.values()),dtype=object)
 
     def fit(self,X,y=None):
         try:
+            columns=list(X.columns) if isinstance(X,pd.DataFrame) else []
+            self.set_mapping(column=self.column,
+                             mapping=ITEM_FAT_CONTENT_MAPPING if self.mapping is None else self.mapping,
+                             column_index=columns.index(self.column) if self.column in columns else 0)
+            self.n_features_in_=X.shape[1]
             return self
         except Exception as e:
             raise SalesException(e,sys) from e
 
     def transform(self,X,y=None):
         try:
-            x=X.copy()
-            x['Item_Fat_Content'].replace({'low fat':'Low Fat','LF':'Low Fat', 'reg':'Regular'},inplace=True)
+            is_frame=isinstance(X,pd.DataFrame)
+            values=X[self.column_].to_numpy(dtype=object) if is_frame else np.asarray(X)[:,self.column_index_]
+            codes=self.categories_.get_indexer(values)
+            to_replace=codes>=0
+            if not to_replace.any():
+                return X
+
+            # only the normalized column is rebuilt
+            normalized=np.array(values,dtype=object)
+            normalized[to_replace]=self.normalized_categories_[codes[to_replace]]
+            if is_frame:
+                return X.assign(**{self.column_:normalized})
+            x=np.array(X,dtype=object)
+            x[:,self.column_index_]=normalized
             return x
         except Exception as e:
             raise SalesException(e,sys) from e        
@@ -161,17 +228,18 @@ class DataTransformation:
 
             schema_file_path=self.data_validation_artifact.schema_file_path
 
-            train_df=load_data(file_path=train_file_path,schema_file_path=schema_file_path)
-            test_df=load_data(file_path=test_file_path,schema_file_path=schema_file_path)
-
             schema_data=read_yaml_file(file_path=schema_file_path)
             id_columns=schema_data[ID_COLUMNS]
             target_columns=[schema_data[TARGET_COLUMNS]]
+            columns=[col for col in schema_data[COLUMNS] if col not in id_columns]
+
+            train_df=load_data(file_path=train_file_path,schema_file_path=schema_file_path,columns=columns)
+            test_df=load_data(file_path=test_file_path,schema_file_path=schema_file_path,columns=columns)
             
-            feature_train_df=train_df.drop(columns=id_columns+target_columns,axis=1)
+            feature_train_df=train_df.drop(columns=target_columns)
             target_train_df=train_df[target_columns]
 
-            feature_test_df=test_df.drop(columns=id_columns+target_columns,axis=1)
+            feature_test_df=test_df.drop(columns=target_columns)
             target_test_df=test_df[target_columns]
 
             preprocessing_object=self.get_data_transformer_object()
@@ -179,8 +247,10 @@ class DataTransformation:
             train_arr=preprocessing_object.fit_transform(feature_train_df)
             test_arr=preprocessing_object.transform(feature_test_df)
 
-            train_arr=np.c_[train_arr,np.array(target_train_df)]
-            test_arr=np.c_[test_arr,np.array(target_test_df)]
+            # features and target are saved as separate contiguous arrays, so the
+            # trainer can memory-map them without slicing the target out of the features
+            train_target=np.ascontiguousarray(target_train_df.to_numpy(dtype=np.float64).ravel())
+            test_target=np.ascontiguousarray(target_test_df.to_numpy(dtype=np.float64).ravel())
 
             preprocessed_object_file_path=self.data_transformation_config.preprocessed_object_file_path
             save_object(file_path=preprocessed_object_file_path,obj=preprocessing_object)
@@ -188,20 +258,27 @@ class DataTransformation:
             transformed_train_dir=self.data_transformation_config.transformed_train_dir
             transformed_test_dir=self.data_transformation_config.transformed_test_dir
 
-            train_file_name=os.path.basename(train_file_path).replace('.csv','.npz')
-            test_file_name=os.path.basename(test_file_path).replace('.csv','.npz')
+            train_file_name=get_numpy_array_file_name(file_name=os.path.basename(train_file_path),array=train_arr)
+            test_file_name=get_numpy_array_file_name(file_name=os.path.basename(test_file_path),array=test_arr)
 
             transformed_train_file_path=os.path.join(transformed_train_dir,train_file_name)
             transformed_test_file_path=os.path.join(transformed_test_dir,test_file_name)
+            transformed_train_target_file_path=os.path.join(transformed_train_dir,TRANSFORMED_TARGET_FILE_NAME)
+            transformed_test_target_file_path=os.path.join(transformed_test_dir,TRANSFORMED_TARGET_FILE_NAME)
 
-            save_numpy_array_data(file_path=transformed_train_file_path,array=train_arr)
-            save_numpy_array_data(file_path=transformed_test_file_path,array=test_arr)
+            feature_array_order=self.data_transformation_config.feature_array_order
+            save_numpy_array_data(file_path=transformed_train_file_path,array=train_arr,order=feature_array_order)
+            save_numpy_array_data(file_path=transformed_test_file_path,array=test_arr,order=feature_array_order)
+            save_numpy_array_data(file_path=transformed_train_target_file_path,array=train_target)
+            save_numpy_array_data(file_path=transformed_test_target_file_path,array=test_target)
 
             data_transformation_artifact=DataTransformationArtifact(is_transformed=True, 
                                        message="Data Transformation Completed Successfully", 
                                        transformed_train_file_path=transformed_train_file_path, 
                                        transformed_test_file_path=transformed_test_file_path, 
-                                       preprocessed_object_file_path=preprocessed_object_file_path)
+                                       preprocessed_object_file_path=preprocessed_object_file_path,
+                                       transformed_train_target_file_path=transformed_train_target_file_path,
+                                       transformed_test_target_file_path=transformed_test_target_file_path)
 
             return data_transformation_artifact                           
             
@@ -1,28 +1,67 @@
 import os,sys
-from sales.constant import DOMAIN_VALUE, NUMERICAL_COLUMNS, ORDINAL_CATEGORICAL_COLUMNS
+import time
+from sales.constant import COLUMNS, DOMAIN_VALUE, NUMERICAL_COLUMNS, ORDINAL_CATEGORICAL_COLUMNS, CATEGORICAL_COLUMNS, ID_COLUMNS
 from sales.exception import SalesException
 from sales.logger import logging
 from sales.entity.config_entity import DataValidationConfig
 from sales.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact
 import pandas as pd
-from sales.util import read_yaml_file
-from evidently.model_profile import Profile
-from evidently.model_profile.sections import DataDriftProfileSection
-from evidently.dashboard import Dashboard
-from evidently.dashboard.tabs import DataDriftTab
+from sales.util import read_yaml_file,iter_data,get_data_columns,read_data_file
+from sales.entity.dataset_stats import DatasetStats,DatasetStatsAccumulator
+from sales.drift import compute_drift,sample_rows,write_json_report,write_html_report
+from pandas.api.types import is_numeric_dtype
 import json
 
+DRIFT_BACKENDS=['native','evidently']
+
 class DataValidation:
 
     def __init__(self,data_validation_config:DataValidationConfig,
                       data_ingestion_artifact:DataIngestionArtifact)->None:
+        """
+        Train and test files are read once, and their column statistics are
+        computed once; every check and report works from those.
+        With streaming_enabled the files are read in chunks of chunk_size rows into
+        mergeable statistics, and the drift reports run on a random sample of
+        report_sample_rows rows per dataset.
+        Drift is computed once by the drift_backend ('native' tests in sales.drift,
+        or evidently if installed) and both reports are written from that result.
+        """
         try:
             logging.info(f"{'<<'*20}Data validation log started{'>>'*20}")
             self.data_validation_config=data_validation_config
             self.data_ingestion_artifact=data_ingestion_artifact
+            self.schema_data=read_yaml_file(file_path=self.data_validation_config.schema_file_path)
+
+            self.train_data=None
+            self.test_data=None
+            self.train_stats=None
+            self.test_stats=None
+            self.train_accumulator=None
+            self.test_accumulator=None
+            self.drift_report=None
+            self.check_results={}
+            self.check_timings={}
+            if self.data_validation_config.drift_backend not in DRIFT_BACKENDS:
+                raise Exception(f'drift_backend must be one of {DRIFT_BACKENDS}, got [{self.data_validation_config.drift_backend}]')
             print(f'\nData Validation Config:{self.data_validation_config}')
         except Exception as e:
-            raise SalesException(e,sys) from e  
+            raise SalesException(e,sys) from e
+
+    def run_check(self,name:str,check):
+        """
+        Runs one check and records its result and duration for the artifact.
+        """
+        try:
+            start=time.perf_counter()
+            result=check()
+            self.check_timings[name]=round(time.perf_counter()-start,6)
+            if result is not None:
+                self.check_results[name]=bool(result)
+            logging.info(f'{name} took [{self.check_timings[name]}]s, result [{result}]')
+            return result
+        except Exception as e:
+            raise SalesException(e,sys) from e
 
     def is_train_test_file_exists(self)->bool:
         try:
@@ -40,63 +79,152 @@ class DataValidation:
             if not is_available:
                 logging.info(f'Train{[train_file_path]} or Test {[test_file_path]} File is not present')
 
-            return is_available    
+            return is_available
 
         except Exception as e:
-            raise SalesException(e,sys) from e 
+            raise SalesException(e,sys) from e
 
-    def get_train_test_data(self)->pd.DataFrame:
+    def read_data(self,file_path:str)->tuple:
+        """
+        Reads only the schema columns, with the schema dtypes.
+        return: (data, columns of the file)
+        """
+        try:
+            file_columns=get_data_columns(file_path=file_path)
+            dtype_map=self.schema_data[COLUMNS]
+            usecols=[col for col in file_columns if col in dtype_map]
+            try:
+                data=read_data_file(file_path=file_path,columns=usecols,dtype={col:dtype_map[col] for col in usecols})
+            except ValueError as e:
+                # e.g. missing values in a column declared int64
+                logging.info(f'Reading [{file_path}] with schema dtypes failed, dtypes inferred instead: {e}')
+                data=read_data_file(file_path=file_path,columns=usecols)
+            return data,file_columns
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_stats_accumulator(self,columns:list,sample_rows:int=None)->DatasetStatsAccumulator:
+        try:
+            numerical_columns=[col for col in self.schema_data[NUMERICAL_COLUMNS] if col in columns]
+            categorical_columns=[col for col in self.schema_data.get(CATEGORICAL_COLUMNS,self.schema_data[ORDINAL_CATEGORICAL_COLUMNS])
+                                 if col in columns]
+            return DatasetStatsAccumulator(columns=columns,
+                                           numerical_columns=numerical_columns,
+                                           categorical_columns=categorical_columns,
+                                           max_distinct_values=self.data_validation_config.max_distinct_values,
+                                           sample_rows=sample_rows)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def compute_stats(self,data:pd.DataFrame,columns:list)->DatasetStatsAccumulator:
+        try:
+            accumulator=self.get_stats_accumulator(columns=columns)
+            accumulator.update(data)
+            return accumulator
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def stream_stats(self,file_path:str)->DatasetStatsAccumulator:
+        """
+        One pass over the file in chunks; memory is bounded by chunk_size plus the
+        report sample, whatever the file size.
+        """
+        try:
+            file_columns=get_data_columns(file_path=file_path)
+            for use_schema_dtypes in [True,False]:
+                accumulator=self.get_stats_accumulator(columns=file_columns,
+                                                       sample_rows=self.data_validation_config.report_sample_rows)
+                try:
+                    for chunk in iter_data(file_path=file_path,
+                                           schema_file_path=self.data_validation_config.schema_file_path,
+                                           chunk_size=self.data_validation_config.chunk_size,
+                                           columns=list(self.schema_data[COLUMNS].keys()),
+                                           use_schema_dtypes=use_schema_dtypes):
+                        accumulator.update(chunk)
+                    return accumulator
+                except Exception as e:
+                    if not use_schema_dtypes:
+                        raise
+                    # e.g. missing values in a column declared int64
+                    logging.info(f'Streaming [{file_path}] with schema dtypes failed, dtypes inferred instead: {e}')
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def load_train_test_data(self):
         try:
             train_file_path=self.data_ingestion_artifact.train_file_path
             test_file_path=self.data_ingestion_artifact.test_file_path
-            
-            train_data=pd.read_csv(train_file_path)
-            test_data=pd.read_csv(test_file_path)
+            if self.data_validation_config.streaming_enabled:
+                self.train_accumulator=self.stream_stats(file_path=train_file_path)
+                self.test_accumulator=self.stream_stats(file_path=test_file_path)
+                self.train_data,self.test_data=self.train_accumulator.sample,self.test_accumulator.sample
+            else:
+                train_data,train_columns=self.read_data(file_path=train_file_path)
+                test_data,test_columns=self.read_data(file_path=test_file_path)
+                self.train_data,self.test_data=train_data,test_data
+                self.train_accumulator=self.compute_stats(data=train_data,columns=train_columns)
+                self.test_accumulator=self.compute_stats(data=test_data,columns=test_columns)
+            self.train_stats=self.train_accumulator.to_dataset_stats()
+            self.test_stats=self.test_accumulator.to_dataset_stats()
+        except Exception as e:
+            raise SalesException(e,sys) from e
 
-            return train_data,test_data
+    def get_train_test_data(self)->pd.DataFrame:
+        try:
+            if self.train_data is None or self.test_data is None:
+                self.load_train_test_data()
+            return self.train_data,self.test_data
 
         except Exception as e:
-            raise SalesException(e,sys) from e        
+            raise SalesException(e,sys) from e
+
+    def get_train_test_stats(self)->tuple:
+        try:
+            if self.train_stats is None or self.test_stats is None:
+                self.load_train_test_data()
+            return self.train_stats,self.test_stats
+        except Exception as e:
+            raise SalesException(e,sys) from e
 
     def check_no_of_columns(self)->bool:
         try:
             logging.info('---No.of.Columns Check---')
-            train_data,test_data=self.get_train_test_data()
+            train_stats,test_stats=self.get_train_test_stats()
 
-            train_columns=train_data.shape[1]
-            test_columns=test_data.shape[1]    
+            train_columns=len(train_stats.columns)
+            test_columns=len(test_stats.columns)
 
             logging.info(f'Train columns:{train_columns}')
-            logging.info(f'Test columns:{test_columns}')       
+            logging.info(f'Test columns:{test_columns}')
 
             if train_columns==test_columns:
-                logging.info('Result: Match')  
-                return True                
+                logging.info('Result: Match')
+                return True
             else:
-                logging.info('Result: Not Match')   
-                return False    
+                logging.info('Result: Not Match')
+                return False
 
         except Exception as e:
-            raise SalesException(e,sys) from e               
+            raise SalesException(e,sys) from e
 
     def check_column_names(self)->bool:
         try:
 
             logging.info('---Column names check---')
-            train_data,test_data=self.get_train_test_data()
+            train_stats,test_stats=self.get_train_test_stats()
 
-            train_columns=train_data.columns.to_list()
-            test_columns=test_data.columns.to_list()
+            train_columns=train_stats.columns
+            test_columns=test_stats.columns
 
             logging.info(f'Train columns:{train_columns}')
             logging.info(f'Test columns:{test_columns}')
 
             if train_columns==test_columns:
-                logging.info('Result: Match') 
+                logging.info('Result: Match')
                 return True
             else:
-                logging.info('Result: Not Match') 
-                return False    
+                logging.info('Result: Not Match')
+                return False
 
         except Exception as e:
             raise SalesException(e,sys) from e
@@ -105,153 +233,163 @@ class DataValidation:
         try:
             logging.info('---Missing Values Check:')
 
-            train_data,test_data=self.get_train_test_data()
-            
-            logging.info('---Train Dataset:')
-            train_result=True
-            for col in train_data.columns.to_list():
-                value=None
-                pct=None
-                value=train_data[col].isnull().sum()
-                pct=round(train_data[col].isnull().sum()/train_data.shape[0]*100,2)
-
-                if value>0:
-                    train_result=False
-                
-                logging.info(f'col:{col},value:{value},pct:{pct}')  
-
-            logging.info('---Test Dataset:')
-            test_result=True
-            for col in test_data.columns.to_list():
-                value=None
-                pct=None
-                value=test_data[col].isnull().sum()
-                pct=round(test_data[col].isnull().sum()/test_data.shape[0]*100,2)  
-
-                if value>0:
-                    test_result=False
-
-                logging.info(f"col:{col},value:{value},pct:{pct}")       
-
-            return train_result and test_result
+            result=True
+            for name,stats in zip(['Train','Test'],self.get_train_test_stats()):
+                logging.info(f'---{name} Dataset:')
+                for col,value in stats.null_counts.items():
+                    pct=round(value/stats.n_rows*100,2) if stats.n_rows>0 else 0.0
+
+                    if value>0:
+                        result=False
+
+                    logging.info(f'col:{col},value:{value},pct:{pct}')
+
+            return result
 
         except Exception as e:
-            raise SalesException(e,sys) from e  
+            raise SalesException(e,sys) from e
 
     def check_outliers(self)->bool:
         try:
 
             logging.info('---Outliers Check---')
-            train_data,test_data=self.get_train_test_data()
-            scheme_data=read_yaml_file(file_path=self.data_validation_config.schema_file_path)
-            numerical_columns=scheme_data[NUMERICAL_COLUMNS]
             lower=-0.5
             upper=0.5
 
-            logging.info('---Train Dataset:')            
-            train_result=True
-            for col in numerical_columns:
-                skew=None
-                result=None
-                skew=round(train_data[col].skew(),2)
+            result=True
+            for name,stats in zip(['Train','Test'],self.get_train_test_stats()):
+                logging.info(f'---{name} Dataset:')
+                for col,skew in stats.skew.items():
+                    skew=round(skew,2)
 
-                if skew<lower or skew>upper:
-                    result='Outliers'
-                    train_result=False
-                else:
-                    result='No Outliers'  
+                    if skew<lower or skew>upper:
+                        col_result='Outliers'
+                        result=False
+                    else:
+                        col_result='No Outliers'
 
-                logging.info(f'col:{col},skew:{skew},result:{result}')
+                    logging.info(f'col:{col},skew:{skew},result:{col_result}')
 
+            return result
 
-            logging.info('--- Test Dataset:')
-            test_result=True
-            for col in numerical_columns:
-                skew=None
-                result=None
-                skew=round(test_data[col].skew(),2)
+        except Exception as e:
+            raise SalesException(e,sys) from e
 
-                if skew<lower or skew>upper:
-                    result='Outliers'
-                    test_result=False
-                else:
-                    result='No Outliers'
+    def check_domain_value(self)->bool:
+        try:
+            logging.info('---Domain Value Check---')
+
+            domain_value=self.schema_data[DOMAIN_VALUE]
 
-                logging.info(f'col:{col},skew:{skew},result:{result}')       
+            result=True
+            for name,stats in zip(['Train','Test'],self.get_train_test_stats()):
+                logging.info(f'---{name} Dataset:')
+                for col in self.schema_data[ORDINAL_CATEGORICAL_COLUMNS]:
+                    logging.info(f'col:{col}')
+                    logging.info(f'{name}:{stats.unique_values.get(col)}')
+                    logging.info(f'Domain:{sorted(domain_value.get(col))}')
+                    if stats.unique_values.get(col)==sorted(domain_value.get(col)):
+                        logging.info('Result: Match')
+                    else:
+                        logging.info('Result: Not Match')
+                        result=False
 
-            return train_result and test_result             
+            return result
 
         except Exception as e:
-            raise SalesException(e,sys) from e 
+            raise SalesException(e,sys) from e
 
-    def check_domain_value(self)->bool:
+    def get_drift_columns(self,data:pd.DataFrame)->tuple:
+        """
+        Every column but the id columns; numeric dtypes get the KS test, the rest
+        the categorical test.
+        return: (numerical columns, categorical columns)
+        """
         try:
-            logging.info('---Domain Value Check---')
+            id_columns=self.schema_data.get(ID_COLUMNS,[])
+            columns=[col for col in data.columns if col not in id_columns]
+            numerical_columns=[col for col in columns if is_numeric_dtype(data[col])]
+            categorical_columns=[col for col in columns if col not in numerical_columns]
+            return numerical_columns,categorical_columns
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_drift_report(self)->dict:
+        try:
+            if self.drift_report is None:
+                train_data,test_data=self.get_train_test_data()
+                numerical_columns,categorical_columns=self.get_drift_columns(data=train_data)
+                self.drift_report=compute_drift(reference=train_data,
+                                                current=test_data,
+                                                numerical_columns=numerical_columns,
+                                                categorical_columns=categorical_columns,
+                                                threshold=self.data_validation_config.drift_threshold,
+                                                categorical_method=self.data_validation_config.drift_categorical_method,
+                                                sample_size=self.data_validation_config.drift_sample_rows)
+                logging.info(f"Drifted columns: [{self.drift_report['n_drifted_columns']}] of [{self.drift_report['n_columns']}], "
+                             f"dataset drift: [{self.drift_report['dataset_drift']}]")
+            return self.drift_report
+        except Exception as e:
+            raise SalesException(e,sys) from e
 
+    def get_evidently_data(self)->tuple:
+        try:
             train_data,test_data=self.get_train_test_data()
-            schema_data=read_yaml_file(file_path=self.data_validation_config.schema_file_path)
-            domain_value=schema_data[DOMAIN_VALUE]
-            
-            logging.info('---Train Dataset:')
-            train_result=True
-            for col in schema_data[ORDINAL_CATEGORICAL_COLUMNS]:
-                logging.info(f'col:{col}')
-                logging.info(f'Train:{sorted(list(train_data[col].dropna().unique()))}')
-                logging.info(f'Domain:{sorted(domain_value.get(col))}')
-                if sorted(list(train_data[col].dropna().unique()))==sorted(domain_value.get(col)):
-                    logging.info('Result: Match')
-                else:
-                    logging.info('Result: Not Match')
-                    train_result=False  
-
-            logging.info('---Test Dataset:')
-            test_result=True
-            for col in schema_data[ORDINAL_CATEGORICAL_COLUMNS]:
-                logging.info(f'col:{col}')
-                logging.info(f'Test:{sorted(list(test_data[col].dropna().unique()))}')
-                logging.info(f'Domain:{sorted(domain_value.get(col))}')
-
-                if sorted(list(test_data[col].dropna().unique()))==sorted(domain_value.get(col)):
-                    logging.info('Result: Match')
-                else:
-                    logging.info('Result: Not Match')
-                    test_result=False
-
-            return train_result and test_result        
+            sample_size=self.data_validation_config.drift_sample_rows
+            return sample_rows(data=train_data,n_rows=sample_size),sample_rows(data=test_data,n_rows=sample_size)
+        except Exception as e:
+            raise SalesException(e,sys) from e
 
+    def check_data_drift_native(self)->bool:
+        try:
+            return not self.get_drift_report()['dataset_drift']
         except Exception as e:
-            raise SalesException(e,sys) from e  
+            raise SalesException(e,sys) from e
 
     def json_report(self):
         try:
+            report_file_path=self.data_validation_config.report_file_path
+
+            if self.data_validation_config.drift_backend=='native':
+                write_json_report(drift_report=self.get_drift_report(),file_path=report_file_path)
+                return
+
+            from evidently.model_profile import Profile
+            from evidently.model_profile.sections import DataDriftProfileSection
 
             profile=Profile(sections=[DataDriftProfileSection()])
-            train_data,test_data=self.get_train_test_data()
+            train_data,test_data=self.get_evidently_data()
             profile.calculate(train_data,test_data)
 
             report=json.loads(profile.json())
 
-            report_file_path=self.data_validation_config.report_file_path
-
             report_file_dir=os.path.dirname(report_file_path)
 
             os.makedirs(report_file_dir,exist_ok=True)
 
             with open(report_file_path,'w') as report_file:
-                json.dump(report,report_file,indent=6)                
+                json.dump(report,report_file,indent=6)
 
         except Exception as e:
             raise SalesException(e,sys) from e
 
     def html_report(self):
         try:
+            report_page_file_path=self.data_validation_config.report_page_file_path
+
+            if self.data_validation_config.drift_backend=='native':
+                write_html_report(drift_report=self.get_drift_report(),file_path=report_page_file_path)
+                return
+
+            from evidently.dashboard import Dashboard
+            from evidently.dashboard.tabs import DataDriftTab
+
             dashboard=Dashboard(tabs=[DataDriftTab()])
 
-            train_data,test_data=self.get_train_test_data()
+            train_data,test_data=self.get_evidently_data()
 
             dashboard.calculate(train_data,test_data)
 
-            report_page_file_path=self.data_validation_config.report_page_file_path
             report_page_file_dir=os.path.dirname(report_page_file_path)
 
             os.makedirs(report_page_file_dir,exist_ok=True)
@@ -260,31 +398,59 @@ class DataValidation:
 
         except Exception as e:
             raise SalesException(e,sys) from e
+
+    def stats_report(self):
+        try:
+            report={
+                'streaming':self.data_validation_config.streaming_enabled,
+                'check_results':self.check_results,
+                'train':self.train_accumulator.to_dict(),
+                'test':self.test_accumulator.to_dict(),
+            }
+            stats_file_path=self.data_validation_config.stats_file_path
+            os.makedirs(os.path.dirname(stats_file_path),exist_ok=True)
+            with open(stats_file_path,'w') as stats_file:
+                json.dump(report,stats_file,indent=6,default=str)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
     def check_data_drift(self):
         try:
-            self.json_report()
-            self.html_report()
+            if self.data_validation_config.drift_backend=='native':
+                self.run_check('check_data_drift',self.check_data_drift_native)
+            self.run_check('json_report',self.json_report)
+            self.run_check('html_report',self.html_report)
         except Exception as e:
-            raise SalesException(e,sys) from e                          
+            raise SalesException(e,sys) from e
 
-    def initiate_data_validation(self)->DataValidationArtifact:
+    def initiate_data_validation(self,check_data_drift:bool=True)->DataValidationArtifact:
+        """
+        check_data_drift: False leaves the drift reports to a later
+        check_data_drift() call, e.g. a pipeline stage running alongside transformation.
+        """
         try:
-            self.is_train_test_file_exists()
-            self.check_no_of_columns()
-            self.check_column_names()
-            self.check_missing_values()
-            self.check_outliers()
-            self.check_domain_value()
-            self.check_data_drift()
-
-            data_validation_artifact=DataValidationArtifact(is_validated=True, 
-                                   message='Data Validation Completed Successfully', 
+            self.run_check('is_train_test_file_exists',self.is_train_test_file_exists)
+            self.run_check('load_train_test_data',self.load_train_test_data)
+            self.run_check('check_no_of_columns',self.check_no_of_columns)
+            self.run_check('check_column_names',self.check_column_names)
+            self.run_check('check_missing_values',self.check_missing_values)
+            self.run_check('check_outliers',self.check_outliers)
+            self.run_check('check_domain_value',self.check_domain_value)
+            self.run_check('stats_report',self.stats_report)
+            if check_data_drift:
+                self.check_data_drift()
+
+            data_validation_artifact=DataValidationArtifact(is_validated=True,
+                                   message='Data Validation Completed Successfully',
                                    schema_file_path=self.data_validation_config.schema_file_path,
-                                   report_file_path=self.data_validation_config.report_file_path, 
-                                   report_page_file_path=self.data_validation_config.report_page_file_path)
+                                   report_file_path=self.data_validation_config.report_file_path,
+                                   report_page_file_path=self.data_validation_config.report_page_file_path,
+                                   check_results=self.check_results,
+                                   check_timings=self.check_timings,
+                                   stats_file_path=self.data_validation_config.stats_file_path)
 
             logging.info(f'data_validation_artifact:{data_validation_artifact}')
-            return data_validation_artifact                       
+            return data_validation_artifact
         except Exception as e:
             raise SalesException(e,sys) from e
 
@@ -1,11 +1,13 @@
 import os,sys
+import joblib
 from sales.logger import logging
 from sales.exception import SalesException
 from sales.entity.config_entity import ModelEvaluationConfig
-from sales.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact,ModelTrainerArtifact,ModelEvaluationArtifact
+from sales.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact,DataTransformationArtifact,ModelTrainerArtifact,ModelEvaluationArtifact
 from sales.util import *
 import numpy as np
 from sales.entity.model_factory import *
+from sales.entity.model_comparison import COMPARISON_METHODS,compare_models
 
 
 class ModelEvaluation:
@@ -13,13 +15,22 @@ class ModelEvaluation:
     def __init__(self,model_evaluation_config:ModelEvaluationConfig,
                       data_ingestion_artifact:DataIngestionArtifact,
                       data_validation_artifact:DataValidationArtifact,
-                      model_trainer_artifact:ModelTrainerArtifact)->None:
+                      model_trainer_artifact:ModelTrainerArtifact,
+                      data_transformation_artifact:DataTransformationArtifact=None)->None:
+        """
+        data_transformation_artifact: lets models whose preprocessing object is
+        the one saved by DataTransformation predict on the transformed arrays
+        instead of transforming the ingested data again.
+        """
         try:
             logging.info(f"{'<<'*20} Model Evaluation log Started {'>>'*20}")
+            if model_evaluation_config.comparison_method not in COMPARISON_METHODS:
+                raise Exception(f'comparison_method must be one of {COMPARISON_METHODS}, got [{model_evaluation_config.comparison_method}]')
             self.model_evaluation_config=model_evaluation_config
             self.data_ingestion_artifact=data_ingestion_artifact
             self.data_validation_artifact=data_validation_artifact
             self.model_trainer_artifact=model_trainer_artifact
+            self.data_transformation_artifact=data_transformation_artifact
             print("model_evaluation_config:",model_evaluation_config)
         except Exception as e:
             raise SalesException(e,sys) from e 
@@ -78,25 +89,155 @@ class ModelEvaluation:
         except Exception as e:
             raise SalesException(e,sys) from e                                  
 
-    def initiate_model_evaluation(self)->ModelEvaluationArtifact:
+    def load_evaluation_data(self)->tuple:
+        """
+        Train and test features and targets; only needs the ingestion and
+        validation artifacts, so it can run while the model is still training.
+        return: (feature_train_df, target_train_arr, feature_test_df, target_test_arr)
+        """
         try:
-            
             train_file_path=self.data_ingestion_artifact.train_file_path
             test_file_path=self.data_ingestion_artifact.test_file_path
             schema_file_path=self.data_validation_artifact.schema_file_path
 
-            train_df=load_data(file_path=train_file_path,schema_file_path=schema_file_path)
-            test_df=load_data(file_path=test_file_path,schema_file_path=schema_file_path)
-
             schema_content=read_yaml_file(file_path=schema_file_path)
             target_columns=[schema_content[TARGET_COLUMNS]]
             id_columns=schema_content[ID_COLUMNS]
+            columns=[col for col in schema_content[COLUMNS] if col not in id_columns]
 
-            feature_train_df=train_df.drop(columns=id_columns+target_columns,axis=1)
+            train_df=load_data(file_path=train_file_path,schema_file_path=schema_file_path,columns=columns)
+            test_df=load_data(file_path=test_file_path,schema_file_path=schema_file_path,columns=columns)
+
+            feature_train_df=train_df.drop(columns=target_columns)
             target_train_arr=np.array(train_df[target_columns])
 
-            feature_test_df=test_df.drop(columns=id_columns+target_columns,axis=1)
+            feature_test_df=test_df.drop(columns=target_columns)
             target_test_arr=np.array(test_df[target_columns])
+            return feature_train_df,target_train_arr,feature_test_df,target_test_arr
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    @staticmethod
+    def get_preprocessing_hash(model)->str:
+        """
+        Content hash of the preprocessing object of a model, None for a model
+        without one (it is then given the raw features).
+        """
+        try:
+            preprocessing_object=getattr(model,'preprocessing_object',None)
+            if preprocessing_object is None:
+                return None
+            return joblib.hash(preprocessing_object)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def load_transformed_data(self,n_train:int,n_test:int)->tuple:
+        """
+        Train and test features saved by DataTransformation, memory-mapped, with
+        the hash of the preprocessing object that produced them.
+        return: (preprocessing hash, train features, test features), or None when
+        there is no transformation artifact or it does not match the evaluation data
+        """
+        try:
+            data_transformation_artifact=self.data_transformation_artifact
+            if data_transformation_artifact is None:
+                return None
+            arrays=[]
+            for features_file_path,target_file_path in [
+                (data_transformation_artifact.transformed_train_file_path,
+                 getattr(data_transformation_artifact,'transformed_train_target_file_path',None)),
+                (data_transformation_artifact.transformed_test_file_path,
+                 getattr(data_transformation_artifact,'transformed_test_target_file_path',None))]:
+                features=load_numpy_array_data(file_path=features_file_path,mmap_mode='r')
+                if target_file_path is None:
+                    features,_=split_features_target(array=features)
+                arrays.append(features)
+            train_arr,test_arr=arrays
+            if train_arr.shape[0]!=n_train or test_arr.shape[0]!=n_test:
+                logging.info(f"Transformed arrays {train_arr.shape}/{test_arr.shape} do not match the evaluation data, not reused")
+                return None
+            preprocessing_object=load_object(file_path=data_transformation_artifact.preprocessed_object_file_path)
+            return joblib.hash(preprocessing_object),train_arr,test_arr
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_predictions(self,model_list:list,feature_train_df,feature_test_df)->list:
+        """
+        Train and test predictions of every model from one predict call on the
+        stacked train and test rows. The rows are transformed once per distinct
+        preprocessing object, and not at all for the one DataTransformation used.
+        return: [(train prediction, test prediction)] in model_list order
+        """
+        try:
+            n_train=len(feature_train_df)
+            transformed_features={}
+            transformed_data=self.load_transformed_data(n_train=n_train,n_test=len(feature_test_df))
+            if transformed_data is not None:
+                preprocessing_hash,train_arr,test_arr=transformed_data
+                transformed_features[preprocessing_hash]=stack_rows(parts=[train_arr,test_arr])
+
+            raw_features=None
+            predictions=[]
+            for model in model_list:
+                preprocessing_hash=self.get_preprocessing_hash(model=model)
+                if preprocessing_hash not in transformed_features:
+                    if raw_features is None:
+                        raw_features=stack_rows(parts=[feature_train_df,feature_test_df])
+                if preprocessing_hash is None:
+                    y_pred=model.predict(raw_features)
+                else:
+                    if preprocessing_hash not in transformed_features:
+                        logging.info(f"Transforming evaluation data for preprocessing object [{preprocessing_hash}]")
+                        transformed_features[preprocessing_hash]=model.preprocessing_object.transform(raw_features)
+                    else:
+                        logging.info(f"Reusing transformed evaluation data of preprocessing object [{preprocessing_hash}]")
+                    y_pred=model.trained_model_object.predict(transformed_features[preprocessing_hash])
+                y_pred=np.asarray(y_pred)
+                predictions.append((y_pred[:n_train],y_pred[n_train:]))
+            return predictions
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def compare_with_bootstrap(self,predictions:list,target_test_arr:np.ndarray,
+                                    trained_model_file_path:str)->ModelEvaluationArtifact:
+        """
+        Accepts the trained model when the paired bootstrap confidence interval of
+        its test set improvement over the deployed model clears the configured rule,
+        so a gain within the noise of the test split does not replace the model.
+        predictions: (train prediction, test prediction) of [deployed model, trained model]
+        """
+        try:
+            model_evaluation_config=self.model_evaluation_config
+            (_,y_test_pred_base),(_,y_test_pred_new)=predictions
+            model_comparison=compare_models(y_true=target_test_arr,
+                                            y_pred_base=y_test_pred_base,
+                                            y_pred_new=y_test_pred_new,
+                                            n_resamples=model_evaluation_config.bootstrap_resamples,
+                                            confidence_level=model_evaluation_config.bootstrap_confidence_level,
+                                            acceptance_metric=model_evaluation_config.bootstrap_acceptance_metric,
+                                            min_improvement=model_evaluation_config.bootstrap_min_improvement,
+                                            random_state=model_evaluation_config.bootstrap_random_state,
+                                            n_jobs=model_evaluation_config.bootstrap_n_jobs)
+            model_evaluation_artifact=ModelEvaluationArtifact(evaluated_model_path=trained_model_file_path,
+                                                              is_model_accepted=model_comparison.is_better,
+                                                              model_comparison=model_comparison)
+            if model_comparison.is_better:
+                self.update_evaluation_report(model_evaluation_artifact)
+                logging.info(f"Model accepted. Model eval artifact {model_evaluation_artifact} created")
+            else:
+                logging.info("Improvement of trained model is within the bootstrap confidence interval hence not accepting trained model")
+            return model_evaluation_artifact
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def initiate_model_evaluation(self,evaluation_data:tuple=None)->ModelEvaluationArtifact:
+        """
+        evaluation_data: the result of load_evaluation_data if it was already loaded
+        """
+        try:
+            if evaluation_data is None:
+                evaluation_data=self.load_evaluation_data()
+            feature_train_df,target_train_arr,feature_test_df,target_test_arr=evaluation_data
 
             trained_model_file_path=self.model_trainer_artifact.trained_model_file_path
             trained_model_object=load_object(file_path=trained_model_file_path)
@@ -106,11 +247,15 @@ class ModelEvaluation:
             if model is None:
                 logging.info("Not found any existing model. Hence accepting trained model")
                 model_evaluation_artifact=ModelEvaluationArtifact(is_model_accepted=True,
-                                        evaluated_model_path=trained_model_file_path)
+                                        evaluated_model_path=trained_model_file_path,
+                                        model_comparison=None)
                 self.update_evaluation_report(model_evaluation_artifact=model_evaluation_artifact)                        
                 return model_evaluation_artifact
 
             model_list=[model,trained_model_object]
+            predictions=self.get_predictions(model_list=model_list,
+                                             feature_train_df=feature_train_df,
+                                             feature_test_df=feature_test_df)
 
             metric_info_artifact = evaluate_regression_model(model_list=model_list,
                                                              X_train=feature_train_df,
@@ -118,22 +263,30 @@ class ModelEvaluation:
                                                              X_test=feature_test_df,
                                                              y_test=target_test_arr,
                                                              base_accuracy=self.model_trainer_artifact.model_accuracy,
+                                                             predictions=predictions,
                                                             )        
             logging.info(f"Model evaluation completed. model metric artifact: {metric_info_artifact}")
 
+            if self.model_evaluation_config.comparison_method=='bootstrap':
+                return self.compare_with_bootstrap(predictions=predictions,target_test_arr=target_test_arr,
+                                                   trained_model_file_path=trained_model_file_path)
+
             if metric_info_artifact is None:
-                return ModelEvaluationArtifact(is_model_accepted=True,evaluated_model_path=trained_model_file_path)
+                return ModelEvaluationArtifact(is_model_accepted=True,evaluated_model_path=trained_model_file_path,
+                                               model_comparison=None)
             
             if metric_info_artifact.index_number == 1:
                 model_evaluation_artifact = ModelEvaluationArtifact(evaluated_model_path=trained_model_file_path,
-                                                                    is_model_accepted=True)
+                                                                    is_model_accepted=True,
+                                                                    model_comparison=None)
                 self.update_evaluation_report(model_evaluation_artifact)
                 logging.info(f"Model accepted. Model eval artifact {model_evaluation_artifact} created")
 
             else:
                 logging.info("Trained model is no better than existing model hence not accepting trained model")
                 model_evaluation_artifact = ModelEvaluationArtifact(evaluated_model_path=trained_model_file_path,
-                                                                    is_model_accepted=False)
+                                                                    is_model_accepted=False,
+                                                                    model_comparison=None)
             return model_evaluation_artifact
 
         except Exception as e:
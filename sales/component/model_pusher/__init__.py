@@ -2,22 +2,40 @@ import os,sys
 from sales.logger import logging
 from sales.exception import SalesException
 from sales.entity.config_entity import ModelPusherConfig
-from sales.entity.artifact_entity import ModelEvaluationArtifact,ModelPusherArtifact
+from sales.entity.artifact_entity import ModelEvaluationArtifact,ModelPusherArtifact,ModelTrainerArtifact,DataValidationArtifact
+from sales.serving.compiled_model import export_compiled_model
+from sales.serving.model_artifact import save_model_artifact
+from sales.util import load_object
 import shutil
 
 class ModelPusher:
 
     def __init__(self,model_pusher_config:ModelPusherConfig,
-                      model_evaluation_artifact:ModelEvaluationArtifact)-> None:
+                      model_evaluation_artifact:ModelEvaluationArtifact,
+                      model_trainer_artifact:ModelTrainerArtifact=None,
+                      data_validation_artifact:DataValidationArtifact=None)-> None:
+        """
+        model_trainer_artifact, data_validation_artifact: optional, give the metrics
+        and the schema hash recorded in the exported model manifest.
+        """
         try:
             logging.info(f"{'<<'*20} Model pusher log started{'>>'*20}")
             self.model_pusher_config=model_pusher_config
             self.model_evaluation_artifact=model_evaluation_artifact
+            self.model_trainer_artifact=model_trainer_artifact
+            self.data_validation_artifact=data_validation_artifact
             print("model_pusher_config:",model_pusher_config)
         except Exception as e:
             raise SalesException(e,sys) from e              
 
 
+    def get_model_metrics(self)->dict:
+        model_trainer_artifact=self.model_trainer_artifact
+        if model_trainer_artifact is None:
+            return {}
+        return {name:float(getattr(model_trainer_artifact,name))
+                for name in ['train_rmse','test_rmse','train_accuracy','test_accuracy','model_accuracy']}
+
     def export_model(self)->ModelPusherArtifact:
         try:
             evaluated_model_file_path=self.model_evaluation_artifact.evaluated_model_path
@@ -26,7 +44,20 @@ class ModelPusher:
 
             export_dir_file_path=os.path.join(export_dir,file_name)
             os.makedirs(export_dir,exist_ok=True)
-            shutil.copy(src=evaluated_model_file_path,dst=export_dir_file_path)
+
+            # the compiled plan and the model artifact go first so they are in place
+            # when the model file appears; the artifact's manifest is written last
+            model=load_object(file_path=evaluated_model_file_path)
+            schema_file_path=self.data_validation_artifact.schema_file_path if self.data_validation_artifact is not None else None
+            export_compiled_model(model=model,dir_path=export_dir,schema_file_path=schema_file_path)
+            save_model_artifact(model=model,dir_path=export_dir,metrics=self.get_model_metrics(),
+                                schema_file_path=schema_file_path)
+
+            # copy under a temporary name and rename, so a serving process watching
+            # the export dir never picks up a half written model file
+            temp_file_path=f'{export_dir_file_path}.tmp'
+            shutil.copy(src=evaluated_model_file_path,dst=temp_file_path)
+            os.replace(temp_file_path,export_dir_file_path)
 
             model_pusher_artifact=ModelPusherArtifact(is_model_pusher=True, export_model_file_path=export_dir_file_path)
             
@@ -37,6 +68,11 @@ class ModelPusher:
 
     def initiate_model_pusher(self)->ModelPusherArtifact:
         try:
+            if not self.model_evaluation_artifact.is_model_accepted:
+                # evaluated_model_path is the trained model either way; exporting a
+                # rejected one would put it into service through the registry watcher
+                logging.info(f'Model not accepted by evaluation, nothing to push: {self.model_evaluation_artifact}')
+                return ModelPusherArtifact(is_model_pusher=False,export_model_file_path=None)
             return self.export_model()
         except Exception as e:
             raise SalesException(e,sys) from e        
\ No newline at end of file
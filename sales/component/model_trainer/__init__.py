@@ -3,9 +3,12 @@ from sales.entity.model_factory import ModelFactory
 from sales.logger import logging
 from sales.exception import SalesException
 from sales.entity.config_entity import ModelTrainerConfig
-from sales.entity.artifact_entity import DataTransformationArtifact,ModelTrainerArtifact
-from sales.util import load_numpy_array_data
+from sales.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact,DataTransformationArtifact,ModelTrainerArtifact
+from sales.util import load_numpy_array_data,split_features_target,get_peak_rss_bytes,reset_peak_rss
 from sales.entity.model_factory import *
+from sales.entity.fold_preprocessing_cache import FoldPreprocessingCache
+from sales.component.data_transformation import DataTransformation
+from sales.constant import *
 
 class HousingEstimatorModel:
     def __init__(self, preprocessing_object, trained_model_object):
@@ -36,28 +39,77 @@ class HousingEstimatorModel:
 class ModelTrainer:
 
     def __init__(self,model_trainer_config:ModelTrainerConfig,
-                      data_transformation_artifact:DataTransformationArtifact)->None:
+                      data_transformation_artifact:DataTransformationArtifact,
+                      data_ingestion_artifact:DataIngestionArtifact=None,
+                      data_validation_artifact:DataValidationArtifact=None)->None:
+        """
+        data_ingestion_artifact, data_validation_artifact: needed for the fold
+        preprocessing cache, which refits the preprocessing on the raw training
+        data of every CV fold. Without them the search runs on the transformed arrays.
+        """
         try:
             logging.info(f"{'<<'*20} Model Trainer log started {'>>'*20}")
             self.model_trainer_config=model_trainer_config
             self.data_transformation_artifact=data_transformation_artifact
+            self.data_ingestion_artifact=data_ingestion_artifact
+            self.data_validation_artifact=data_validation_artifact
             print(f'model_trainer_config:{model_trainer_config}')
         except Exception as e:
             raise SalesException(e,sys) from e
 
+    def get_fold_preprocessing_cache(self)->FoldPreprocessingCache:
+        try:
+            if not self.model_trainer_config.fold_cache_enabled:
+                return None
+            if self.data_ingestion_artifact is None or self.data_validation_artifact is None:
+                logging.info("Fold preprocessing cache disabled: ingestion and validation artifacts not given")
+                return None
+
+            schema_file_path=self.data_validation_artifact.schema_file_path
+            schema_data=read_yaml_file(file_path=schema_file_path)
+            excluded_columns=schema_data[ID_COLUMNS]+[schema_data[TARGET_COLUMNS]]
+            feature_train_df=load_data(file_path=self.data_ingestion_artifact.train_file_path,schema_file_path=schema_file_path,
+                                       columns=[col for col in schema_data[COLUMNS] if col not in excluded_columns])
+
+            data_transformation=DataTransformation(data_transformation_config=None,
+                                                   data_ingestion_artifact=self.data_ingestion_artifact,
+                                                   data_validation_artifact=self.data_validation_artifact)
+            return FoldPreprocessingCache(preprocessor=data_transformation.get_data_transformer_object(),
+                                          X=feature_train_df,
+                                          max_memory_bytes=self.model_trainer_config.fold_cache_max_memory_bytes,
+                                          spill_dir=self.model_trainer_config.fold_cache_dir)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def load_features_target(self,features_file_path:str,target_file_path:str=None)->tuple:
+        """
+        Loads the transformed features and target, memory-mapped with the
+        configured mmap_mode. Artifacts without a target file hold the target as
+        the last column of the features.
+        return: (features, target)
+        """
+        try:
+            mmap_mode=self.model_trainer_config.mmap_mode
+            features=load_numpy_array_data(file_path=features_file_path,mmap_mode=mmap_mode)
+            if target_file_path is None:
+                return split_features_target(array=features)
+            return features,load_numpy_array_data(file_path=target_file_path,mmap_mode=mmap_mode)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
     def initiate_model_trainer(self)->ModelTrainerArtifact:
         try:
+            reset_peak_rss()
 
             logging.info(f"Loading transformed training dataset")
-            transformed_train_file_path=self.data_transformation_artifact.transformed_train_file_path
-            train_array=load_numpy_array_data(file_path=transformed_train_file_path)
+            X_train,y_train=self.load_features_target(
+                features_file_path=self.data_transformation_artifact.transformed_train_file_path,
+                target_file_path=getattr(self.data_transformation_artifact,'transformed_train_target_file_path',None))
 
             logging.info(f"Loading transformed testing dataset")
-            transformed_test_file_path=self.data_transformation_artifact.transformed_test_file_path
-            test_array=load_numpy_array_data(file_path=transformed_test_file_path)
-
-            X_train,X_test=train_array[:,:-1],test_array[:,:-1]
-            y_train,y_test=train_array[:,-1],test_array[:,-1]
+            X_test,y_test=self.load_features_target(
+                features_file_path=self.data_transformation_artifact.transformed_test_file_path,
+                target_file_path=getattr(self.data_transformation_artifact,'transformed_test_target_file_path',None))
 
             model_config_file_path=self.model_trainer_config.model_config_file_path
             base_accuracy=self.model_trainer_config.base_accuracy
@@ -67,7 +119,14 @@ class ModelTrainer:
 
             logging.info(f"Expected accuracy: {base_accuracy}")
 
-            best_model=model_factory.get_best_model(X=X_train,y=y_train,base_accuracy=base_accuracy)
+            fold_preprocessing_cache=self.get_fold_preprocessing_cache()
+            try:
+                best_model=model_factory.get_best_model(X=X_train,y=y_train,base_accuracy=base_accuracy,
+                                                        fold_preprocessing_cache=fold_preprocessing_cache)
+            finally:
+                if fold_preprocessing_cache is not None:
+                    logging.info(f"Fold preprocessing cache: {fold_preprocessing_cache.stats()}")
+                    fold_preprocessing_cache.clear()
 
             logging.info(f"Best model found on training dataset: {best_model}")
 
@@ -77,7 +136,9 @@ class ModelTrainer:
             model_list=[model.best_model for model in grid_searched_best_model_list]
 
             logging.info(f"Evaluation all trained model on training and testing dataset both")
-            metric_info:MetricInfoArtifact = evaluate_regression_model(model_list=model_list,X_train=X_train,y_train=y_train,X_test=X_test,y_test=y_test,base_accuracy=base_accuracy)
+            model_metrics:List[ModelMetrics]=[]
+            metric_info:MetricInfoArtifact = evaluate_regression_model(model_list=model_list,X_train=X_train,y_train=y_train,X_test=X_test,y_test=y_test,base_accuracy=base_accuracy,
+                                                                       n_jobs=model_factory.evaluation_n_jobs,metrics_table=model_metrics)
             
             preprocessing_obj=  load_object(file_path=self.data_transformation_artifact.preprocessed_object_file_path)
             model_object = metric_info.model_object
@@ -93,8 +154,12 @@ class ModelTrainer:
             test_rmse=metric_info.test_rmse,
             train_accuracy=metric_info.train_accuracy,
             test_accuracy=metric_info.test_accuracy,
-            model_accuracy=metric_info.model_accuracy)
+            model_accuracy=metric_info.model_accuracy,
+            model_search_report=model_factory.model_search_report_list,
+            peak_rss_bytes=get_peak_rss_bytes(),
+            model_metrics=model_metrics)
 
+            logging.info(f"Model trainer peak RSS: {model_trainer_artifact.peak_rss_bytes} bytes")
             logging.info(f"Model Trainer Artifact: {model_trainer_artifact}")
             return model_trainer_artifact
 
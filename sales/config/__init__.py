@@ -1,7 +1,7 @@
 import os,sys
 from sales.exception import SalesException
 from sales.constant import *
-from sales.entity.config_entity import DataIngestionConfig, DataTransformationConfig,ModelPusherConfig,TrainingPipelineConfig,DataValidationConfig,DataTransformationConfig,ModelTrainerConfig,ModelEvaluationConfig
+from sales.entity.config_entity import DataIngestionConfig, DataTransformationConfig,ModelPusherConfig,TrainingPipelineConfig,DataValidationConfig,DataTransformationConfig,ModelTrainerConfig,ModelEvaluationConfig,ModelServingConfig
 from sales.util import read_yaml_file
 from sales.logger import logging
 from datetime import datetime
@@ -33,10 +33,32 @@ class Configuration:
             ingested_dir=os.path.join(data_ingestion_artifact_dir,data_ingestion_info[DATA_INGESTION_INGESTED_DIR_KEY])
             ingested_train_dir=os.path.join(ingested_dir,data_ingestion_info[DATA_INGESTION_INGESTED_TRAIN_DIR_KEY])
             ingested_test_dir=os.path.join(ingested_dir,data_ingestion_info[DATA_INGESTION_INGESTED_TEST_DIR_KEY])                                         
+
+            data_validation_info=self.config_info[DATA_VALIDATION_CONFIG_KEY]
+            schema_file_path=os.path.join(ROOT_DIR,
+                                          data_validation_info[DATA_VALIDATION_SCHEMA_DIR_KEY],
+                                          data_validation_info[DATA_VALIDATION_SCHEMA_FILE_NAME_KEY])
+
+            # the incremental store is not time stamped: it grows across pipeline runs
+            incremental_dir=os.path.join(artifact_dir,DATA_INGESTION_ARTIFACT,
+                                         data_ingestion_info.get(DATA_INGESTION_INCREMENTAL_DIR_KEY,'incremental'))
+            incremental_ingested_dir=os.path.join(incremental_dir,data_ingestion_info[DATA_INGESTION_INGESTED_DIR_KEY])
             
             data_ingestion_config=DataIngestionConfig(raw_data_dir=raw_data_dir,
                                 ingested_train_dir=ingested_train_dir,
-                                ingested_test_dir=ingested_test_dir)
+                                ingested_test_dir=ingested_test_dir,
+                                data_format=data_ingestion_info.get(DATA_INGESTION_DATA_FORMAT_KEY,'csv'),
+                                schema_file_path=schema_file_path,
+                                incremental_enabled=data_ingestion_info.get(DATA_INGESTION_INCREMENTAL_ENABLED_KEY,False),
+                                source_dir=os.path.join(ROOT_DIR,data_ingestion_info.get(DATA_INGESTION_SOURCE_DIR_KEY,'source_data')),
+                                incremental_raw_data_dir=os.path.join(incremental_dir,data_ingestion_info[DATA_INGESTION_RAW_DATA_DIR_KEY]),
+                                incremental_train_dir=os.path.join(incremental_ingested_dir,data_ingestion_info[DATA_INGESTION_INGESTED_TRAIN_DIR_KEY]),
+                                incremental_test_dir=os.path.join(incremental_ingested_dir,data_ingestion_info[DATA_INGESTION_INGESTED_TEST_DIR_KEY]),
+                                manifest_file_path=os.path.join(incremental_dir,
+                                                                data_ingestion_info.get(DATA_INGESTION_MANIFEST_FILE_NAME_KEY,'manifest.json')),
+                                test_size=float(data_ingestion_info.get(DATA_INGESTION_TEST_SIZE_KEY,0.3)),
+                                split_key_columns=data_ingestion_info.get(DATA_INGESTION_SPLIT_KEY_COLUMNS_KEY),
+                                source=data_ingestion_info.get(DATA_INGESTION_SOURCE_KEY))
 
             logging.info(f'Data ingestion config:{data_ingestion_config}')
             return data_ingestion_config                    
@@ -64,10 +86,25 @@ class Configuration:
             report_page_file_path=os.path.join(data_validation_artifact_dir,
                                                data_validation_info[DATA_VALIDATION_REPORT_PAGE_FILE_NAME_KEY])                            
 
+            stats_file_path=os.path.join(data_validation_artifact_dir,
+                                         data_validation_info.get(DATA_VALIDATION_STATS_FILE_NAME_KEY,'stats.json'))
             
+            drift_sample_rows=data_validation_info.get(DATA_VALIDATION_DRIFT_SAMPLE_ROWS_KEY)
+            if drift_sample_rows is not None:
+                drift_sample_rows=int(drift_sample_rows)
+
             data_validation_config=DataValidationConfig(schema_file_path=schema_file_path,
                                                         report_file_path=report_file_path,
-                                                        report_page_file_path=report_page_file_path)
+                                                        report_page_file_path=report_page_file_path,
+                                                        stats_file_path=stats_file_path,
+                                                        streaming_enabled=data_validation_info.get(DATA_VALIDATION_STREAMING_ENABLED_KEY,False),
+                                                        chunk_size=int(data_validation_info.get(DATA_VALIDATION_CHUNK_SIZE_KEY,100000)),
+                                                        max_distinct_values=int(data_validation_info.get(DATA_VALIDATION_MAX_DISTINCT_VALUES_KEY,10000)),
+                                                        report_sample_rows=int(data_validation_info.get(DATA_VALIDATION_REPORT_SAMPLE_ROWS_KEY,100000)),
+                                                        drift_backend=data_validation_info.get(DATA_VALIDATION_DRIFT_BACKEND_KEY,'native'),
+                                                        drift_sample_rows=drift_sample_rows,
+                                                        drift_threshold=float(data_validation_info.get(DATA_VALIDATION_DRIFT_THRESHOLD_KEY,0.05)),
+                                                        drift_categorical_method=data_validation_info.get(DATA_VALIDATION_DRIFT_CATEGORICAL_METHOD_KEY,'chi2'))
 
             logging.info(f"data_validation_config:{data_validation_config}") 
 
@@ -96,7 +133,8 @@ class Configuration:
 
             data_transformation_config=DataTransformationConfig(transformed_train_dir=transformed_train_dir,
                                      transformed_test_dir=transformed_test_dir, 
-                                     preprocessed_object_file_path=preprocessed_object_file_path)
+                                     preprocessed_object_file_path=preprocessed_object_file_path,
+                                     feature_array_order=data_validation_info.get(DATA_TRANSFORMATION_FEATURE_ARRAY_ORDER_KEY,'C'))
             
             logging.info(f"data_transformation_config:{data_transformation_config}")
 
@@ -118,12 +156,21 @@ class Configuration:
             config_dir=model_trainer_info[MODEL_TRAINER_MODEL_CONFIG_DIR_KEY]
             config_file_name=model_trainer_info[MODEL_TRAINER_MODEL_CONFIG_FILE_NAME_KEY]
 
+            fold_cache_enabled=model_trainer_info.get(MODEL_TRAINER_FOLD_CACHE_ENABLED_KEY,False)
+            fold_cache_max_memory_mb=model_trainer_info.get(MODEL_TRAINER_FOLD_CACHE_MAX_MEMORY_MB_KEY,512)
+            fold_cache_dir=model_trainer_info.get(MODEL_TRAINER_FOLD_CACHE_DIR_KEY,'fold_cache')
+
             trained_model_file_path=os.path.join(model_trainer_artifact_dir,trained_model_dir,trained_model_file_name)
             model_config_file_path=os.path.join(config_dir,config_file_name)
+            fold_cache_dir=os.path.join(model_trainer_artifact_dir,fold_cache_dir)
 
             model_trainer_config=ModelTrainerConfig(trained_model_file_path=trained_model_file_path, 
                                base_accuracy=base_accuracy, 
-                               model_config_file_path=model_config_file_path)
+                               model_config_file_path=model_config_file_path,
+                               fold_cache_enabled=fold_cache_enabled,
+                               fold_cache_max_memory_bytes=int(fold_cache_max_memory_mb*1024*1024),
+                               fold_cache_dir=fold_cache_dir,
+                               mmap_mode=model_trainer_info.get(MODEL_TRAINER_MMAP_MODE_KEY,'r'))
 
             logging.info(f"model_trainer_config:{model_trainer_config}")
             return model_trainer_config                   
@@ -142,7 +189,14 @@ class Configuration:
             model_evaluation_file_path=os.path.join(model_evaluation_artifact_dir,model_evaluation_info[MODEL_EVALUATION_FILE_NAME_KEY])
 
             model_evaluation_config=ModelEvaluationConfig(model_evaluation_file_path=model_evaluation_file_path,
-                                 timestamp=self.time_stamp)
+                                 timestamp=self.time_stamp,
+                                 comparison_method=model_evaluation_info.get(MODEL_EVALUATION_COMPARISON_METHOD_KEY,'harmonic_mean'),
+                                 bootstrap_resamples=int(model_evaluation_info.get(MODEL_EVALUATION_BOOTSTRAP_RESAMPLES_KEY,2000)),
+                                 bootstrap_confidence_level=float(model_evaluation_info.get(MODEL_EVALUATION_BOOTSTRAP_CONFIDENCE_LEVEL_KEY,0.95)),
+                                 bootstrap_acceptance_metric=model_evaluation_info.get(MODEL_EVALUATION_BOOTSTRAP_ACCEPTANCE_METRIC_KEY,'r2'),
+                                 bootstrap_min_improvement=float(model_evaluation_info.get(MODEL_EVALUATION_BOOTSTRAP_MIN_IMPROVEMENT_KEY,0.0)),
+                                 bootstrap_n_jobs=model_evaluation_info.get(MODEL_EVALUATION_BOOTSTRAP_N_JOBS_KEY,-1),
+                                 bootstrap_random_state=model_evaluation_info.get(MODEL_EVALUATION_BOOTSTRAP_RANDOM_STATE_KEY,42))
             logging.info(f'model_evaluation_config:{model_evaluation_config}')   
             return model_evaluation_config                  
             
@@ -163,7 +217,58 @@ class Configuration:
             return model_pusher_config
 
         except Exception as e:
-            raise SalesException(e,sys) from e        
+            raise SalesException(e,sys) from e
+
+    def get_model_serving_config(self)->ModelServingConfig:
+        try:
+            model_serving_info=self.config_info[MODEL_SERVING_CONFIG_KEY]
+
+            model_dir=os.path.join(ROOT_DIR,model_serving_info[MODEL_SERVING_MODEL_DIR_KEY])
+            model_file_name=model_serving_info[MODEL_SERVING_MODEL_FILE_NAME_KEY]
+            model_poll_interval_s=float(model_serving_info[MODEL_SERVING_MODEL_POLL_INTERVAL_KEY])
+            warmup_file_path=model_serving_info.get(MODEL_SERVING_WARMUP_FILE_PATH_KEY)
+            if warmup_file_path is not None:
+                warmup_file_path=os.path.join(ROOT_DIR,warmup_file_path)
+            warmup_rows=int(model_serving_info.get(MODEL_SERVING_WARMUP_ROWS_KEY,100))
+            compiled_model_enabled=bool(model_serving_info.get(MODEL_SERVING_COMPILED_MODEL_ENABLED_KEY,True))
+            model_mmap_mode=model_serving_info.get(MODEL_SERVING_MODEL_MMAP_MODE_KEY,'r')
+            schema_file_path=os.path.join(ROOT_DIR,
+                                          model_serving_info[MODEL_SERVING_SCHEMA_DIR_KEY],
+                                          model_serving_info[MODEL_SERVING_SCHEMA_FILE_NAME_KEY])
+            batch_chunk_size=int(model_serving_info[MODEL_SERVING_BATCH_CHUNK_SIZE_KEY])
+            batch_max_rows=int(model_serving_info[MODEL_SERVING_BATCH_MAX_ROWS_KEY])
+            batch_max_payload_bytes=int(model_serving_info[MODEL_SERVING_BATCH_MAX_PAYLOAD_MB_KEY]*1024*1024)
+            micro_batch_enabled=bool(model_serving_info.get(MODEL_SERVING_MICRO_BATCH_ENABLED_KEY,False))
+            micro_batch_max_size=int(model_serving_info.get(MODEL_SERVING_MICRO_BATCH_MAX_SIZE_KEY,32))
+            micro_batch_max_wait_ms=float(model_serving_info.get(MODEL_SERVING_MICRO_BATCH_MAX_WAIT_MS_KEY,3))
+            asgi_executor=model_serving_info.get(MODEL_SERVING_ASGI_EXECUTOR_KEY,'thread')
+            asgi_max_workers=int(model_serving_info.get(MODEL_SERVING_ASGI_MAX_WORKERS_KEY,4))
+            asgi_max_pending=int(model_serving_info.get(MODEL_SERVING_ASGI_MAX_PENDING_KEY,64))
+
+            model_serving_config=ModelServingConfig(model_dir=model_dir,
+                                                    model_file_name=model_file_name,
+                                                    model_poll_interval_s=model_poll_interval_s,
+                                                    warmup_file_path=warmup_file_path,
+                                                    warmup_rows=warmup_rows,
+                                                    compiled_model_enabled=compiled_model_enabled,
+                                                    model_mmap_mode=model_mmap_mode,
+                                                    schema_file_path=schema_file_path,
+                                                    batch_chunk_size=batch_chunk_size,
+                                                    batch_max_rows=batch_max_rows,
+                                                    batch_max_payload_bytes=batch_max_payload_bytes,
+                                                    micro_batch_enabled=micro_batch_enabled,
+                                                    micro_batch_max_size=micro_batch_max_size,
+                                                    micro_batch_max_wait_ms=micro_batch_max_wait_ms,
+                                                    asgi_executor=asgi_executor,
+                                                    asgi_max_workers=asgi_max_workers,
+                                                    asgi_max_pending=asgi_max_pending)
+
+            logging.info(f'model_serving_config:{model_serving_config}')
+
+            return model_serving_config
+
+        except Exception as e:
+            raise SalesException(e,sys) from e
 
     def get_training_pipeline_config(self)->TrainingPipelineConfig:
         try:
@@ -171,7 +276,12 @@ class Configuration:
             pipeline_name=training_pipeline_info[TRAINING_PIPELINE_NAME_KEY]
             artifact=training_pipeline_info[TRAINING_PIPELINE_ARTIFACT_DIR_KEY]
             artifact_dir=os.path.join(ROOT_DIR,pipeline_name,artifact)
-            training_pipeline_config=TrainingPipelineConfig(artifact_dir=artifact_dir)
+            stage_cache_dir=os.path.join(artifact_dir,training_pipeline_info.get(TRAINING_PIPELINE_STAGE_CACHE_DIR_KEY,'stage_cache'))
+            training_pipeline_config=TrainingPipelineConfig(artifact_dir=artifact_dir,
+                                     stage_cache_enabled=training_pipeline_info.get(TRAINING_PIPELINE_STAGE_CACHE_ENABLED_KEY,False),
+                                     stage_cache_dir=stage_cache_dir,
+                                     executor=training_pipeline_info.get(TRAINING_PIPELINE_EXECUTOR_KEY,'serial'),
+                                     max_workers=int(training_pipeline_info.get(TRAINING_PIPELINE_MAX_WORKERS_KEY,1)))
             logging.info(f'Training Pipeline Config:{training_pipeline_config}')
             return training_pipeline_config
         except Exception as e:
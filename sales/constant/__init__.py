@@ -13,6 +13,12 @@ CURRENT_TIME_STAMP=datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
 TRAINING_PIPELINE_CONFIG_KEY="training_pipeline_config"
 TRAINING_PIPELINE_NAME_KEY="pipeline_name"
 TRAINING_PIPELINE_ARTIFACT_DIR_KEY="artifact_dir"
+TRAINING_PIPELINE_STAGE_CACHE_ENABLED_KEY="stage_cache_enabled"
+TRAINING_PIPELINE_STAGE_CACHE_DIR_KEY="stage_cache_dir"
+TRAINING_PIPELINE_EXECUTOR_KEY="executor"
+TRAINING_PIPELINE_MAX_WORKERS_KEY="max_workers"
+PIPELINE_ARTIFACT="pipeline"
+PIPELINE_STAGE_TIMINGS_FILE_NAME="stage_timings.json"
 
 # Data Ingestion related variable
 DATA_INGESTION_CONFIG_KEY="data_ingestion_config"
@@ -20,6 +26,14 @@ DATA_INGESTION_RAW_DATA_DIR_KEY="raw_data_dir"
 DATA_INGESTION_INGESTED_DIR_KEY="ingested_dir"
 DATA_INGESTION_INGESTED_TRAIN_DIR_KEY="ingested_train_dir"
 DATA_INGESTION_INGESTED_TEST_DIR_KEY="ingested_test_dir"
+DATA_INGESTION_DATA_FORMAT_KEY="data_format"
+DATA_INGESTION_INCREMENTAL_ENABLED_KEY="incremental_enabled"
+DATA_INGESTION_SOURCE_DIR_KEY="source_dir"
+DATA_INGESTION_INCREMENTAL_DIR_KEY="incremental_dir"
+DATA_INGESTION_MANIFEST_FILE_NAME_KEY="manifest_file_name"
+DATA_INGESTION_TEST_SIZE_KEY="test_size"
+DATA_INGESTION_SPLIT_KEY_COLUMNS_KEY="split_key_columns"
+DATA_INGESTION_SOURCE_KEY="source"
 DATA_INGESTION_ARTIFACT='data_ingestion'
 
 # Data Validation related variable
@@ -28,12 +42,22 @@ DATA_VALIDATION_SCHEMA_DIR_KEY="schema_dir"
 DATA_VALIDATION_SCHEMA_FILE_NAME_KEY="schema_file_name"
 DATA_VALIDATION_REPORT_FILE_NAME_KEY="report_file_name"
 DATA_VALIDATION_REPORT_PAGE_FILE_NAME_KEY="report_page_file_name"
+DATA_VALIDATION_STATS_FILE_NAME_KEY="stats_file_name"
+DATA_VALIDATION_STREAMING_ENABLED_KEY="streaming_enabled"
+DATA_VALIDATION_CHUNK_SIZE_KEY="chunk_size"
+DATA_VALIDATION_MAX_DISTINCT_VALUES_KEY="max_distinct_values"
+DATA_VALIDATION_REPORT_SAMPLE_ROWS_KEY="report_sample_rows"
+DATA_VALIDATION_DRIFT_BACKEND_KEY="drift_backend"
+DATA_VALIDATION_DRIFT_SAMPLE_ROWS_KEY="drift_sample_rows"
+DATA_VALIDATION_DRIFT_THRESHOLD_KEY="drift_threshold"
+DATA_VALIDATION_DRIFT_CATEGORICAL_METHOD_KEY="drift_categorical_method"
 DATA_VALIDATION_ARTIFACT='data_validation'
 
 DOMAIN_VALUE="domain_value"
 ORDINAL_CATEGORICAL_COLUMNS="ordinal_cat_columns"
 NOMINAL_CATEGORICAL_COLUMNS="nominal_cat_columns"
 NUMERICAL_COLUMNS="numerical_columns"
+CATEGORICAL_COLUMNS="categorical_columns"
 YEAR_COLUMNS="year_columns"
 ID_COLUMNS="id_columns"
 TARGET_COLUMNS="target_columns"
@@ -45,6 +69,7 @@ DATA_TRANSFORMATION_TRANSFORMED_TRAIN_DIR_KEY="transformed_train_dir"
 DATA_TRANSFORMATION_TRANSFORMED_TEST_DIR_KEY="transformed_test_dir"
 DATA_TRANSFORMATION_PREPROCESSING_DIR_KEY="preprocessing_dir"
 DATA_TRANSFORMATION_PREPROCESSING_OBJECT_FILE_NAME_KEY="preprocessed_object_file_name"
+DATA_TRANSFORMATION_FEATURE_ARRAY_ORDER_KEY="feature_array_order"
 DATA_TRANSFORMATION_ARTIFACT='data_transformation'
 
 OUTLET_AGE_COLUMN='Outlet_Age'
@@ -59,12 +84,23 @@ MODEL_TRAINER_MODEL_FILE_NAME_KEY="model_file_name"
 MODEL_TRAINER_BASE_ACCURACY_KEY="base_accuracy"
 MODEL_TRAINER_MODEL_CONFIG_DIR_KEY="model_config_dir"
 MODEL_TRAINER_MODEL_CONFIG_FILE_NAME_KEY="model_config_file_name"
+MODEL_TRAINER_FOLD_CACHE_ENABLED_KEY="fold_cache_enabled"
+MODEL_TRAINER_FOLD_CACHE_MAX_MEMORY_MB_KEY="fold_cache_max_memory_mb"
+MODEL_TRAINER_FOLD_CACHE_DIR_KEY="fold_cache_dir"
+MODEL_TRAINER_MMAP_MODE_KEY="mmap_mode"
 MODEL_TRAINER_ARTIFACT="model_trainer"
 
 # Model Evaluation related variable
 MODEL_EVALUATION_CONFIG_KEY="model_evaluation_config"
 MODEL_EVALUATION_FILE_NAME_KEY="model_evaluation_file_name"
 MODEL_EVALUATION_ARTIFACT="model_evaluation"
+MODEL_EVALUATION_COMPARISON_METHOD_KEY="comparison_method"
+MODEL_EVALUATION_BOOTSTRAP_RESAMPLES_KEY="bootstrap_resamples"
+MODEL_EVALUATION_BOOTSTRAP_CONFIDENCE_LEVEL_KEY="bootstrap_confidence_level"
+MODEL_EVALUATION_BOOTSTRAP_ACCEPTANCE_METRIC_KEY="bootstrap_acceptance_metric"
+MODEL_EVALUATION_BOOTSTRAP_MIN_IMPROVEMENT_KEY="bootstrap_min_improvement"
+MODEL_EVALUATION_BOOTSTRAP_N_JOBS_KEY="bootstrap_n_jobs"
+MODEL_EVALUATION_BOOTSTRAP_RANDOM_STATE_KEY="bootstrap_random_state"
 
 # Model Pusher related variable
 MODEL_PUSHER_CONFIG_KEY = "model_pusher_config"
@@ -74,3 +110,23 @@ BEST_MODEL_KEY = "best_model"
 HISTORY_KEY = "history"
 MODEL_PATH_KEY = "model_path"
 
+# Model Serving related variable
+MODEL_SERVING_CONFIG_KEY="model_serving_config"
+MODEL_SERVING_MODEL_DIR_KEY="model_dir"
+MODEL_SERVING_MODEL_FILE_NAME_KEY="model_file_name"
+MODEL_SERVING_MODEL_POLL_INTERVAL_KEY="model_poll_interval_s"
+MODEL_SERVING_WARMUP_FILE_PATH_KEY="warmup_file_path"
+MODEL_SERVING_WARMUP_ROWS_KEY="warmup_rows"
+MODEL_SERVING_COMPILED_MODEL_ENABLED_KEY="compiled_model_enabled"
+MODEL_SERVING_MODEL_MMAP_MODE_KEY="model_mmap_mode"
+MODEL_SERVING_SCHEMA_DIR_KEY="schema_dir"
+MODEL_SERVING_SCHEMA_FILE_NAME_KEY="schema_file_name"
+MODEL_SERVING_BATCH_CHUNK_SIZE_KEY="batch_chunk_size"
+MODEL_SERVING_BATCH_MAX_ROWS_KEY="batch_max_rows"
+MODEL_SERVING_BATCH_MAX_PAYLOAD_MB_KEY="batch_max_payload_mb"
+MODEL_SERVING_MICRO_BATCH_ENABLED_KEY="micro_batch_enabled"
+MODEL_SERVING_MICRO_BATCH_MAX_SIZE_KEY="micro_batch_max_size"
+MODEL_SERVING_MICRO_BATCH_MAX_WAIT_MS_KEY="micro_batch_max_wait_ms"
+MODEL_SERVING_ASGI_EXECUTOR_KEY="asgi_executor"
+MODEL_SERVING_ASGI_MAX_WORKERS_KEY="asgi_max_workers"
+MODEL_SERVING_ASGI_MAX_PENDING_KEY="asgi_max_pending"
@@ -0,0 +1,229 @@
+import os,sys
+import glob
+import time
+import sqlite3
+from abc import ABC,abstractmethod
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from joblib import cpu_count
+from sales.exception import SalesException
+from sales.logger import logging
+import pandas as pd
+
+SOURCE_TYPE_KEY = 'type'
+SOURCE_PATH_KEY = 'path'
+SOURCE_PATTERN_KEY = 'pattern'
+SOURCE_N_JOBS_KEY = 'n_jobs'
+SOURCE_CONNECTION_KEY = 'connection'
+SOURCE_QUERY_KEY = 'query'
+SOURCE_TABLE_KEY = 'table'
+SOURCE_BATCH_SIZE_KEY = 'batch_size'
+SOURCE_TYPES = ['files', 'sql']
+
+# compressed csv is read by pandas, which infers the compression from the suffix
+SHARD_SUFFIXES = ['.csv', '.csv.gz', '.csv.bz2', '.csv.zip', '.csv.xz', '.parquet', '.feather']
+
+DataSourceReport=namedtuple("DataSourceReport",
+["source","n_shards","rows","bytes","seconds","rows_per_s","bytes_per_s"])
+
+
+def read_shard(file_path:str)->pd.DataFrame:
+    """
+    Reads one shard; a module level function so process pool workers can run it.
+    """
+    try:
+        if file_path.endswith('.parquet'):
+            return pd.read_parquet(file_path)
+        if file_path.endswith('.feather'):
+            return pd.read_feather(file_path)
+        return pd.read_csv(file_path)
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+class DataSource(ABC):
+
+    def __init__(self)->None:
+        """
+        Base of the ingestion sources. Subclasses yield the data in DataFrame
+        chunks from iter_chunks; read() concatenates them and report() gives the
+        throughput of the last read.
+        """
+        self.n_shards=0
+        self.rows=0
+        self.bytes=0
+        self.seconds=0.0
+
+    @property
+    def name(self)->str:
+        return type(self).__name__
+
+    @abstractmethod
+    def iter_chunks(self):
+        """
+        Yields the data as DataFrame chunks and counts n_shards, rows and bytes.
+        """
+
+    def read(self)->pd.DataFrame:
+        try:
+            self.n_shards,self.rows,self.bytes=0,0,0
+            start=time.perf_counter()
+            chunks=list(self.iter_chunks())
+            data=pd.concat(chunks,ignore_index=True) if len(chunks)>0 else pd.DataFrame()
+            self.seconds=time.perf_counter()-start
+            logging.info(f'Read source [{self.name}]: {self.report()}')
+            return data
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def report(self)->DataSourceReport:
+        seconds=max(self.seconds,1e-9)
+        return DataSourceReport(source=self.name,
+                                n_shards=self.n_shards,
+                                rows=self.rows,
+                                bytes=self.bytes,
+                                seconds=round(self.seconds,6),
+                                rows_per_s=round(self.rows/seconds,1),
+                                bytes_per_s=round(self.bytes/seconds,1))
+
+
+class FileDataSource(DataSource):
+
+    def __init__(self,path:str,pattern:str='**/*',n_jobs:int=-1)->None:
+        """
+        A file, or a directory of csv (optionally gzip/bz2/zip/xz compressed),
+        Parquet and Feather shards matching pattern, read in parallel by a process
+        pool of n_jobs workers (-1: one per core). Shards are returned in path order.
+        bytes counts the shard files as stored on disk.
+        """
+        super().__init__()
+        self.path=path
+        self.pattern=pattern
+        self.n_jobs=n_jobs
+
+    @property
+    def name(self)->str:
+        return f'files:{self.path}'
+
+    def get_shards(self)->list:
+        try:
+            if os.path.isfile(self.path):
+                return [self.path]
+            if not os.path.isdir(self.path):
+                raise Exception(f'Source path [{self.path}] does not exist')
+            shards=sorted(file_path for file_path in glob.glob(os.path.join(self.path,self.pattern),recursive=True)
+                          if os.path.isfile(file_path) and any(file_path.endswith(suffix) for suffix in SHARD_SUFFIXES))
+            if len(shards)==0:
+                raise Exception(f'No files match [{self.pattern}] with suffixes {SHARD_SUFFIXES} in source path [{self.path}]')
+            return shards
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def iter_chunks(self):
+        try:
+            shards=self.get_shards()
+            n_jobs=cpu_count() if self.n_jobs in (None,-1) else max(1,int(self.n_jobs))
+            n_jobs=min(n_jobs,len(shards))
+            if n_jobs<=1:
+                chunks=map(read_shard,shards)
+            else:
+                executor=ProcessPoolExecutor(max_workers=n_jobs)
+                chunks=executor.map(read_shard,shards)
+            try:
+                for file_path,chunk in zip(shards,chunks):
+                    self.n_shards+=1
+                    self.rows+=len(chunk)
+                    self.bytes+=os.path.getsize(file_path)
+                    yield chunk
+            finally:
+                if n_jobs>1:
+                    executor.shutdown(cancel_futures=True)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+
+class SQLDataSource(DataSource):
+
+    def __init__(self,connection:str,query:str=None,table:str=None,batch_size:int=50000)->None:
+        """
+        Rows of query (or of SELECT * FROM table) streamed batch_size rows at a
+        time. connection is sqlite:///<path> for a local SQLite file or a
+        postgresql:// URL, read through a psycopg2 server-side (named) cursor so
+        the result set stays on the server. bytes counts the in-memory size of the
+        fetched batches.
+        """
+        super().__init__()
+        if query is None and table is None:
+            raise ValueError('SQL source needs a query or a table')
+        self.connection=connection
+        self.query=query if query is not None else f'SELECT * FROM {table}'
+        self.batch_size=int(batch_size)
+
+    @property
+    def name(self)->str:
+        return f"sql:{self.connection.split('@')[-1]}"
+
+    def connect(self):
+        try:
+            if self.connection.startswith('sqlite:///'):
+                return sqlite3.connect(self.connection[len('sqlite:///'):]),False
+            if self.connection.startswith(('postgresql://','postgres://')):
+                import psycopg2
+                return psycopg2.connect(self.connection),True
+            raise Exception(f'Unsupported connection [{self.connection}], expected sqlite:/// or postgresql://')
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def iter_chunks(self):
+        try:
+            connection,server_side=self.connect()
+            try:
+                cursor=connection.cursor(name='sales_ingestion') if server_side else connection.cursor()
+                if server_side:
+                    cursor.itersize=self.batch_size
+                cursor.execute(self.query)
+                while True:
+                    rows=cursor.fetchmany(self.batch_size)
+                    if len(rows)==0:
+                        break
+                    chunk=pd.DataFrame.from_records(rows,columns=[column[0] for column in cursor.description])
+                    self.n_shards+=1
+                    self.rows+=len(chunk)
+                    self.bytes+=int(chunk.memory_usage(index=False,deep=True).sum())
+                    yield chunk
+                cursor.close()
+            finally:
+                connection.close()
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+
+def get_data_source(source_config:dict,root_dir:str=None)->DataSource:
+    """
+    Builds the source declared in data_ingestion_config.source:
+        type: files                      type: sql
+        path: source_data                connection: sqlite:///sales.db
+        pattern: '**/*'                  query: SELECT * FROM sales
+        n_jobs: -1                       batch_size: 50000
+    A relative path or sqlite file is taken from root_dir.
+    """
+    try:
+        source_type=source_config[SOURCE_TYPE_KEY]
+        if source_type=='files':
+            path=source_config[SOURCE_PATH_KEY]
+            if root_dir is not None:
+                path=os.path.join(root_dir,path)
+            return FileDataSource(path=path,
+                                  pattern=source_config.get(SOURCE_PATTERN_KEY,'**/*'),
+                                  n_jobs=source_config.get(SOURCE_N_JOBS_KEY,-1))
+        if source_type=='sql':
+            connection=source_config[SOURCE_CONNECTION_KEY]
+            if connection.startswith('sqlite:///') and root_dir is not None:
+                connection=f"sqlite:///{os.path.join(root_dir,connection[len('sqlite:///'):])}"
+            return SQLDataSource(connection=connection,
+                                 query=source_config.get(SOURCE_QUERY_KEY),
+                                 table=source_config.get(SOURCE_TABLE_KEY),
+                                 batch_size=source_config.get(SOURCE_BATCH_SIZE_KEY,50000))
+        raise Exception(f'Source type must be one of {SOURCE_TYPES}, got [{source_type}]')
+    except Exception as e:
+        raise SalesException(e,sys) from e
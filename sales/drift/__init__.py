@@ -0,0 +1,196 @@
+import os,sys
+import html
+import json
+import time
+from sales.exception import SalesException
+from scipy.special import kolmogorov
+from scipy.stats import chi2
+import pandas as pd
+import numpy as np
+
+CATEGORICAL_METHODS=['chi2','psi']
+PSI_EPSILON=1e-4
+
+
+def ks_test(reference:np.ndarray,current:np.ndarray)->tuple:
+    """
+    Two-sample Kolmogorov-Smirnov statistic with the asymptotic two-sided
+    p-value. Both samples are sorted once; the empirical CDFs are compared at
+    every observed value with searchsorted.
+    return: (statistic, p_value)
+    """
+    reference=np.sort(reference)
+    current=np.sort(current)
+    n,m=len(reference),len(current)
+    if n==0 or m==0:
+        return float('nan'),float('nan')
+    values=np.concatenate([reference,current])
+    cdf_reference=np.searchsorted(reference,values,side='right')/n
+    cdf_current=np.searchsorted(current,values,side='right')/m
+    statistic=float(np.max(np.abs(cdf_reference-cdf_current)))
+    p_value=float(kolmogorov(np.sqrt(n*m/(n+m))*statistic))
+    return statistic,min(max(p_value,0.0),1.0)
+
+
+def category_frequencies(reference:pd.Series,current:pd.Series)->tuple:
+    """
+    Counts of every category seen in either sample, in the same order.
+    return: (categories, reference counts, current counts)
+    """
+    codes,categories=pd.factorize(pd.concat([reference,current],ignore_index=True),use_na_sentinel=True)
+    reference_codes,current_codes=codes[:len(reference)],codes[len(reference):]
+    reference_counts=np.bincount(reference_codes[reference_codes>=0],minlength=len(categories)).astype(np.float64)
+    current_counts=np.bincount(current_codes[current_codes>=0],minlength=len(categories)).astype(np.float64)
+    return categories,reference_counts,current_counts
+
+
+def chi2_test(reference_counts:np.ndarray,current_counts:np.ndarray)->tuple:
+    """
+    Chi-square goodness of fit of the current counts against the reference
+    proportions. Categories missing from the reference get one pseudo count so
+    a new category shows up as drift instead of a division by zero.
+    return: (statistic, p_value)
+    """
+    if current_counts.sum()==0 or reference_counts.sum()==0:
+        return float('nan'),float('nan')
+    reference_counts=np.where(reference_counts==0,1.0,reference_counts)
+    expected=reference_counts/reference_counts.sum()*current_counts.sum()
+    statistic=float(np.sum((current_counts-expected)**2/expected))
+    degrees_of_freedom=max(len(current_counts)-1,1)
+    return statistic,float(chi2.sf(statistic,degrees_of_freedom))
+
+
+def population_stability_index(reference_counts:np.ndarray,current_counts:np.ndarray)->float:
+    reference_share=np.maximum(reference_counts/max(reference_counts.sum(),1),PSI_EPSILON)
+    current_share=np.maximum(current_counts/max(current_counts.sum(),1),PSI_EPSILON)
+    return float(np.sum((current_share-reference_share)*np.log(current_share/reference_share)))
+
+
+def sample_rows(data:pd.DataFrame,n_rows:int,random_state:int=0)->pd.DataFrame:
+    if n_rows is None or len(data)<=n_rows:
+        return data
+    return data.sample(n=n_rows,random_state=random_state)
+
+
+def compute_drift(reference:pd.DataFrame,current:pd.DataFrame,numerical_columns:list,categorical_columns:list,
+                  threshold:float=0.05,categorical_method:str='chi2',psi_threshold:float=0.1,
+                  drift_share:float=0.5,sample_size:int=None,random_state:int=0)->dict:
+    """
+    Per-column drift of current against reference, computed once for both reports.
+    numerical_columns: Kolmogorov-Smirnov, drift when p_value < threshold
+    categorical_columns: chi-square (drift when p_value < threshold) or
+                         PSI (drift when psi >= psi_threshold)
+    The dataset drifts when at least drift_share of the columns drift.
+    sample_size: rows sampled from each frame first, None uses every row
+    """
+    try:
+        if categorical_method not in CATEGORICAL_METHODS:
+            raise Exception(f'categorical_method must be one of {CATEGORICAL_METHODS}, got [{categorical_method}]')
+        start=time.perf_counter()
+        n_reference,n_current=len(reference),len(current)
+        reference=sample_rows(data=reference,n_rows=sample_size,random_state=random_state)
+        current=sample_rows(data=current,n_rows=sample_size,random_state=random_state)
+
+        columns={}
+        for col in numerical_columns:
+            reference_values=reference[col].to_numpy(dtype=np.float64,na_value=np.nan)
+            current_values=current[col].to_numpy(dtype=np.float64,na_value=np.nan)
+            statistic,p_value=ks_test(reference=reference_values[~np.isnan(reference_values)],
+                                      current=current_values[~np.isnan(current_values)])
+            columns[col]={'type':'numerical',
+                          'method':'ks',
+                          'statistic':statistic,
+                          'p_value':p_value,
+                          'threshold':threshold,
+                          'drift_detected':bool(p_value<threshold),
+                          'reference_mean':float(np.nanmean(reference_values)) if len(reference_values) else None,
+                          'current_mean':float(np.nanmean(current_values)) if len(current_values) else None}
+
+        for col in categorical_columns:
+            categories,reference_counts,current_counts=category_frequencies(reference=reference[col],current=current[col])
+            if categorical_method=='psi':
+                statistic=population_stability_index(reference_counts=reference_counts,current_counts=current_counts)
+                p_value=None
+                drift_detected=bool(statistic>=psi_threshold)
+                column_threshold=psi_threshold
+            else:
+                statistic,p_value=chi2_test(reference_counts=reference_counts,current_counts=current_counts)
+                drift_detected=bool(p_value<threshold)
+                column_threshold=threshold
+            columns[col]={'type':'categorical',
+                          'method':categorical_method,
+                          'statistic':statistic,
+                          'p_value':p_value,
+                          'threshold':column_threshold,
+                          'drift_detected':drift_detected,
+                          'n_categories':len(categories),
+                          'new_categories':[str(category) for category,count in zip(categories,reference_counts) if count==0]}
+
+        n_drifted=sum(column['drift_detected'] for column in columns.values())
+        share_drifted=n_drifted/len(columns) if len(columns)>0 else 0.0
+        return {
+            'n_reference':n_reference,
+            'n_current':n_current,
+            'n_reference_used':len(reference),
+            'n_current_used':len(current),
+            'n_columns':len(columns),
+            'n_drifted_columns':n_drifted,
+            'share_drifted_columns':share_drifted,
+            'dataset_drift':bool(len(columns)>0 and share_drifted>=drift_share),
+            'seconds':round(time.perf_counter()-start,6),
+            'columns':columns,
+        }
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def write_json_report(drift_report:dict,file_path:str):
+    try:
+        os.makedirs(os.path.dirname(file_path),exist_ok=True)
+        with open(file_path,'w') as report_file:
+            json.dump({'data_drift':drift_report},report_file,indent=6)
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def format_value(value)->str:
+    if value is None:
+        return '-'
+    if isinstance(value,float):
+        return f'{value:.4g}'
+    return html.escape(str(value))
+
+
+def write_html_report(drift_report:dict,file_path:str):
+    """
+    A static page with the dataset summary and one row per column; no scripts
+    or external assets.
+    """
+    try:
+        rows=[]
+        for col,column in drift_report['columns'].items():
+            row_class='drift' if column['drift_detected'] else ''
+            rows.append(f"<tr class='{row_class}'><td>{html.escape(col)}</td><td>{column['type']}</td><td>{column['method']}</td>"
+                        f"<td>{format_value(column['statistic'])}</td><td>{format_value(column['p_value'])}</td>"
+                        f"<td>{format_value(column['threshold'])}</td><td>{'Detected' if column['drift_detected'] else 'Not detected'}</td></tr>")
+        page=f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Data Drift Report</title>
+<style>
+body{{font-family:sans-serif;margin:2em}} table{{border-collapse:collapse}}
+td,th{{border:1px solid #ccc;padding:4px 10px;text-align:left}} tr.drift td{{background:#fbe3e4}}
+</style></head><body>
+<h1>Data Drift Report</h1>
+<p>Dataset drift: <b>{'Detected' if drift_report['dataset_drift'] else 'Not detected'}</b>,
+{drift_report['n_drifted_columns']} of {drift_report['n_columns']} columns drifted
+({drift_report['share_drifted_columns']:.0%}).</p>
+<p>Reference rows: {drift_report['n_reference']} ({drift_report['n_reference_used']} used),
+current rows: {drift_report['n_current']} ({drift_report['n_current_used']} used).</p>
+<table><tr><th>Column</th><th>Type</th><th>Test</th><th>Statistic</th><th>p-value</th><th>Threshold</th><th>Drift</th></tr>
+{''.join(rows)}
+</table></body></html>
+"""
+        os.makedirs(os.path.dirname(file_path),exist_ok=True)
+        with open(file_path,'w') as report_file:
+            report_file.write(page)
+    except Exception as e:
+        raise SalesException(e,sys) from e
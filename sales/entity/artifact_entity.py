@@ -1,18 +1,21 @@
 from collections import namedtuple
 
 DataIngestionArtifact=namedtuple("DataIngestionArtifact",
-["is_ingested","message","train_file_path","test_file_path"])
+["is_ingested","message","train_file_path","test_file_path","manifest_file_path","new_partitions",
+ "source_report"])
 
 DataValidationArtifact=namedtuple("DataValidationArtifact",
-["is_validated","message","schema_file_path","report_file_path","report_page_file_path"])
+["is_validated","message","schema_file_path","report_file_path","report_page_file_path","check_results","check_timings","stats_file_path"])
 
 DataTransformationArtifact=namedtuple("DataTransformationArtifact",
-["is_transformed","message","transformed_train_file_path","transformed_test_file_path","preprocessed_object_file_path"])
+["is_transformed","message","transformed_train_file_path","transformed_test_file_path","preprocessed_object_file_path",
+ "transformed_train_target_file_path","transformed_test_target_file_path"])
 
 ModelTrainerArtifact=namedtuple("ModelTrainerArtifact",
-["is_trained","message","trained_model_file_path","train_rmse","test_rmse","train_accuracy","test_accuracy","model_accuracy"])
+["is_trained","message","trained_model_file_path","train_rmse","test_rmse","train_accuracy","test_accuracy","model_accuracy","model_search_report",
+ "peak_rss_bytes","model_metrics"])
 
 ModelPusherArtifact = namedtuple("ModelPusherArtifact", ["is_model_pusher", "export_model_file_path"])
 
 ModelEvaluationArtifact=namedtuple("ModelEvaluationArtifact",
-                                 ["is_model_accepted","evaluated_model_path"])
\ No newline at end of file
+                                 ["is_model_accepted","evaluated_model_path","model_comparison"])
\ No newline at end of file
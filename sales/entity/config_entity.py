@@ -1,21 +1,31 @@
 from collections import namedtuple
 
 DataIngestionConfig=namedtuple("DataIngestionConfig",
-["raw_data_dir","ingested_train_dir","ingested_test_dir"])
+["raw_data_dir","ingested_train_dir","ingested_test_dir","data_format","schema_file_path",
+ "incremental_enabled","source_dir","incremental_raw_data_dir","incremental_train_dir","incremental_test_dir",
+ "manifest_file_path","test_size","split_key_columns","source"])
 
 DataValidationConfig=namedtuple("DataValidationConfig",
-["schema_file_path","report_file_path","report_page_file_path"])
+["schema_file_path","report_file_path","report_page_file_path","stats_file_path","streaming_enabled","chunk_size",
+ "max_distinct_values","report_sample_rows","drift_backend","drift_sample_rows","drift_threshold","drift_categorical_method"])
 
 DataTransformationConfig=namedtuple("DataTransformationConfig",
-["transformed_train_dir","transformed_test_dir","preprocessed_object_file_path"])
+["transformed_train_dir","transformed_test_dir","preprocessed_object_file_path","feature_array_order"])
 
 ModelTrainerConfig=namedtuple("ModelTrainerConfig",
-["trained_model_file_path","base_accuracy","model_config_file_path"])
+["trained_model_file_path","base_accuracy","model_config_file_path","fold_cache_enabled","fold_cache_max_memory_bytes","fold_cache_dir",
+ "mmap_mode"])
 
 ModelEvaluationConfig=namedtuple("ModelEvaluationConfig",
-                                 ["model_evaluation_file_path","timestamp"])
+                                 ["model_evaluation_file_path","timestamp","comparison_method","bootstrap_resamples",
+                                  "bootstrap_confidence_level","bootstrap_acceptance_metric","bootstrap_min_improvement",
+                                  "bootstrap_n_jobs","bootstrap_random_state"])
 
 ModelPusherConfig = namedtuple("ModelPusherConfig", ["export_dir_path"])
                                  
 TrainingPipelineConfig=namedtuple("TrainingPipelineConfig",
-["artifact_dir"])
\ No newline at end of file
+["artifact_dir","stage_cache_enabled","stage_cache_dir","executor","max_workers"])
+
+ModelServingConfig=namedtuple("ModelServingConfig",
+["model_dir","model_file_name","model_poll_interval_s","warmup_file_path","warmup_rows","compiled_model_enabled","model_mmap_mode","schema_file_path","batch_chunk_size","batch_max_rows","batch_max_payload_bytes",
+ "micro_batch_enabled","micro_batch_max_size","micro_batch_max_wait_ms","asgi_executor","asgi_max_workers","asgi_max_pending"])
@@ -0,0 +1,219 @@
+import os,sys
+from collections import namedtuple
+from sales.exception import SalesException
+import pandas as pd
+import numpy as np
+
+DatasetStats=namedtuple("DatasetStats",
+["n_rows","columns","null_counts","skew","unique_values"])
+
+DEFAULT_QUANTILES=[0.01,0.05,0.25,0.5,0.75,0.95,0.99]
+
+
+class QuantileSketch:
+
+    def __init__(self,k:int=2048,random_state:int=0)->None:
+        """
+        Mergeable approximate quantiles in O(k log(n/k)) memory. Level i holds
+        items that each stand for 2**i values; a level larger than k is sorted and
+        every other item is promoted to the next level.
+        """
+        self.k=int(k)
+        self.levels=[np.empty(0)]
+        self.rng=np.random.default_rng(random_state)
+
+    def update(self,values:np.ndarray):
+        values=np.asarray(values,dtype=np.float64)
+        values=values[~np.isnan(values)]
+        self.levels[0]=np.concatenate([self.levels[0],values])
+        self.compress()
+
+    def merge(self,other:"QuantileSketch"):
+        for level,items in enumerate(other.levels):
+            if level==len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level]=np.concatenate([self.levels[level],items])
+        self.compress()
+
+    def compress(self):
+        level=0
+        while level<len(self.levels):
+            items=self.levels[level]
+            if len(items)>self.k:
+                items=np.sort(items)
+                kept=items[len(items)-len(items)%2:]
+                promoted=items[:len(items)-len(items)%2][self.rng.integers(2)::2]
+                self.levels[level]=kept
+                if level+1==len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level+1]=np.concatenate([self.levels[level+1],promoted])
+            level+=1
+
+    @property
+    def count(self)->int:
+        return int(sum(len(items)*2**level for level,items in enumerate(self.levels)))
+
+    def quantiles(self,quantiles:list)->list:
+        if self.count==0:
+            return [None for _ in quantiles]
+        values=np.concatenate(self.levels)
+        weights=np.concatenate([np.full(len(items),2.0**level) for level,items in enumerate(self.levels)])
+        order=np.argsort(values,kind='stable')
+        values,cumulative=values[order],np.cumsum(weights[order])
+        positions=np.searchsorted(cumulative,np.asarray(quantiles)*cumulative[-1],side='left')
+        return values[np.minimum(positions,len(values)-1)].tolist()
+
+
+class DatasetStatsAccumulator:
+
+    def __init__(self,columns:list,numerical_columns:list,categorical_columns:list,
+                      max_distinct_values:int=10000,sample_rows:int=None,sketch_size:int=2048,random_state:int=0)->None:
+        """
+        Per-column statistics that can be updated chunk by chunk and merged across
+        accumulators: row and null counts, the first three central moments of the
+        numerical columns (for skew), quantile sketches and the distinct values of
+        the categorical columns (exact up to max_distinct_values).
+        sample_rows: keep a uniform random sample of that many rows, None keeps none
+        """
+        try:
+            self.columns=columns
+            self.numerical_columns=numerical_columns
+            self.categorical_columns=categorical_columns
+            self.max_distinct_values=int(max_distinct_values)
+            self.sample_rows=sample_rows
+            self.rng=np.random.default_rng(random_state)
+
+            self.n_rows=0
+            self.null_counts={}
+            n_numerical=len(numerical_columns)
+            self.count=np.zeros(n_numerical)
+            self.mean=np.zeros(n_numerical)
+            self.m2=np.zeros(n_numerical)
+            self.m3=np.zeros(n_numerical)
+            self.sketches={col:QuantileSketch(k=sketch_size,random_state=random_state) for col in numerical_columns}
+            self.distinct_values={col:set() for col in categorical_columns}
+            self.distinct_overflow={col:False for col in categorical_columns}
+            self.sample=None
+            self.sample_keys=np.empty(0)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def merge_moments(self,count,mean,m2,m3):
+        """
+        Pairwise update of count, mean and the 2nd/3rd central moment sums
+        (Chan et al. / Pebay), vectorized over the numerical columns.
+        """
+        n_a,n_b=self.count,count
+        n=n_a+n_b
+        with np.errstate(invalid='ignore',divide='ignore'):
+            delta=np.where(n>0,mean-self.mean,0.0)
+            ratio_b=np.where(n>0,n_b/n,0.0)
+            new_mean=self.mean+delta*ratio_b
+            new_m2=self.m2+m2+np.where(n>0,delta**2*n_a*n_b/n,0.0)
+            new_m3=(self.m3+m3
+                    +np.where(n>0,delta**3*n_a*n_b*(n_a-n_b)/n**2,0.0)
+                    +np.where(n>0,3*delta*(n_a*m2-n_b*self.m2)/n,0.0))
+        self.count,self.mean,self.m2,self.m3=n,new_mean,new_m2,new_m3
+
+    def update_sample(self,rows:pd.DataFrame,keys:np.ndarray):
+        if self.sample_rows is None:
+            return
+        sample=rows if self.sample is None else pd.concat([self.sample,rows],ignore_index=True)
+        keys=np.concatenate([self.sample_keys,keys])
+        if len(keys)>self.sample_rows:
+            keep=np.sort(np.argpartition(keys,self.sample_rows)[:self.sample_rows])
+            sample,keys=sample.iloc[keep].reset_index(drop=True),keys[keep]
+        self.sample,self.sample_keys=sample,keys
+
+    def update(self,data:pd.DataFrame):
+        try:
+            self.n_rows+=len(data)
+            for col,value in data.isna().sum().items():
+                self.null_counts[col]=self.null_counts.get(col,0)+int(value)
+
+            if len(self.numerical_columns)>0 and len(data)>0:
+                values=data[self.numerical_columns].to_numpy(dtype=np.float64)
+                count=np.sum(~np.isnan(values),axis=0).astype(np.float64)
+                with np.errstate(invalid='ignore'):
+                    mean=np.where(count>0,np.nansum(values,axis=0)/np.maximum(count,1),0.0)
+                deviation=values-mean
+                self.merge_moments(count=count,mean=mean,
+                                   m2=np.nansum(deviation**2,axis=0),
+                                   m3=np.nansum(deviation**3,axis=0))
+                for index,col in enumerate(self.numerical_columns):
+                    self.sketches[col].update(values[:,index])
+
+            for col in self.categorical_columns:
+                if self.distinct_overflow[col]:
+                    continue
+                self.distinct_values[col].update(data[col].dropna().unique().tolist())
+                if len(self.distinct_values[col])>self.max_distinct_values:
+                    self.distinct_overflow[col]=True
+
+            self.update_sample(rows=data,keys=self.rng.random(len(data)))
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def merge(self,other:"DatasetStatsAccumulator"):
+        try:
+            self.n_rows+=other.n_rows
+            for col,value in other.null_counts.items():
+                self.null_counts[col]=self.null_counts.get(col,0)+value
+            self.merge_moments(count=other.count,mean=other.mean,m2=other.m2,m3=other.m3)
+            for col in self.numerical_columns:
+                self.sketches[col].merge(other.sketches[col])
+            for col in self.categorical_columns:
+                self.distinct_values[col].update(other.distinct_values[col])
+                self.distinct_overflow[col]=(self.distinct_overflow[col] or other.distinct_overflow[col]
+                                             or len(self.distinct_values[col])>self.max_distinct_values)
+            if other.sample is not None:
+                self.update_sample(rows=other.sample,keys=other.sample_keys)
+            return self
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_skew(self)->dict:
+        """
+        Bias-adjusted sample skewness, the same estimator as pandas.Series.skew.
+        """
+        skew={}
+        for index,col in enumerate(self.numerical_columns):
+            n,m2,m3=self.count[index],self.m2[index]/max(self.count[index],1),self.m3[index]/max(self.count[index],1)
+            if n<3:
+                skew[col]=float('nan')
+            elif m2==0:
+                skew[col]=0.0
+            else:
+                skew[col]=float(np.sqrt(n*(n-1))/(n-2)*m3/m2**1.5)
+        return skew
+
+    def get_quantiles(self,quantiles:list=DEFAULT_QUANTILES)->dict:
+        return {col:dict(zip(quantiles,self.sketches[col].quantiles(quantiles))) for col in self.numerical_columns}
+
+    def to_dataset_stats(self)->DatasetStats:
+        return DatasetStats(n_rows=self.n_rows,
+                            columns=self.columns,
+                            null_counts=dict(self.null_counts),
+                            skew=self.get_skew(),
+                            unique_values={col:sorted(values) for col,values in self.distinct_values.items()})
+
+    def to_dict(self)->dict:
+        """
+        JSON friendly summary written to the validation stats report.
+        """
+        skew=self.get_skew()
+        quantiles=self.get_quantiles()
+        return {
+            'n_rows':self.n_rows,
+            'columns':self.columns,
+            'null_counts':dict(self.null_counts),
+            'numerical':{col:{'count':int(self.count[index]),
+                              'mean':float(self.mean[index]),
+                              'std':float(np.sqrt(self.m2[index]/(self.count[index]-1))) if self.count[index]>1 else None,
+                              'skew':None if np.isnan(skew[col]) else skew[col],
+                              'quantiles':{str(q):value for q,value in quantiles[col].items()}}
+                         for index,col in enumerate(self.numerical_columns)},
+            'categorical':{col:{'distinct_values':sorted(values),
+                                'distinct_overflow':self.distinct_overflow[col]}
+                           for col,values in self.distinct_values.items()},
+        }
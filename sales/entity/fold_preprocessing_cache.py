@@ -0,0 +1,173 @@
+import os,sys
+import shutil
+import hashlib
+import threading
+from sales.logger import logging
+from sales.exception import SalesException
+from sklearn.base import BaseEstimator,RegressorMixin,clone
+from scipy import sparse
+import pandas as pd
+import numpy as np
+
+
+def get_index_key(indices:np.ndarray)->str:
+    return hashlib.blake2b(np.ascontiguousarray(indices,dtype=np.int64).tobytes(),digest_size=16).hexdigest()
+
+
+class FoldPreprocessingCache:
+
+    def __init__(self,preprocessor,X:pd.DataFrame,max_memory_bytes:int,spill_dir:str)->None:
+        """
+        Fits clone(preprocessor) once per training fold of the raw features X and
+        keeps the transformed fold matrices for every estimator and parameter
+        combination searched on that fold.
+        Folds are identified by their row indices, so any CV splitter (and the
+        subsamples of successive halving) works unchanged. Transformed matrices are
+        kept in memory up to max_memory_bytes; beyond that they are written to
+        spill_dir and read back memory-mapped.
+        """
+        try:
+            self.preprocessor=preprocessor
+            self.X=X
+            self.max_memory_bytes=int(max_memory_bytes)
+            self.spill_dir=spill_dir
+
+            self.lock=threading.Lock()
+            self.key_locks={}
+            self.preprocessors={}
+            self.matrices={}
+            self.memory_bytes=0
+            self.spilled_bytes=0
+            self.preprocessor_fits=0
+            self.hits=0
+            self.misses=0
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def __deepcopy__(self,memo):
+        # clone() deep copies non-estimator params; every clone must share this cache
+        return self
+
+    def __getstate__(self):
+        # process pools get their own copy; spilled matrices stay readable from disk
+        state=self.__dict__.copy()
+        state['lock']=None
+        state['key_locks']={}
+        return state
+
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self.lock=threading.Lock()
+
+    @property
+    def search_input(self)->np.ndarray:
+        """
+        The X to hand to a search: one row index per sample.
+        """
+        return np.arange(len(self.X)).reshape(-1,1)
+
+    def get_key_lock(self,key:str)->threading.Lock:
+        with self.lock:
+            return self.key_locks.setdefault(key,threading.Lock())
+
+    def store(self,key:str,matrix):
+        nbytes=matrix.data.nbytes if sparse.issparse(matrix) else matrix.nbytes
+        with self.lock:
+            if self.memory_bytes+nbytes<=self.max_memory_bytes:
+                self.memory_bytes+=nbytes
+                self.matrices[key]=matrix
+                return matrix
+
+        os.makedirs(self.spill_dir,exist_ok=True)
+        if sparse.issparse(matrix):
+            file_path=os.path.join(self.spill_dir,f'{key}.npz')
+            sparse.save_npz(file_path,matrix,compressed=False)
+            matrix=sparse.load_npz(file_path)
+        else:
+            file_path=os.path.join(self.spill_dir,f'{key}.npy')
+            np.save(file_path,matrix)
+            matrix=np.load(file_path,mmap_mode='r')
+        with self.lock:
+            self.spilled_bytes+=nbytes
+            self.matrices[key]=matrix
+        return matrix
+
+    def get_train(self,train_indices:np.ndarray)->tuple:
+        """
+        return: (fold key, transformed training rows)
+        """
+        try:
+            fold_key=get_index_key(train_indices)
+            with self.get_key_lock(fold_key):
+                if fold_key in self.preprocessors:
+                    self.hits+=1
+                    return fold_key,self.matrices[fold_key]
+                self.misses+=1
+                preprocessor=clone(self.preprocessor)
+                matrix=preprocessor.fit_transform(self.X.iloc[train_indices])
+                self.preprocessor_fits+=1
+                matrix=self.store(key=fold_key,matrix=matrix)
+                self.preprocessors[fold_key]=preprocessor
+                logging.info(f'Fold preprocessing cache: fitted fold [{fold_key}] on [{len(train_indices)}] rows')
+                return fold_key,matrix
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_transformed(self,fold_key:str,indices:np.ndarray):
+        """
+        Rows of X transformed by the preprocessor fitted on fold_key.
+        """
+        try:
+            key=f'{fold_key}-{get_index_key(indices)}'
+            with self.get_key_lock(key):
+                if key in self.matrices:
+                    self.hits+=1
+                    return self.matrices[key]
+                self.misses+=1
+                matrix=self.preprocessors[fold_key].transform(self.X.iloc[indices])
+                return self.store(key=key,matrix=matrix)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def stats(self)->dict:
+        return {
+            'preprocessor_fits':self.preprocessor_fits,
+            'hits':self.hits,
+            'misses':self.misses,
+            'memory_bytes':self.memory_bytes,
+            'spilled_bytes':self.spilled_bytes,
+        }
+
+    def clear(self):
+        with self.lock:
+            self.preprocessors={}
+            self.matrices={}
+            self.memory_bytes=0
+        shutil.rmtree(self.spill_dir,ignore_errors=True)
+
+
+class FoldCachedEstimator(BaseEstimator,RegressorMixin):
+
+    def __init__(self,estimator,fold_preprocessing_cache:FoldPreprocessingCache):
+        """
+        Search-time stand-in for estimator. It is fitted and scored on row indices
+        (FoldPreprocessingCache.search_input) and looks the transformed rows up in
+        the cache, so hyperparameters are set as estimator__<name>.
+        """
+        self.estimator=estimator
+        self.fold_preprocessing_cache=fold_preprocessing_cache
+
+    def fit(self,X,y=None):
+        try:
+            self.fold_key_,X_transformed=self.fold_preprocessing_cache.get_train(train_indices=np.asarray(X).ravel())
+            self.estimator_=clone(self.estimator).fit(X_transformed,y)
+            return self
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def predict(self,X):
+        try:
+            X_transformed=self.fold_preprocessing_cache.get_transformed(fold_key=self.fold_key_,indices=np.asarray(X).ravel())
+            return self.estimator_.predict(X_transformed)
+        except Exception as e:
+            raise SalesException(e,sys) from e
@@ -0,0 +1,120 @@
+import os,sys
+from collections import namedtuple
+import numpy as np
+from joblib import Parallel,delayed,cpu_count
+from sales.logger import logging
+from sales.exception import SalesException
+
+COMPARISON_METHODS=['harmonic_mean','bootstrap']
+BOOTSTRAP_ACCEPTANCE_METRICS=['r2','rmse','both']
+
+BootstrapInterval=namedtuple("BootstrapInterval",
+["metric","estimate","lower","upper"])
+
+ModelComparison=namedtuple("ModelComparison",
+["n_samples","n_resamples","confidence_level","r2_diff","rmse_diff","acceptance_metric","min_improvement","is_better"])
+
+
+def bootstrap_block(y_true:np.ndarray,residuals:np.ndarray,n_resamples:int,seed)->tuple:
+    """
+    Sums of squares of n_resamples paired bootstrap resamples at once. A resample
+    is a row of counts (how often each sample is drawn), so every sum over the
+    resamples is one matrix product with the counts instead of a gather per resample.
+    y_true: centered target, shape (n,)
+    residuals: residuals of the models, shape (n_models, n)
+    return: (total sum of squares (n_resamples,), residual sums of squares (n_resamples, n_models))
+    """
+    try:
+        n=len(y_true)
+        rng=np.random.default_rng(seed)
+        indices=rng.integers(0,n,size=(n_resamples,n))
+        indices+=np.arange(n_resamples)[:,None]*n
+        counts=np.bincount(indices.ravel(),minlength=n_resamples*n).reshape(n_resamples,n).astype(np.float64)
+        del indices
+        y_sum=counts@y_true
+        total_sum_of_squares=counts@(y_true*y_true)-y_sum*y_sum/n
+        residual_sum_of_squares=counts@(residuals*residuals).T
+        return total_sum_of_squares,residual_sum_of_squares
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def get_interval(metric:str,estimate:float,samples:np.ndarray,confidence_level:float)->BootstrapInterval:
+    alpha=(1-confidence_level)/2
+    lower,upper=np.quantile(samples,[alpha,1-alpha])
+    return BootstrapInterval(metric=metric,estimate=float(estimate),lower=float(lower),upper=float(upper))
+
+
+def paired_bootstrap(y_true:np.ndarray,y_pred_base:np.ndarray,y_pred_new:np.ndarray,n_resamples:int=2000,
+                     confidence_level:float=0.95,random_state:int=None,n_jobs:int=1,block_size:int=250)->tuple:
+    """
+    Percentile confidence intervals of the R2 and RMSE differences (new minus base)
+    between two models, from the same resampled rows for both models. Only the
+    prediction vectors are resampled; the models are not called again.
+    Blocks of block_size resamples run in joblib worker processes (-1: one per
+    core); each block has its own seed spawned from random_state, so results do
+    not depend on n_jobs. Large test sets use smaller blocks.
+    return: (r2_diff, rmse_diff) BootstrapIntervals
+    """
+    try:
+        y_true=np.asarray(y_true,dtype=np.float64).ravel()
+        residuals=np.stack([y_true-np.asarray(y_pred_base,dtype=np.float64).ravel(),
+                            y_true-np.asarray(y_pred_new,dtype=np.float64).ravel()])
+        # centering leaves R2 unchanged and keeps the sums of squares well conditioned
+        y_true=y_true-y_true.mean()
+        n=len(y_true)
+
+        # bounds the (block_size, n) count matrix of a block to about 32 MB
+        block_size=max(1,min(block_size,(1<<22)//n))
+        block_sizes=[min(block_size,n_resamples-start) for start in range(0,n_resamples,block_size)]
+        seeds=np.random.SeedSequence(random_state).spawn(len(block_sizes))
+        n_jobs=min(len(block_sizes),cpu_count() if n_jobs in (None,-1) else max(1,int(n_jobs)))
+        blocks=Parallel(n_jobs=n_jobs)(delayed(bootstrap_block)(y_true,residuals,size,seed)
+                                       for size,seed in zip(block_sizes,seeds))
+        total_sum_of_squares=np.concatenate([block[0] for block in blocks])
+        residual_sum_of_squares=np.concatenate([block[1] for block in blocks])
+
+        # resamples drawing one value only have no R2
+        valid=total_sum_of_squares>0
+        r2=1-residual_sum_of_squares[valid]/total_sum_of_squares[valid,None]
+        rmse=np.sqrt(residual_sum_of_squares/n)
+
+        residual_sum_of_squares=(residuals*residuals).sum(axis=1)
+        r2_estimate=1-residual_sum_of_squares/float(y_true@y_true)
+        rmse_estimate=np.sqrt(residual_sum_of_squares/n)
+        return (get_interval('r2_diff',r2_estimate[1]-r2_estimate[0],r2[:,1]-r2[:,0],confidence_level),
+                get_interval('rmse_diff',rmse_estimate[1]-rmse_estimate[0],rmse[:,1]-rmse[:,0],confidence_level))
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def compare_models(y_true:np.ndarray,y_pred_base:np.ndarray,y_pred_new:np.ndarray,n_resamples:int=2000,
+                   confidence_level:float=0.95,acceptance_metric:str='r2',min_improvement:float=0.0,
+                   random_state:int=None,n_jobs:int=1)->ModelComparison:
+    """
+    The new model is better when its improvement is above min_improvement over the
+    whole confidence interval: the lower bound of the R2 difference is above it
+    (acceptance_metric 'r2'), the upper bound of the RMSE difference is below
+    -min_improvement ('rmse'), or both ('both').
+    """
+    try:
+        if acceptance_metric not in BOOTSTRAP_ACCEPTANCE_METRICS:
+            raise Exception(f'acceptance_metric must be one of {BOOTSTRAP_ACCEPTANCE_METRICS}, got [{acceptance_metric}]')
+        r2_diff,rmse_diff=paired_bootstrap(y_true=y_true,y_pred_base=y_pred_base,y_pred_new=y_pred_new,
+                                           n_resamples=n_resamples,confidence_level=confidence_level,
+                                           random_state=random_state,n_jobs=n_jobs)
+        is_r2_better=r2_diff.lower>min_improvement
+        is_rmse_better=rmse_diff.upper<-min_improvement
+        is_better={'r2':is_r2_better,'rmse':is_rmse_better,'both':is_r2_better and is_rmse_better}[acceptance_metric]
+        model_comparison=ModelComparison(n_samples=len(np.ravel(y_true)),
+                                         n_resamples=n_resamples,
+                                         confidence_level=confidence_level,
+                                         r2_diff=r2_diff,
+                                         rmse_diff=rmse_diff,
+                                         acceptance_metric=acceptance_metric,
+                                         min_improvement=min_improvement,
+                                         is_better=bool(is_better))
+        logging.info(f'Bootstrap model comparison: {model_comparison}')
+        return model_comparison
+    except Exception as e:
+        raise SalesException(e,sys) from e
@@ -4,8 +4,13 @@ from sales.exception import SalesException
 from sales.util import *
 from collections import namedtuple
 import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor,ProcessPoolExecutor
+from joblib import cpu_count,parallel_config,Parallel,delayed
 from typing import List
-from sklearn.metrics import r2_score,mean_squared_error
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid,ParameterSampler,check_cv
+from sales.entity.fold_preprocessing_cache import FoldPreprocessingCache,FoldCachedEstimator
 
 
 GRID_SEARCH_KEY = 'grid_search'
@@ -14,10 +19,46 @@ CLASS_KEY = 'class'
 PARAM_KEY = 'params'
 MODEL_SELECTION_KEY = 'model_selection'
 SEARCH_PARAM_GRID_KEY = "search_param_grid"
+SEARCH_PARAM_DISTRIBUTIONS_KEY = "search_param_distributions"
+SEARCH_BUDGET_KEY = 'budget'
+SEARCH_BUDGET_MAX_FITS_KEY = 'max_fits'
+SEARCH_BUDGET_MAX_TIME_KEY = 'max_time_s'
+SEARCH_BUDGET_ROUND_SIZE_KEY = 'round_size'
+SEARCH_BUDGET_STOP_BELOW_BASE_ACCURACY_KEY = 'stop_below_base_accuracy'
+DISTRIBUTION_DEFAULT_MODULE = 'scipy.stats'
+SEARCH_SCHEDULER_KEY = 'search_scheduler'
+SEARCH_SCHEDULER_N_JOBS_KEY = 'n_jobs'
+SEARCH_SCHEDULER_MAX_PARALLEL_MODELS_KEY = 'max_parallel_models'
+SEARCH_SCHEDULER_BACKEND_KEY = 'backend'
+SEARCH_SCHEDULER_BACKENDS = ['serial', 'thread', 'process']
+EVALUATION_KEY = 'evaluation'
+EVALUATION_N_JOBS_KEY = 'n_jobs'
+
+# randomized strategies sample their candidates up front and run them through the grid variant
+RANDOM_SEARCH_CLASSES = {'RandomizedSearchCV': 'GridSearchCV',
+                         'HalvingRandomSearchCV': 'HalvingGridSearchCV'}
+HALVING_SEARCH_CLASSES = ['HalvingGridSearchCV', 'HalvingRandomSearchCV']
+# draws of ParameterSampler made to collect n_iter distinct candidates
+MAX_SAMPLE_ROUNDS = 10
+# rounds a model's candidates are split into when max_time_s is set without round_size
+TIME_BUDGET_ROUNDS = 5
+FOLD_CACHED_PARAM_PREFIX = 'estimator__'
+
+
+def get_process_cpu_time() -> float:
+    """
+    User plus system CPU seconds of this process, all its threads included.
+    """
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+    except ImportError:
+        return time.process_time()
 
 
 InitializedModelDetail = namedtuple("InitializedModelDetail",
-                                    ["model_serial_number", "model", "param_grid_search", "model_name"])
+                                    ["model_serial_number", "model", "param_grid_search", "param_distributions_search", "model_name"])
 
 GridSearchedBestModel = namedtuple("GridSearchedBestModel", ["model_serial_number",
                                                              "model",
@@ -31,11 +72,161 @@ BestModel = namedtuple("BestModel", ["model_serial_number",
                                      "best_parameters",
                                      "best_score", ])          
 
+ModelSearchReport = namedtuple("ModelSearchReport",
+                               ["model_serial_number", "model_name", "strategy", "n_jobs", "n_candidates",
+                                "n_rounds", "n_fits", "best_score", "stopped_reason",
+                                "wall_time_s", "cpu_time_s", "cpu_time_scope", "fit_time_s"])
+
 MetricInfoArtifact = namedtuple("MetricInfoArtifact",
                                 ["model_name", "model_object", "train_rmse", "test_rmse", "train_accuracy",
                                  "test_accuracy", "model_accuracy", "index_number"])
 
-def evaluate_regression_model(model_list: list, X_train:np.ndarray, y_train:np.ndarray, X_test:np.ndarray, y_test:np.ndarray, base_accuracy:float=0.5) -> MetricInfoArtifact:
+ModelMetrics = namedtuple("ModelMetrics",
+                          ["index_number", "model_name", "train_rmse", "test_rmse", "train_accuracy",
+                           "test_accuracy", "model_accuracy", "diff_test_train_acc", "predict_time_s"])
+
+# largest accepted gap between train and test R2
+MAX_DIFF_TEST_TRAIN_ACCURACY = 0.05
+
+
+def get_total_sum_of_squares(y:np.ndarray) -> float:
+    """
+    Sum of squares of y around its mean, the denominator of R2; computed once per
+    dataset and shared by every model scored on it.
+    """
+    y = np.asarray(y, dtype=np.float64).ravel()
+    centered = y - y.mean()
+    return float(centered @ centered)
+
+
+def regression_scores(y_true:np.ndarray, y_pred:np.ndarray, total_sum_of_squares:float) -> tuple:
+    """
+    R2 and RMSE from one pass over the residuals. Matches sklearn's r2_score for
+    a constant target: 1.0 for a perfect prediction, 0.0 otherwise.
+    return: (r2, rmse)
+    """
+    residual = np.asarray(y_true, dtype=np.float64).ravel() - np.asarray(y_pred, dtype=np.float64).ravel()
+    residual_sum_of_squares = float(residual @ residual)
+    if total_sum_of_squares > 0:
+        r2 = 1.0 - residual_sum_of_squares / total_sum_of_squares
+    else:
+        r2 = 1.0 if residual_sum_of_squares == 0 else 0.0
+    return r2, float(np.sqrt(residual_sum_of_squares / len(residual)))
+
+
+def get_model_metrics(index_number:int, model_name:str, train_scores:tuple, test_scores:tuple,
+                      predict_time_s:float) -> ModelMetrics:
+    train_acc, train_rmse = train_scores
+    test_acc, test_rmse = test_scores
+    # harmonic mean of train_accuracy and test_accuracy
+    model_accuracy = (2 * (train_acc * test_acc)) / (train_acc + test_acc) if train_acc + test_acc != 0 else 0.0
+    return ModelMetrics(index_number=index_number,
+                        model_name=model_name,
+                        train_rmse=train_rmse,
+                        test_rmse=test_rmse,
+                        train_accuracy=train_acc,
+                        test_accuracy=test_acc,
+                        model_accuracy=model_accuracy,
+                        diff_test_train_acc=abs(test_acc - train_acc),
+                        predict_time_s=round(predict_time_s, 6))
+
+
+def score_regression_model(index_number:int, model, X_train, y_train:np.ndarray, X_test, y_test:np.ndarray,
+                           train_sum_of_squares:float, test_sum_of_squares:float) -> ModelMetrics:
+    """
+    Predicts and scores one model; a module level function so joblib workers can run it.
+    """
+    try:
+        start = time.perf_counter()
+        y_train_pred = model.predict(X_train)
+        y_test_pred = model.predict(X_test)
+        predict_time_s = time.perf_counter() - start
+        return get_model_metrics(index_number=index_number,
+                                 model_name=str(model),
+                                 train_scores=regression_scores(y_train, y_train_pred, train_sum_of_squares),
+                                 test_scores=regression_scores(y_test, y_test_pred, test_sum_of_squares),
+                                 predict_time_s=predict_time_s)
+    except Exception as e:
+        raise SalesException(e, sys) from e
+
+
+def evaluate_regression_models(model_list: list, X_train:np.ndarray, y_train:np.ndarray, X_test:np.ndarray, y_test:np.ndarray,
+                               predictions:list=None, n_jobs:int=1) -> List[ModelMetrics]:
+    """
+    Metrics table of every model in model_list, in model_list order.
+    predictions: optional (train prediction, test prediction) per model, computed
+    by the caller; X_train and X_test are then not used
+    n_jobs: models predicted at the same time in joblib worker processes (-1: one
+    per core). Arrays above 1 MB are passed to the workers as read-only memory
+    maps, and memory-mapped inputs by file reference, so the feature matrices are
+    not copied per worker.
+    """
+    try:
+        train_sum_of_squares = get_total_sum_of_squares(y_train)
+        test_sum_of_squares = get_total_sum_of_squares(y_test)
+        if predictions is not None:
+            return [get_model_metrics(index_number=index_number,
+                                      model_name=str(model),
+                                      train_scores=regression_scores(y_train, y_train_pred, train_sum_of_squares),
+                                      test_scores=regression_scores(y_test, y_test_pred, test_sum_of_squares),
+                                      predict_time_s=0.0)
+                    for index_number, (model, (y_train_pred, y_test_pred)) in enumerate(zip(model_list, predictions))]
+
+        n_jobs = min(len(model_list), cpu_count() if n_jobs in (None, -1) else max(1, int(n_jobs)))
+        if n_jobs <= 1:
+            return [score_regression_model(index_number, model, X_train, y_train, X_test, y_test,
+                                           train_sum_of_squares, test_sum_of_squares)
+                    for index_number, model in enumerate(model_list)]
+        return Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(
+            delayed(score_regression_model)(index_number, model, X_train, y_train, X_test, y_test,
+                                            train_sum_of_squares, test_sum_of_squares)
+            for index_number, model in enumerate(model_list))
+    except Exception as e:
+        raise SalesException(e, sys) from e
+
+
+def format_metrics_table(metrics_table: List[ModelMetrics]) -> str:
+    header = (f"{'index':>5} {'model':<40} {'train_r2':>10} {'test_r2':>10} {'model_acc':>10} "
+              f"{'diff':>8} {'train_rmse':>12} {'test_rmse':>12} {'predict_s':>10}")
+    rows = [f"{metrics.index_number:>5} {metrics.model_name[:40]:<40} {metrics.train_accuracy:>10.6f} "
+            f"{metrics.test_accuracy:>10.6f} {metrics.model_accuracy:>10.6f} {metrics.diff_test_train_acc:>8.4f} "
+            f"{metrics.train_rmse:>12.4f} {metrics.test_rmse:>12.4f} {metrics.predict_time_s:>10.3f}"
+            for metrics in metrics_table]
+    return '\n'.join([header] + rows)
+
+
+def get_best_metric_info(model_list: list, metrics_table: List[ModelMetrics], base_accuracy:float=0.5) -> MetricInfoArtifact:
+    """
+    The model with the highest model_accuracy of at least base_accuracy whose
+    train and test R2 are within MAX_DIFF_TEST_TRAIN_ACCURACY; on a tie the later
+    model. None when no model qualifies.
+    """
+    try:
+        metric_info_artifact = None
+        for metrics in metrics_table:
+            #if model accuracy is greater than base accuracy and train and test score is within certain thershold
+            #we will accept that model as accepted model
+            if metrics.model_accuracy >= base_accuracy and metrics.diff_test_train_acc < MAX_DIFF_TEST_TRAIN_ACCURACY:
+                base_accuracy = metrics.model_accuracy
+                metric_info_artifact = MetricInfoArtifact(model_name=metrics.model_name,
+                                                        model_object=model_list[metrics.index_number],
+                                                        train_rmse=metrics.train_rmse,
+                                                        test_rmse=metrics.test_rmse,
+                                                        train_accuracy=metrics.train_accuracy,
+                                                        test_accuracy=metrics.test_accuracy,
+                                                        model_accuracy=metrics.model_accuracy,
+                                                        index_number=metrics.index_number)
+        if metric_info_artifact is None:
+            logging.info(f"No model found with higher accuracy than base accuracy")
+        else:
+            logging.info(f"Acceptable model found {metric_info_artifact}. ")
+        return metric_info_artifact
+    except Exception as e:
+        raise SalesException(e, sys) from e
+
+
+def evaluate_regression_model(model_list: list, X_train:np.ndarray, y_train:np.ndarray, X_test:np.ndarray, y_test:np.ndarray, base_accuracy:float=0.5,
+                              predictions:list=None, n_jobs:int=1, metrics_table:list=None) -> MetricInfoArtifact:
     """
     Description:
     This function compare multiple regression model return best model
@@ -45,6 +236,10 @@ def evaluate_regression_model(model_list: list, X_train:np.ndarray, y_train:np.n
     y_train: Training dataset target feature
     X_test: Testing dataset input feature
     y_test: Testing dataset input feature
+    predictions: optional (train prediction, test prediction) per model, computed
+    by the caller; X_train and X_test are then not used
+    n_jobs: models scored in parallel, see evaluate_regression_models
+    metrics_table: optional list, filled with the ModelMetrics of every model
     return
     It retured a named tuple
     
@@ -53,59 +248,12 @@ def evaluate_regression_model(model_list: list, X_train:np.ndarray, y_train:np.n
                                  "test_accuracy", "model_accuracy", "index_number"])
     """
     try:
-        
-    
-        index_number = 0
-        metric_info_artifact = None
-        for model in model_list:
-            model_name = str(model)  #getting model name based on model object
-            logging.info(f"{'>>'*30}Started evaluating model: [{type(model).__name__}] {'<<'*30}")
-            
-            #Getting prediction for training and testing dataset
-            y_train_pred = model.predict(X_train)
-            y_test_pred = model.predict(X_test)
-
-            #Calculating r squared score on training and testing dataset
-            train_acc = r2_score(y_train, y_train_pred)
-            test_acc = r2_score(y_test, y_test_pred)
-            
-            #Calculating mean squared error on training and testing dataset
-            train_rmse = np.sqrt(mean_squared_error(y_train, y_train_pred))
-            test_rmse = np.sqrt(mean_squared_error(y_test, y_test_pred))
-
-            # Calculating harmonic mean of train_accuracy and test_accuracy
-            model_accuracy = (2 * (train_acc * test_acc)) / (train_acc + test_acc)
-            diff_test_train_acc = abs(test_acc - train_acc)
-            
-            #logging all important metric
-            logging.info(f"{'>>'*30} Score {'<<'*30}")
-            logging.info(f"Train Score\t\t Test Score\t\t Average Score")
-            logging.info(f"{train_acc}\t\t {test_acc}\t\t{model_accuracy}")
-
-            logging.info(f"{'>>'*30} Loss {'<<'*30}")
-            logging.info(f"Diff test train accuracy: [{diff_test_train_acc}].") 
-            logging.info(f"Train root mean squared error: [{train_rmse}].")
-            logging.info(f"Test root mean squared error: [{test_rmse}].")
-
-
-            #if model accuracy is greater than base accuracy and train and test score is within certain thershold
-            #we will accept that model as accepted model
-            if model_accuracy >= base_accuracy and diff_test_train_acc < 0.05:
-                base_accuracy = model_accuracy
-                metric_info_artifact = MetricInfoArtifact(model_name=model_name,
-                                                        model_object=model,
-                                                        train_rmse=train_rmse,
-                                                        test_rmse=test_rmse,
-                                                        train_accuracy=train_acc,
-                                                        test_accuracy=test_acc,
-                                                        model_accuracy=model_accuracy,
-                                                        index_number=index_number)
-
-                logging.info(f"Acceptable model found {metric_info_artifact}. ")
-            index_number += 1
-        if metric_info_artifact is None:
-            logging.info(f"No model found with higher accuracy than base accuracy")
-        return metric_info_artifact
+        model_metrics = evaluate_regression_models(model_list=model_list, X_train=X_train, y_train=y_train,
+                                                   X_test=X_test, y_test=y_test, predictions=predictions, n_jobs=n_jobs)
+        logging.info(f"Evaluated [{len(model_metrics)}] models:\n{format_metrics_table(model_metrics)}")
+        if metrics_table is not None:
+            metrics_table.extend(model_metrics)
+        return get_best_metric_info(model_list=model_list, metrics_table=model_metrics, base_accuracy=base_accuracy)
     except Exception as e:
         raise SalesException(e, sys) from e
 
@@ -118,11 +266,31 @@ class ModelFactory:
             self.grid_search_module:str=self.config[GRID_SEARCH_KEY][MODULE_KEY]
             self.grid_search_class:str=self.config[GRID_SEARCH_KEY][CLASS_KEY]
             self.grid_search_params:dict=dict(self.config[GRID_SEARCH_KEY][PARAM_KEY])
+            if self.grid_search_class in HALVING_SEARCH_CLASSES:
+                importlib.import_module('sklearn.experimental.enable_halving_search_cv')
+
+            search_budget_config:dict=dict(self.config[GRID_SEARCH_KEY].get(SEARCH_BUDGET_KEY) or {})
+            self.search_max_fits:int=search_budget_config.get(SEARCH_BUDGET_MAX_FITS_KEY)
+            self.search_max_time_s:float=search_budget_config.get(SEARCH_BUDGET_MAX_TIME_KEY)
+            self.search_round_size:int=search_budget_config.get(SEARCH_BUDGET_ROUND_SIZE_KEY)
+            self.stop_below_base_accuracy:bool=search_budget_config.get(SEARCH_BUDGET_STOP_BELOW_BASE_ACCURACY_KEY,False)
 
             self.models_initialization_config:dict=dict(self.config[MODEL_SELECTION_KEY])
 
+            search_scheduler_config:dict=dict(self.config.get(SEARCH_SCHEDULER_KEY) or {})
+            self.search_n_jobs:int=search_scheduler_config.get(SEARCH_SCHEDULER_N_JOBS_KEY,1)
+            self.search_max_parallel_models:int=search_scheduler_config.get(SEARCH_SCHEDULER_MAX_PARALLEL_MODELS_KEY,1)
+            self.search_backend:str=search_scheduler_config.get(SEARCH_SCHEDULER_BACKEND_KEY,'serial')
+            if self.search_backend not in SEARCH_SCHEDULER_BACKENDS:
+                raise Exception(f'search_scheduler backend must be one of {SEARCH_SCHEDULER_BACKENDS}, got [{self.search_backend}]')
+
+            evaluation_config:dict=dict(self.config.get(EVALUATION_KEY) or {})
+            self.evaluation_n_jobs:int=evaluation_config.get(EVALUATION_N_JOBS_KEY,1)
+
             self.initialized_model_list=None
             self.grid_searched_best_model_list=None
+            self.model_search_report_list=None
+            self.fold_preprocessing_cache=None
 
         except Exception as e:
             raise SalesException(e,sys) from e
@@ -149,28 +317,272 @@ class ModelFactory:
             raise SalesException(e,sys) from e
 
 
-    def execute_grid_search_operation(self,initialized_model:InitializedModelDetail,
-                                           input_feature,
-                                           output_feature)->GridSearchedBestModel:
+    def get_search_schedule(self,n_models:int)->tuple:
+        """
+        Splits the search_scheduler core budget between the outer loop (models searched
+        at the same time) and the inner loop (n_jobs of each grid search).
+        return: (parallel_models, n_jobs_per_search)
+        """
         try:
-            grid_search_cv_ref=ModelFactory.class_for_name(module_name=self.grid_search_module,
-                                                           class_name=self.grid_search_class)
-            grid_search_cv=grid_search_cv_ref(estimator=initialized_model.model,
-                                              param_grid=initialized_model.param_grid_search)   
+            n_jobs=cpu_count() if self.search_n_jobs in (None,-1) else max(1,int(self.search_n_jobs))
+            if self.search_backend=='serial':
+                return 1,n_jobs
+            parallel_models=max(1,min(int(self.search_max_parallel_models),n_models,n_jobs))
+            return parallel_models,max(1,n_jobs//parallel_models)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_param_distributions(self,initialized_model:InitializedModelDetail)->dict:
+        """
+        search_param_distributions entries are either a list of values or a
+        scipy.stats distribution declared like the models themselves:
+            min_samples_leaf:
+              class: randint
+              module: scipy.stats
+              params: {low: 2, high: 20}
+        Models without distributions sample from their search_param_grid.
+        """
+        try:
+            if not initialized_model.param_distributions_search:
+                return dict(initialized_model.param_grid_search)
+            param_distributions={}
+            for param_name,distribution in initialized_model.param_distributions_search.items():
+                if isinstance(distribution,dict):
+                    distribution_ref=ModelFactory.class_for_name(module_name=distribution.get(MODULE_KEY,DISTRIBUTION_DEFAULT_MODULE),
+                                                                 class_name=distribution[CLASS_KEY])
+                    distribution=distribution_ref(**dict(distribution.get(PARAM_KEY) or {}))
+                param_distributions[param_name]=distribution
+            return param_distributions
+        except Exception as e:
+            raise SalesException(e,sys) from e
 
+    @staticmethod
+    def get_distinct_values(distribution)->list:
+        """
+        Every value a list or a discrete scipy.stats distribution with finite
+        support can take, None for continuous or unbounded distributions.
+        """
+        try:
+            if isinstance(distribution,(list,tuple)):
+                return list(distribution)
+            if hasattr(distribution,'pmf') and hasattr(distribution,'support'):
+                low,high=distribution.support()
+                if np.isfinite(low) and np.isfinite(high):
+                    return list(range(int(low),int(high)+1))
+            return None
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def sample_param_candidates(self,param_distributions:dict,n_iter:int,random_state=None)->list:
+        """
+        n_iter distinct candidates of param_distributions. ParameterSampler draws
+        discrete distributions with replacement, so when every parameter has a
+        finite set of values n_iter is capped at the number of combinations, and a
+        space no larger than n_iter is searched whole, in random order.
+        """
+        try:
+            distinct_values={name:ModelFactory.get_distinct_values(distribution)
+                             for name,distribution in param_distributions.items()}
+            if all(values is not None for values in distinct_values.values()):
+                n_combinations=int(np.prod([len(values) for values in distinct_values.values()]))
+                n_iter=min(n_iter,n_combinations)
+                if n_iter==n_combinations:
+                    candidates=list(ParameterGrid(distinct_values))
+                    order=np.random.RandomState(random_state).permutation(len(candidates))
+                    return [candidates[index] for index in order]
+
+            random_state=np.random.RandomState(random_state)
+            candidates,seen=[],set()
+            for _ in range(MAX_SAMPLE_ROUNDS):
+                for candidate in ParameterSampler(param_distributions,n_iter=n_iter,random_state=random_state):
+                    key=repr(sorted(candidate.items()))
+                    if key not in seen:
+                        seen.add(key)
+                        candidates.append(candidate)
+                if len(candidates)>=n_iter:
+                    break
+            return candidates[:n_iter]
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_param_candidates(self,initialized_model:InitializedModelDetail,n_samples:int,n_splits:int)->list:
+        """
+        Every parameter combination the configured strategy would try, in the
+        order they are searched.
+        """
+        try:
+            random_state=self.grid_search_params.get('random_state')
+            if self.grid_search_class not in RANDOM_SEARCH_CLASSES:
+                candidates=list(ParameterGrid(initialized_model.param_grid_search))
+                if self.search_max_fits is not None:
+                    # a fit budget samples the grid instead of keeping its first corner
+                    order=np.random.RandomState(random_state).permutation(len(candidates))
+                    candidates=[candidates[index] for index in order]
+                return candidates
+
+            n_iter=self.grid_search_params.get('n_iter',10)
+            if self.grid_search_class=='HalvingRandomSearchCV':
+                n_candidates=self.grid_search_params.get('n_candidates','exhaust')
+                if not isinstance(n_candidates,int):
+                    # 'exhaust': enough candidates for the last iteration to use every sample
+                    min_resources=self.grid_search_params.get('min_resources')
+                    min_resources=min_resources if isinstance(min_resources,int) else 2*n_splits
+                    factor=self.grid_search_params.get('factor',3)
+                    n_iterations=1+int(np.floor(np.log(max(1,n_samples//min_resources))/np.log(factor)))
+                    n_candidates=int(factor**(n_iterations-1))
+                n_iter=n_candidates
+            return self.sample_param_candidates(param_distributions=self.get_param_distributions(initialized_model=initialized_model),
+                                                n_iter=n_iter,random_state=random_state)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_round_size(self,n_candidates:int)->int:
+        """
+        Candidates searched per round. max_time_s is only checked between rounds,
+        so without a round_size a time budget splits the candidates into
+        TIME_BUDGET_ROUNDS rounds instead of searching them in one.
+        """
+        if self.search_round_size is not None:
+            return int(self.search_round_size)
+        if self.search_max_time_s is not None:
+            return max(1,int(np.ceil(n_candidates/TIME_BUDGET_ROUNDS)))
+        return max(1,n_candidates)
+
+    def get_search_cv(self,estimator,candidates:list,n_jobs:int=None):
+        try:
+            prefix=''
+            if self.fold_preprocessing_cache is not None:
+                estimator=FoldCachedEstimator(estimator=estimator,fold_preprocessing_cache=self.fold_preprocessing_cache)
+                prefix=FOLD_CACHED_PARAM_PREFIX
+            search_class=RANDOM_SEARCH_CLASSES.get(self.grid_search_class,self.grid_search_class)
+            grid_search_cv_ref=ModelFactory.class_for_name(module_name=self.grid_search_module,
+                                                           class_name=search_class)
+            grid_search_cv=grid_search_cv_ref(estimator=estimator,
+                                              param_grid=[{prefix+key:[value] for key,value in candidate.items()} for candidate in candidates])
+
+            # an n_jobs set under grid_search params wins over the scheduler's split
+            if n_jobs is not None:
+                grid_search_cv.n_jobs=n_jobs
+            search_params=grid_search_cv.get_params(deep=False)
             grid_search_cv=ModelFactory.update_property_of_class(instance_ref=grid_search_cv,
-                                                                 property_data=self.grid_search_params)
-
-            logging.info(f'Training {type(initialized_model.model).__name__} started')   
-            grid_search_cv.fit(input_feature,output_feature)
-            logging.info(f'Training {type(initialized_model.model).__name__} completed')  
-
-            grid_searched_best_model=GridSearchedBestModel(model_serial_number=initialized_model.model_serial_number, 
-                                  model=initialized_model.model, 
-                                  best_model=grid_search_cv.best_estimator_, 
-                                  best_parameters=grid_search_cv.best_params_, 
-                                  best_score=grid_search_cv.best_score_)    
-            return grid_searched_best_model                                                                                                                             
+                                                                 property_data={key:value for key,value in self.grid_search_params.items()
+                                                                                if key in search_params})
+            # the best candidate over all rounds is refitted once at the end
+            grid_search_cv.refit=False
+            return grid_search_cv
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def execute_grid_search_operation(self,initialized_model:InitializedModelDetail,
+                                           input_feature,
+                                           output_feature,
+                                           n_jobs:int=None,
+                                           base_accuracy:float=None,
+                                           deadline:float=None,
+                                           measure_cpu_time:bool=True)->tuple:
+        """
+        Searches the candidates of one model in rounds of round_size. Between rounds
+        the search stops when the fit budget or the deadline (time.time()) is reached,
+        or, with stop_below_base_accuracy, when no candidate so far beats base_accuracy.
+        With a fold_preprocessing_cache the search runs on the raw features of the
+        cache and input_feature is only used to refit the best candidate.
+        return: (GridSearchedBestModel or None when nothing was searched, ModelSearchReport)
+        fit_time_s sums every CV fit and score, including the ones run by the
+        search's own worker threads or processes.
+        cpu_time_s is the CPU time of the process that ran the search (a
+        process-backend worker has its own), with cpu_time_scope saying what it
+        covers. measure_cpu_time False, for searches overlapping in threads of one
+        process, leaves it None since the process total cannot be split per model.
+        """
+        try:
+            model_class_name=type(initialized_model.model).__name__
+            wall_start=time.perf_counter()
+            cpu_start=get_process_cpu_time()
+            search_n_jobs=None
+
+            n_splits=check_cv(self.grid_search_params.get('cv',5)).get_n_splits(input_feature,output_feature)
+            candidates=self.get_param_candidates(initialized_model=initialized_model,n_samples=len(input_feature),n_splits=n_splits)
+            round_size=self.get_round_size(n_candidates=len(candidates))
+            factor=self.grid_search_params.get('factor',3)
+            # halving scores a candidate on a growing share of the data, about factor/(factor-1) fits per split
+            fits_per_candidate=n_splits*factor/(factor-1) if self.grid_search_class in HALVING_SEARCH_CLASSES else n_splits
+
+            logging.info(f'Training {model_class_name} started: [{len(candidates)}] candidates, strategy [{self.grid_search_class}]')   
+            best_score,best_parameters=None,None
+            n_fits,n_rounds,n_searched,fit_time=0,0,0,0.0
+            stopped_reason='completed'
+            while n_searched<len(candidates):
+                if deadline is not None and time.time()>=deadline:
+                    stopped_reason='time budget'
+                    break
+                round_candidates=candidates[n_searched:n_searched+round_size]
+                if self.search_max_fits is not None:
+                    affordable=int((self.search_max_fits-n_fits)//fits_per_candidate)
+                    if affordable<1 and n_rounds>0:
+                        stopped_reason='fit budget'
+                        break
+                    round_candidates=round_candidates[:max(1,affordable)]
+
+                grid_search_cv=self.get_search_cv(estimator=initialized_model.model,candidates=round_candidates,n_jobs=n_jobs)
+                search_n_jobs=grid_search_cv.n_jobs
+                if self.fold_preprocessing_cache is None:
+                    grid_search_cv.fit(input_feature,output_feature)
+                else:
+                    # threads share the cache; worker processes would each refit every fold
+                    with parallel_config(backend='threading'):
+                        grid_search_cv.fit(self.fold_preprocessing_cache.search_input,output_feature)
+
+                cv_results=grid_search_cv.cv_results_
+                n_fits+=len(cv_results['params'])*grid_search_cv.n_splits_
+                fit_time+=float(np.sum(cv_results['mean_fit_time']+cv_results['mean_score_time'])*grid_search_cv.n_splits_)
+                n_searched+=len(round_candidates)
+                n_rounds+=1
+                if best_score is None or grid_search_cv.best_score_>best_score:
+                    best_score=float(grid_search_cv.best_score_)
+                    best_parameters={key[len(FOLD_CACHED_PARAM_PREFIX):] if self.fold_preprocessing_cache is not None else key:value
+                                     for key,value in grid_search_cv.best_params_.items()}
+                logging.info(f'{model_class_name} round [{n_rounds}]: [{n_searched}/{len(candidates)}] candidates, '
+                             f'[{n_fits}] fits, best score [{best_score}]')
+
+                if self.stop_below_base_accuracy and base_accuracy is not None and best_score<base_accuracy:
+                    stopped_reason='below base accuracy'
+                    break
+
+            grid_searched_best_model=None
+            if best_parameters is not None:
+                best_model=clone(initialized_model.model).set_params(**best_parameters)
+                best_model.fit(input_feature,output_feature)
+                n_fits+=1
+                grid_searched_best_model=GridSearchedBestModel(model_serial_number=initialized_model.model_serial_number, 
+                                      model=initialized_model.model, 
+                                      best_model=best_model, 
+                                      best_parameters=best_parameters, 
+                                      best_score=best_score)    
+
+            wall_time=time.perf_counter()-wall_start
+            if not measure_cpu_time:
+                cpu_time,cpu_time_scope=None,'not measured: searches overlap in threads of one process'
+            elif search_n_jobs not in (None,1) and self.fold_preprocessing_cache is None:
+                # loky worker processes are neither this process nor reaped children
+                cpu_time,cpu_time_scope=get_process_cpu_time()-cpu_start,'search process; CV fits in joblib worker processes not included'
+            else:
+                cpu_time,cpu_time_scope=get_process_cpu_time()-cpu_start,'search process'
+            logging.info(f'Training {model_class_name} completed in [{wall_time:.2f}]s, [{n_fits}] fits, stopped: [{stopped_reason}]')  
+
+            model_search_report=ModelSearchReport(model_serial_number=initialized_model.model_serial_number,
+                                  model_name=initialized_model.model_name,
+                                  strategy=self.grid_search_class,
+                                  n_jobs=n_jobs,
+                                  n_candidates=n_searched,
+                                  n_rounds=n_rounds,
+                                  n_fits=n_fits,
+                                  best_score=best_score,
+                                  stopped_reason=stopped_reason,
+                                  wall_time_s=wall_time,
+                                  cpu_time_s=cpu_time,
+                                  cpu_time_scope=cpu_time_scope,
+                                  fit_time_s=fit_time)
+            return grid_searched_best_model,model_search_report
         except Exception as e:
             raise SalesException(e,sys) from e    
 
@@ -188,25 +600,58 @@ class ModelFactory:
         return: Function will return a GridSearchOperation
         """
         try:
-            return self.execute_grid_search_operation(initialized_model=initialized_model,
-                                                      input_feature=input_feature,
-                                                      output_feature=output_feature)
+            grid_searched_best_model,_=self.execute_grid_search_operation(initialized_model=initialized_model,
+                                                                          input_feature=input_feature,
+                                                                          output_feature=output_feature)
+            return grid_searched_best_model
         except Exception as e:
             raise SalesException(e, sys) from e
 
     def initiate_best_parameter_search_for_initialized_models(self,
                                                               initialized_model_list: List[InitializedModelDetail],
                                                               input_feature,
-                                                              output_feature) -> List[GridSearchedBestModel]:
+                                                              output_feature,
+                                                              base_accuracy:float=None) -> List[GridSearchedBestModel]:
+        """
+        Runs the search of every initialized model, several at a time when the
+        search_scheduler section of model.yaml allows it. Results keep the
+        model_selection order whatever order the searches finish in. Models that
+        had no time left under max_time_s are left out of the result.
+        """
         try:
-            self.grid_searched_best_model_list=[]
-            for initialized_model_list in initialized_model_list:
-                grid_searched_best_model=self.initiate_best_parameter_search_for_initialized_model(
-                                          initialized_model=initialized_model_list,
-                                          input_feature=input_feature,
-                                          output_feature=output_feature)
-
-                self.grid_searched_best_model_list.append(grid_searched_best_model)
+            parallel_models,n_jobs=self.get_search_schedule(n_models=len(initialized_model_list))
+            deadline=time.time()+self.search_max_time_s if self.search_max_time_s is not None else None
+            logging.info(f'Searching [{len(initialized_model_list)}] models, [{parallel_models}] at a time '
+                         f'with [{n_jobs}] jobs each, backend [{self.search_backend}]')
+
+            if parallel_models==1:
+                results=[self.execute_grid_search_operation(initialized_model=initialized_model,
+                                                            input_feature=input_feature,
+                                                            output_feature=output_feature,
+                                                            n_jobs=n_jobs,
+                                                            base_accuracy=base_accuracy,
+                                                            deadline=deadline)
+                         for initialized_model in initialized_model_list]
+            else:
+                # threads share X and y; processes receive a pickled copy per model
+                executor_ref=ProcessPoolExecutor if self.search_backend=='process' else ThreadPoolExecutor
+                with executor_ref(max_workers=parallel_models) as executor:
+                    futures=[executor.submit(self.execute_grid_search_operation,
+                                             initialized_model=initialized_model,
+                                             input_feature=input_feature,
+                                             output_feature=output_feature,
+                                             n_jobs=n_jobs,
+                                             base_accuracy=base_accuracy,
+                                             deadline=deadline,
+                                             measure_cpu_time=self.search_backend=='process')
+                             for initialized_model in initialized_model_list]
+                    results=[future.result() for future in futures]
+
+            self.grid_searched_best_model_list=[grid_searched_best_model for grid_searched_best_model,_ in results
+                                                if grid_searched_best_model is not None]
+            self.model_search_report_list=[model_search_report for _,model_search_report in results]
+            for model_search_report in self.model_search_report_list:
+                logging.info(f'Model search report: {model_search_report}')
             return self.grid_searched_best_model_list                              
         except Exception as e:
             raise SalesException(e,sys) from e           
@@ -220,6 +665,7 @@ class ModelFactory:
                 model_class=model_initialization_config[CLASS_KEY]
                 model_module=model_initialization_config[MODULE_KEY]                
                 model_param_grid_search=model_initialization_config[SEARCH_PARAM_GRID_KEY]
+                model_param_distributions_search=model_initialization_config.get(SEARCH_PARAM_DISTRIBUTIONS_KEY)
 
                 model_obj_ref=ModelFactory.class_for_name(module_name=model_module,
                                                           class_name=model_class)
@@ -235,6 +681,7 @@ class ModelFactory:
                 model_initialization_config=InitializedModelDetail(model_serial_number=model_serial_number, 
                                        model=model, 
                                        param_grid_search=model_param_grid_search, 
+                                       param_distributions_search=model_param_distributions_search, 
                                        model_name=model_name)                                                
 
                 initialized_model_list.append(model_initialization_config)
@@ -267,15 +714,23 @@ class ModelFactory:
             raise SalesException(e, sys) from e
 
 
-    def get_best_model(self, X, y,base_accuracy) -> BestModel:
+    def get_best_model(self, X, y,base_accuracy,fold_preprocessing_cache:FoldPreprocessingCache=None) -> BestModel:
+        """
+        fold_preprocessing_cache: when given, candidates are scored with the preprocessing
+        refitted on every CV training fold (once per fold, shared by all models and
+        parameters); X must then be the fully transformed training array in the same
+        row order, used to refit the best candidates.
+        """
         try:
+            self.fold_preprocessing_cache=fold_preprocessing_cache
             logging.info("Started Initializing model from config file")
             initialized_model_list = self.get_initialized_model_list()
             logging.info(f"Initialized model: {initialized_model_list}")
             grid_searched_best_model_list = self.initiate_best_parameter_search_for_initialized_models(
                 initialized_model_list=initialized_model_list,
                 input_feature=X,
-                output_feature=y
+                output_feature=y,
+                base_accuracy=base_accuracy
             )
             return ModelFactory.get_best_model_from_grid_searched_best_model_list(grid_searched_best_model_list,
                                                                                   base_accuracy=base_accuracy)
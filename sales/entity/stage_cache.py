@@ -0,0 +1,134 @@
+import os,sys
+import json
+import hashlib
+import importlib
+from sales.logger import logging
+from sales.exception import SalesException
+from sales.util import save_object,load_object
+
+
+class StageCache:
+
+    def __init__(self,cache_dir:str,enabled:bool=True)->None:
+        """
+        Content-addressed cache of pipeline stage artifacts. A stage fingerprint
+        hashes its config sections, the contents of its input files (upstream
+        artifact files, schema, model config), the source of its code modules and
+        any extra values; a later run with the same fingerprint reuses the stored
+        artifact, whose files are left where the earlier run wrote them.
+        """
+        try:
+            self.cache_dir=cache_dir
+            self.enabled=enabled
+            self.file_hashes={}
+            self.stage_status={}
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_file_hash(self,file_path:str)->str:
+        """
+        Content hash of a file, or of every file under a directory; memoized on
+        (path, size, mtime) so each input is read once per run.
+        """
+        try:
+            if os.path.isdir(file_path):
+                dir_hash=hashlib.blake2b(digest_size=16)
+                for dir_path,dir_names,file_names in os.walk(file_path):
+                    dir_names.sort()
+                    for file_name in sorted(file_names):
+                        child_path=os.path.join(dir_path,file_name)
+                        dir_hash.update(os.path.relpath(child_path,file_path).encode())
+                        dir_hash.update(self.get_file_hash(file_path=child_path).encode())
+                return dir_hash.hexdigest()
+
+            stat=os.stat(file_path)
+            key=(os.path.abspath(file_path),stat.st_size,stat.st_mtime_ns)
+            if key not in self.file_hashes:
+                file_hash=hashlib.blake2b(digest_size=16)
+                with open(file_path,'rb') as file_obj:
+                    for block in iter(lambda:file_obj.read(1<<20),b''):
+                        file_hash.update(block)
+                self.file_hashes[key]=file_hash.hexdigest()
+            return self.file_hashes[key]
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_fingerprint(self,stage:str,config:dict=None,files:list=None,modules:list=None,values:dict=None)->str:
+        """
+        config: config sections of the stage
+        files: input files and directories, hashed by content (missing ones by name)
+        modules: module names whose source is the code version of the stage
+        values: anything else the result depends on, e.g. source file stats
+        """
+        try:
+            fingerprint={
+                'stage':stage,
+                'config':config or {},
+                'files':[self.get_file_hash(file_path=file_path) if file_path is not None and os.path.exists(file_path)
+                         else f'missing:{file_path}' for file_path in (files or [])],
+                'modules':{module_name:self.get_file_hash(file_path=importlib.import_module(module_name).__file__)
+                           for module_name in (modules or [])},
+                'values':values or {},
+            }
+            return hashlib.blake2b(json.dumps(fingerprint,sort_keys=True,default=str).encode(),digest_size=16).hexdigest()
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_cache_file_path(self,stage:str,fingerprint:str)->str:
+        return os.path.join(self.cache_dir,stage,f'{fingerprint}.pkl')
+
+    def load(self,stage:str,fingerprint:str):
+        """
+        The stored artifact, or None when there is none or one of its files was removed.
+        """
+        try:
+            cache_file_path=self.get_cache_file_path(stage=stage,fingerprint=fingerprint)
+            if not os.path.exists(cache_file_path):
+                return None
+            artifact=load_object(file_path=cache_file_path)
+            missing_files=[value for value in artifact if isinstance(value,str) and os.path.isabs(value)
+                           and not os.path.exists(value)]
+            if len(missing_files)>0:
+                logging.info(f'Stage cache entry [{stage}] [{fingerprint}] dropped, files removed: {missing_files}')
+                os.remove(cache_file_path)
+                return None
+            return artifact
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def run(self,stage:str,fingerprint:str,start_stage):
+        """
+        Returns the cached artifact for fingerprint, or runs start_stage() and
+        stores its artifact. fingerprint None means the stage cannot be cached.
+        """
+        try:
+            if not self.enabled or fingerprint is None:
+                self.stage_status[stage]='disabled' if not self.enabled else 'uncacheable'
+                logging.info(f'Stage cache {self.stage_status[stage]} for [{stage}]')
+                return start_stage()
+
+            artifact=self.load(stage=stage,fingerprint=fingerprint)
+            if artifact is not None:
+                self.stage_status[stage]='hit'
+                logging.info(f'Stage cache hit for [{stage}] fingerprint [{fingerprint}]')
+                return artifact
+
+            self.stage_status[stage]='miss'
+            logging.info(f'Stage cache miss for [{stage}] fingerprint [{fingerprint}]')
+            artifact=start_stage()
+            self.save(stage=stage,fingerprint=fingerprint,artifact=artifact)
+            return artifact
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def save(self,stage:str,fingerprint:str,artifact):
+        """
+        Stores the artifact of a stage; also replaces an entry whose artifact a
+        later stage completed, e.g. validation with the drift results.
+        """
+        try:
+            if not self.enabled or fingerprint is None:
+                return
+            save_object(file_path=self.get_cache_file_path(stage=stage,fingerprint=fingerprint),obj=artifact)
+        except Exception as e:
+            raise SalesException(e,sys) from e
@@ -0,0 +1,154 @@
+import os,sys
+import time
+from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor,wait,FIRST_COMPLETED
+from sales.logger import logging
+from sales.exception import SalesException
+
+StageRun=namedtuple("StageRun",
+["name","dependencies","start_time","end_time","duration_s","status"])
+
+STAGE_GRAPH_EXECUTORS=['serial','thread']
+
+
+class StageGraph:
+
+    def __init__(self,executor:str='thread',max_workers:int=4)->None:
+        """
+        Stages declared with their dependencies and run as soon as all of them are
+        done. Each stage function is called with the dict of results of the stages
+        finished so far. executor 'thread' runs independent stages on a thread pool
+        of max_workers, 'serial' one at a time in declaration order.
+        """
+        try:
+            if executor not in STAGE_GRAPH_EXECUTORS:
+                raise Exception(f'executor must be one of {STAGE_GRAPH_EXECUTORS}, got [{executor}]')
+            self.executor=executor
+            self.max_workers=max(1,int(max_workers))
+            self.stages={}
+            self.stage_runs={}
+            self.start_time=None
+            self.end_time=None
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def add_stage(self,name:str,function,dependencies:list=None):
+        try:
+            dependencies=list(dependencies or [])
+            unknown_dependencies=[dependency for dependency in dependencies if dependency not in self.stages]
+            if len(unknown_dependencies)>0:
+                # stages are added after their dependencies, which also rules out cycles
+                raise Exception(f'Stage [{name}] depends on undeclared stages {unknown_dependencies}')
+            self.stages[name]=(function,dependencies)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def run_stage(self,name:str,results:dict):
+        function,dependencies=self.stages[name]
+        start_time,start=time.time(),time.perf_counter()
+        logging.info(f'Stage [{name}] started')
+        status='failed'
+        try:
+            result=function(results)
+            status='completed'
+            return result
+        finally:
+            duration=time.perf_counter()-start
+            self.stage_runs[name]=StageRun(name=name,
+                                           dependencies=dependencies,
+                                           start_time=start_time,
+                                           end_time=start_time+duration,
+                                           duration_s=round(duration,6),
+                                           status=status)
+            logging.info(f'Stage [{name}] {status} in [{self.stage_runs[name].duration_s}]s')
+
+    def run(self)->dict:
+        """
+        return: {stage name: result}
+        """
+        try:
+            results={}
+            self.stage_runs={}
+            self.start_time=time.time()
+            if self.executor=='serial':
+                for name in self.stages:
+                    results[name]=self.run_stage(name=name,results=results)
+                self.end_time=time.time()
+                return results
+
+            pending=dict(self.stages)
+            running={}
+            with ThreadPoolExecutor(max_workers=self.max_workers,thread_name_prefix='stage') as executor:
+                while pending or running:
+                    for name in [name for name,(_,dependencies) in pending.items()
+                                 if all(dependency in results for dependency in dependencies)]:
+                        del pending[name]
+                        running[executor.submit(self.run_stage,name,dict(results))]=name
+                    done,_=wait(running,return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name=running.pop(future)
+                        try:
+                            results[name]=future.result()
+                        except Exception:
+                            for other in running:
+                                other.cancel()
+                            raise
+            self.end_time=time.time()
+            return results
+        except Exception as e:
+            self.end_time=time.time()
+            raise SalesException(e,sys) from e
+
+    def get_critical_path(self)->list:
+        """
+        The chain of stages that set the wall-clock time: starting from the stage
+        that finished last, repeatedly the dependency that finished last (the one
+        the stage was waiting for).
+        """
+        try:
+            if len(self.stage_runs)==0:
+                return []
+            stage_run=max(self.stage_runs.values(),key=lambda run:run.end_time)
+            critical_path=[stage_run.name]
+            while True:
+                dependency_runs=[self.stage_runs[dependency] for dependency in stage_run.dependencies
+                                 if dependency in self.stage_runs]
+                if len(dependency_runs)==0:
+                    break
+                stage_run=max(dependency_runs,key=lambda run:run.end_time)
+                critical_path.append(stage_run.name)
+            return critical_path[::-1]
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def summary(self)->dict:
+        """
+        Per stage start/end timestamps, offset from the start of the run and
+        duration, plus the critical path. Stage time summed over wall time is the
+        achieved parallelism.
+        """
+        try:
+            wall_time=(self.end_time or time.time())-self.start_time
+            critical_path=self.get_critical_path()
+            stage_time=sum(run.duration_s for run in self.stage_runs.values())
+            return {
+                'executor':self.executor,
+                'max_workers':self.max_workers,
+                'start_time':datetime.fromtimestamp(self.start_time).isoformat(timespec='milliseconds'),
+                'wall_time_s':round(wall_time,6),
+                'stage_time_s':round(stage_time,6),
+                'parallelism':round(stage_time/wall_time,3) if wall_time>0 else None,
+                'critical_path':critical_path,
+                'critical_path_s':round(sum(self.stage_runs[name].duration_s for name in critical_path),6),
+                'stages':{name:{'dependencies':run.dependencies,
+                                'status':run.status,
+                                'start_time':datetime.fromtimestamp(run.start_time).isoformat(timespec='milliseconds'),
+                                'end_time':datetime.fromtimestamp(run.end_time).isoformat(timespec='milliseconds'),
+                                'offset_s':round(run.start_time-self.start_time,6),
+                                'duration_s':run.duration_s,
+                                'critical':name in critical_path}
+                          for name,run in sorted(self.stage_runs.items(),key=lambda item:item[1].start_time)},
+            }
+        except Exception as e:
+            raise SalesException(e,sys) from e
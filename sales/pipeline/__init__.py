@@ -1,4 +1,5 @@
 import os,sys
+import json
 from sales.component import data_ingestion
 from sales.component import data_transformation
 from sales.entity.config_entity import ModelEvaluationConfig
@@ -12,13 +13,116 @@ from sales.component.data_transformation import DataTransformation
 from sales.component.model_trainer import ModelTrainer
 from sales.component.model_evalutaion import ModelEvaluation
 from sales.component.model_pusher import ModelPusher
+from sales.entity.stage_cache import StageCache
+from sales.entity.stage_graph import StageGraph
+from sales.data_source import FileDataSource,get_data_source
+from sales.constant import *
+
+# modules whose source is part of a stage fingerprint
+DATA_INGESTION_MODULES=['sales.component.data_ingestion','sales.data_source','sales.util']
+DATA_VALIDATION_MODULES=['sales.component.data_validation','sales.drift','sales.entity.dataset_stats','sales.util']
+DATA_TRANSFORMATION_MODULES=['sales.component.data_transformation','sales.util']
+MODEL_TRAINER_MODULES=['sales.component.model_trainer','sales.component.data_transformation','sales.entity.model_factory',
+                       'sales.entity.fold_preprocessing_cache','sales.util']
+# checks DataValidation.check_data_drift records in the validation artifact
+DATA_DRIFT_CHECKS=['check_data_drift','json_report','html_report']
 
 
 class Pipeline:
 
     def __init__(self,config:Configuration):
+        """
+        Ingestion, validation, transformation and training are run through a
+        StageCache: a stage whose fingerprint matches an earlier run reuses that
+        run's artifact. Evaluation and pushing depend on the currently deployed
+        model and always run.
+        run_pipeline declares the stages as a StageGraph, so stages that do not
+        depend on each other run at the same time with the thread executor.
+        """
         try:
             self.config=config
+            training_pipeline_config=self.config.training_pipeline_config
+            self.stage_cache=StageCache(cache_dir=training_pipeline_config.stage_cache_dir,
+                                        enabled=training_pipeline_config.stage_cache_enabled)
+            self.data_validation=None
+            self.data_validation_fingerprint=None
+            self.stage_graph=None
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_source_file_stats(self,data_ingestion_config)->list:
+        """
+        (path, size, mtime) of the files ingestion reads, None when they cannot be
+        listed (a database or the original csv export), which makes ingestion uncacheable.
+        """
+        try:
+            if data_ingestion_config.incremental_enabled:
+                source_files=[os.path.join(dir_path,file_name)
+                              for dir_path,dir_names,file_names in os.walk(data_ingestion_config.source_dir)
+                              for file_name in file_names]
+            elif data_ingestion_config.source is not None:
+                data_source=get_data_source(source_config=data_ingestion_config.source,root_dir=ROOT_DIR)
+                if not isinstance(data_source,FileDataSource):
+                    return None
+                source_files=data_source.get_shards()
+            else:
+                return None
+            return [(file_path,os.path.getsize(file_path),os.path.getmtime(file_path)) for file_path in sorted(source_files)]
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_data_ingestion_fingerprint(self)->str:
+        try:
+            data_ingestion_config=self.config.get_data_ingestion_config()
+            source_file_stats=self.get_source_file_stats(data_ingestion_config=data_ingestion_config)
+            if source_file_stats is None:
+                return None
+            return self.stage_cache.get_fingerprint(stage='data_ingestion',
+                                                    config=self.config.config_info[DATA_INGESTION_CONFIG_KEY],
+                                                    files=[data_ingestion_config.schema_file_path],
+                                                    modules=DATA_INGESTION_MODULES,
+                                                    values={'source_files':source_file_stats})
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_data_validation_fingerprint(self,data_ingestion_artifact:DataIngestionArtifact)->str:
+        try:
+            return self.stage_cache.get_fingerprint(stage='data_validation',
+                                                    config=self.config.config_info[DATA_VALIDATION_CONFIG_KEY],
+                                                    files=[data_ingestion_artifact.train_file_path,
+                                                           data_ingestion_artifact.test_file_path,
+                                                           self.config.get_data_validation_config().schema_file_path],
+                                                    modules=DATA_VALIDATION_MODULES)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_data_transformation_fingerprint(self,data_ingestion_artifact:DataIngestionArtifact,
+                                                 data_validation_artifact:DataValidationArtifact)->str:
+        try:
+            return self.stage_cache.get_fingerprint(stage='data_transformation',
+                                                    config=self.config.config_info[DATA_TRANSFORMATION_CONFIG_KEY],
+                                                    files=[data_ingestion_artifact.train_file_path,
+                                                           data_ingestion_artifact.test_file_path,
+                                                           data_validation_artifact.schema_file_path],
+                                                    modules=DATA_TRANSFORMATION_MODULES)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_model_trainer_fingerprint(self,data_transformation_artifact:DataTransformationArtifact,
+                                           data_ingestion_artifact:DataIngestionArtifact,
+                                           data_validation_artifact:DataValidationArtifact)->str:
+        try:
+            return self.stage_cache.get_fingerprint(stage='model_trainer',
+                                                    config=self.config.config_info[MODEL_TRAINER_CONFIG_KEY],
+                                                    files=[data_transformation_artifact.transformed_train_file_path,
+                                                           data_transformation_artifact.transformed_test_file_path,
+                                                           data_transformation_artifact.transformed_train_target_file_path,
+                                                           data_transformation_artifact.transformed_test_target_file_path,
+                                                           data_transformation_artifact.preprocessed_object_file_path,
+                                                           data_ingestion_artifact.train_file_path,
+                                                           data_validation_artifact.schema_file_path,
+                                                           self.config.get_model_trainer_config().model_config_file_path],
+                                                    modules=MODEL_TRAINER_MODULES)
         except Exception as e:
             raise SalesException(e,sys) from e
 
@@ -30,17 +134,64 @@ class Pipeline:
         except Exception as e:
             raise SalesException(e,sys) from e   
 
-    def start_data_validation(self,data_ingestion_artifact:DataIngestionArtifact)-> DataValidationArtifact:
+    def start_data_validation(self,data_ingestion_artifact:DataIngestionArtifact,check_data_drift:bool=True)-> DataValidationArtifact:
         try:
             data_validation_config=self.config.get_data_validation_config()
             data_ingestion_artifact=data_ingestion_artifact
             data_validation=DataValidation(data_validation_config=data_validation_config,
                                            data_ingestion_artifact=data_ingestion_artifact)
+            # kept for start_data_drift, which reuses the loaded train/test data
+            self.data_validation=data_validation
 
-            return data_validation.initiate_data_validation()                               
+            return data_validation.initiate_data_validation(check_data_drift=check_data_drift)                               
         except Exception as e:
             raise SalesException(e,sys) from e   
 
+    def run_data_validation(self,data_ingestion_artifact:DataIngestionArtifact)->DataValidationArtifact:
+        """
+        Validation checks through the stage cache, without the drift reports; the
+        fingerprint is kept for start_data_drift, which stores the completed artifact.
+        """
+        try:
+            self.data_validation_fingerprint=self.get_data_validation_fingerprint(data_ingestion_artifact=data_ingestion_artifact)
+            return self.stage_cache.run('data_validation',self.data_validation_fingerprint,
+                                        lambda:self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact,
+                                                                          check_data_drift=False))
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def start_data_drift(self,data_ingestion_artifact:DataIngestionArtifact,
+                              data_validation_artifact:DataValidationArtifact)->DataValidationArtifact:
+        """
+        Drift reports of the validation stage. The drift results are merged into
+        the validation artifact, which then replaces the stage cache entry, so a
+        cache hit reuses them. A cached artifact that already has them is returned as is.
+        return: the validation artifact with the drift results
+        """
+        try:
+            if 'json_report' in data_validation_artifact.check_timings:
+                logging.info('Drift reports reused with the cached validation artifact')
+                return data_validation_artifact
+            data_validation=self.data_validation
+            if data_validation is None:
+                data_validation=DataValidation(data_validation_config=self.config.get_data_validation_config(),
+                                               data_ingestion_artifact=data_ingestion_artifact)
+            data_validation.check_data_drift()
+            data_validation_config=self.config.get_data_validation_config()
+            check_results=dict(data_validation_artifact.check_results)
+            check_results.update({name:result for name,result in data_validation.check_results.items() if name in DATA_DRIFT_CHECKS})
+            check_timings=dict(data_validation_artifact.check_timings)
+            check_timings.update({name:timing for name,timing in data_validation.check_timings.items() if name in DATA_DRIFT_CHECKS})
+            data_validation_artifact=data_validation_artifact._replace(report_file_path=data_validation_config.report_file_path,
+                                                                       report_page_file_path=data_validation_config.report_page_file_path,
+                                                                       check_results=check_results,
+                                                                       check_timings=check_timings)
+            self.stage_cache.save(stage='data_validation',fingerprint=self.data_validation_fingerprint,
+                                  artifact=data_validation_artifact)
+            return data_validation_artifact
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
     def start_data_transformation(self,data_ingestion_artifact:DataIngestionArtifact,
                                        data_validation_artifact:DataValidationArtifact)->DataTransformationArtifact:
         try:
@@ -52,56 +203,146 @@ class Pipeline:
         except Exception as e:
             raise SalesException(e,sys) from e
 
-    def start_model_trainer(self,data_transformation_artifact:DataTransformationArtifact)->ModelTrainerArtifact:
+    def start_model_trainer(self,data_transformation_artifact:DataTransformationArtifact,
+                                 data_ingestion_artifact:DataIngestionArtifact=None,
+                                 data_validation_artifact:DataValidationArtifact=None)->ModelTrainerArtifact:
         try:
             model_trainer_config=self.config.get_model_trainer_config()
             data_transformation_artifact=data_transformation_artifact
             model_trainer=ModelTrainer(model_trainer_config=model_trainer_config,
-                                       data_transformation_artifact=data_transformation_artifact)
+                                       data_transformation_artifact=data_transformation_artifact,
+                                       data_ingestion_artifact=data_ingestion_artifact,
+                                       data_validation_artifact=data_validation_artifact)
             return model_trainer.initiate_model_trainer()                           
         except Exception as e:
             raise SalesException(e,sys) from e     
 
+    def load_evaluation_data(self,data_ingestion_artifact:DataIngestionArtifact,
+                                  data_validation_artifact:DataValidationArtifact)->tuple:
+        try:
+            model_evaluation=ModelEvaluation(model_evaluation_config=self.config.get_model_evaluation_config(),
+                            data_ingestion_artifact=data_ingestion_artifact,
+                            data_validation_artifact=data_validation_artifact,
+                            model_trainer_artifact=None)
+            return model_evaluation.load_evaluation_data()
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
     def start_model_evaluation(self
                                    ,data_ingestion_artifact:DataIngestionArtifact
                                    ,data_validation_artifact:DataValidationArtifact
-                                   ,model_trainer_artifact:ModelTrainerArtifact)->ModelEvaluationArtifact:
+                                   ,model_trainer_artifact:ModelTrainerArtifact
+                                   ,evaluation_data:tuple=None
+                                   ,data_transformation_artifact:DataTransformationArtifact=None)->ModelEvaluationArtifact:
         try:
             model_evaluation=ModelEvaluation(model_evaluation_config=self.config.get_model_evaluation_config(),
                             data_ingestion_artifact=data_ingestion_artifact,
                             data_validation_artifact=data_validation_artifact,
-                            model_trainer_artifact=model_trainer_artifact)
+                            model_trainer_artifact=model_trainer_artifact,
+                            data_transformation_artifact=data_transformation_artifact)
 
-            return model_evaluation.initiate_model_evaluation()                
+            return model_evaluation.initiate_model_evaluation(evaluation_data=evaluation_data)                
 
         except Exception as e:
             raise SalesException(e,sys) from e        
 
-    def start_model_pusher(self,model_evaluation_artifact:ModelEvaluationArtifact)->ModelPusherArtifact:
+    def start_model_pusher(self,model_evaluation_artifact:ModelEvaluationArtifact,
+                                model_trainer_artifact:ModelTrainerArtifact=None,
+                                data_validation_artifact:DataValidationArtifact=None)->ModelPusherArtifact:
         try:
             model_pusher=ModelPusher(model_pusher_config=self.config.get_model_pusher_config(),
-                        model_evaluation_artifact=model_evaluation_artifact)
+                        model_evaluation_artifact=model_evaluation_artifact,
+                        model_trainer_artifact=model_trainer_artifact,
+                        data_validation_artifact=data_validation_artifact)
             return model_pusher.initiate_model_pusher()            
         except Exception as e:
             raise SalesException(e,sys) from e                                     
 
+    def get_stage_graph(self)->StageGraph:
+        """
+        data_ingestion -> data_validation -> data_transformation -> model_trainer -> model_evaluation -> model_pusher
+                                          -> data_drift
+                                          -> evaluation_data ---------------------------------^
+        """
+        try:
+            training_pipeline_config=self.config.training_pipeline_config
+            stage_graph=StageGraph(executor=training_pipeline_config.executor,
+                                   max_workers=training_pipeline_config.max_workers)
+            stage_graph.add_stage('data_ingestion',
+                                  lambda results:self.stage_cache.run('data_ingestion',self.get_data_ingestion_fingerprint(),
+                                                                      lambda:self.start_data_ingestion()))
+            stage_graph.add_stage('data_validation',
+                                  lambda results:self.run_data_validation(data_ingestion_artifact=results['data_ingestion']),
+                                  dependencies=['data_ingestion'])
+            stage_graph.add_stage('data_drift',
+                                  lambda results:self.start_data_drift(data_ingestion_artifact=results['data_ingestion'],
+                                                                       data_validation_artifact=results['data_validation']),
+                                  dependencies=['data_ingestion','data_validation'])
+            stage_graph.add_stage('data_transformation',
+                                  lambda results:self.stage_cache.run('data_transformation',
+                                                                      self.get_data_transformation_fingerprint(data_ingestion_artifact=results['data_ingestion'],
+                                                                                                               data_validation_artifact=results['data_validation']),
+                                                                      lambda:self.start_data_transformation(data_ingestion_artifact=results['data_ingestion'],
+                                                                                                            data_validation_artifact=results['data_validation'])),
+                                  dependencies=['data_ingestion','data_validation'])
+            stage_graph.add_stage('model_trainer',
+                                  lambda results:self.stage_cache.run('model_trainer',
+                                                                      self.get_model_trainer_fingerprint(data_transformation_artifact=results['data_transformation'],
+                                                                                                         data_ingestion_artifact=results['data_ingestion'],
+                                                                                                         data_validation_artifact=results['data_validation']),
+                                                                      lambda:self.start_model_trainer(data_transformation_artifact=results['data_transformation'],
+                                                                                                      data_ingestion_artifact=results['data_ingestion'],
+                                                                                                      data_validation_artifact=results['data_validation'])),
+                                  dependencies=['data_ingestion','data_validation','data_transformation'])
+            stage_graph.add_stage('evaluation_data',
+                                  lambda results:self.load_evaluation_data(data_ingestion_artifact=results['data_ingestion'],
+                                                                           data_validation_artifact=results['data_validation']),
+                                  dependencies=['data_ingestion','data_validation'])
+            stage_graph.add_stage('model_evaluation',
+                                  lambda results:self.start_model_evaluation(data_ingestion_artifact=results['data_ingestion'],
+                                                                             data_validation_artifact=results['data_validation'],
+                                                                             model_trainer_artifact=results['model_trainer'],
+                                                                             evaluation_data=results['evaluation_data'],
+                                                                             data_transformation_artifact=results['data_transformation']),
+                                  dependencies=['data_ingestion','data_validation','data_transformation','model_trainer','evaluation_data'])
+            stage_graph.add_stage('model_pusher',
+                                  lambda results:self.start_model_pusher(model_evaluation_artifact=results['model_evaluation'],
+                                                                         model_trainer_artifact=results['model_trainer'],
+                                                                         data_validation_artifact=results['data_validation']),
+                                  dependencies=['data_validation','model_trainer','model_evaluation'])
+            return stage_graph
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def save_stage_timings(self,summary:dict)->str:
+        try:
+            stage_timings_file_path=os.path.join(self.config.training_pipeline_config.artifact_dir,PIPELINE_ARTIFACT,
+                                                 self.config.time_stamp,PIPELINE_STAGE_TIMINGS_FILE_NAME)
+            os.makedirs(os.path.dirname(stage_timings_file_path),exist_ok=True)
+            with open(stage_timings_file_path,'w') as stage_timings_file:
+                json.dump(summary,stage_timings_file,indent=4)
+            return stage_timings_file_path
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
     def run_pipeline(self):
         try:
-            data_ingestion_artifact=self.start_data_ingestion()
-            print(f'\n data_ingestion_artifact:{data_ingestion_artifact}')
-            data_validation_artifact=self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
-            print(f'\n data_validation_artifact:{data_validation_artifact}')
-            data_transformation_artifact=self.start_data_transformation(data_ingestion_artifact=data_ingestion_artifact,data_validation_artifact=data_validation_artifact)
-            print(f'\n data_transformation_artifact:{data_transformation_artifact}')
-            model_trainer_artifact=self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
-            print(f'\n model_trainer_artifact:{model_trainer_artifact}')
-            model_evaluation_artifact=self.start_model_evaluation(data_ingestion_artifact=data_ingestion_artifact,
-                                                                  data_validation_artifact=data_validation_artifact,
-                                                                  model_trainer_artifact=model_trainer_artifact)
-           
-            print(f'\n model_evaluation_artifact:{model_evaluation_artifact}')
-            model_pusher_artifact=self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact)
-            print(f'model_pusher_artifact:{model_pusher_artifact}')
-        except Exception as e:
-            raise SalesException(e,sys) from e       
+            self.stage_graph=self.get_stage_graph()
+            try:
+                results=self.stage_graph.run()
+            finally:
+                summary=self.stage_graph.summary()
+                summary['stage_cache']=self.stage_cache.stage_status
+                stage_timings_file_path=self.save_stage_timings(summary=summary)
+                logging.info(f"Critical path: {' -> '.join(summary['critical_path'])} "
+                             f"[{summary['critical_path_s']}]s of [{summary['wall_time_s']}]s wall time, "
+                             f"parallelism [{summary['parallelism']}], stage timings in [{stage_timings_file_path}]")
+                logging.info(f'Stage cache: {self.stage_cache.stage_status}')
 
+            # the validation artifact with the drift results
+            results['data_validation']=results['data_drift']
+            for name in ['data_ingestion','data_validation','data_transformation','model_trainer','model_evaluation','model_pusher']:
+                print(f'\n {name}_artifact:{results[name]}')
+            return results
+        except Exception as e:
+            raise SalesException(e,sys) from e
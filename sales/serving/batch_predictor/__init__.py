@@ -0,0 +1,154 @@
+import os,sys
+import io
+import json
+from sales.exception import SalesException
+from sales.logger import logging
+from sales.util import get_input_schema,InputSchema,InvalidInputError
+from sales.constant import CATEGORICAL_COLUMNS
+import pandas as pd
+import numpy as np
+
+JSON_CONTENT_TYPE='application/json'
+NDJSON_CONTENT_TYPES=['application/x-ndjson','application/ndjson','application/jsonlines']
+CSV_CONTENT_TYPES=['text/csv','application/csv']
+RECORDS_KEY='data'
+
+
+class InvalidBatchRequest(InvalidInputError):
+    """
+    Raised when a batch payload cannot be parsed or does not match the schema.
+    The serving layer turns it into a 400 response.
+    """
+
+
+class BatchPredictor:
+
+    def __init__(self,schema_file_path:str,chunk_size:int=5000,max_rows:int=200000)->None:
+        try:
+            self.schema_file_path=schema_file_path
+            self.chunk_size=int(chunk_size)
+            self.max_rows=int(max_rows)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    @property
+    def input_schema(self)->InputSchema:
+        return get_input_schema(schema_file_path=self.schema_file_path)
+
+    def parse_records(self,body:bytes,content_type:str)->pd.DataFrame:
+        """
+        Parses a JSON array ({"data":[...]} or a bare array), NDJSON or CSV body
+        into a DataFrame without any per-row python work.
+        """
+        try:
+            content_type=(content_type or JSON_CONTENT_TYPE).lower()
+            if content_type in CSV_CONTENT_TYPES:
+                return pd.read_csv(io.BytesIO(body),dtype=self.input_schema.dtype_map)
+            if content_type in NDJSON_CONTENT_TYPES:
+                return pd.read_json(io.BytesIO(body),lines=True,dtype=False)
+
+            payload=json.loads(body)
+            if isinstance(payload,dict):
+                payload=payload.get(RECORDS_KEY)
+            if not isinstance(payload,list):
+                raise InvalidBatchRequest(f'Expected a JSON array of records or {{"{RECORDS_KEY}":[...]}}')
+            return pd.DataFrame.from_records(payload)
+        except InvalidBatchRequest:
+            raise
+        except ValueError as e:
+            raise InvalidBatchRequest(f'Unable to parse [{content_type}] body: {e}') from e
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def validate(self,data:pd.DataFrame)->pd.DataFrame:
+        """
+        Checks the columns of the whole batch against the schema and casts every
+        column in a single astype call. Returns the frame in schema column order.
+        """
+        try:
+            if len(data)==0:
+                raise InvalidBatchRequest('Batch does not contain any record')
+            if len(data)>self.max_rows:
+                raise InvalidBatchRequest(f'Batch has {len(data)} records, limit is {self.max_rows}')
+
+            input_schema=self.input_schema
+            input_schema.validate_columns(columns=data.columns.to_list())
+            return input_schema.cast(data=data)
+        except InvalidInputError:
+            raise
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def read_batch(self,body:bytes,content_type:str)->pd.DataFrame:
+        return self.validate(self.parse_records(body=body,content_type=content_type))
+
+    def get_category_probe(self,data:pd.DataFrame)->pd.DataFrame:
+        """
+        A few rows that hold every distinct value of the batch's categorical
+        columns, so one small predict shows whether the model can encode them all.
+        """
+        try:
+            categorical_columns=[col for col in self.input_schema.schema.get(CATEGORICAL_COLUMNS,[]) if col in data.columns]
+            distinct_values={col:data[col].unique() for col in categorical_columns}
+            n_rows=max([len(values) for values in distinct_values.values()],default=0)
+            probe=data.iloc[np.zeros(n_rows,dtype=int)].reset_index(drop=True)
+            for col,values in distinct_values.items():
+                probe[col]=np.resize(values,n_rows)
+            return probe
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def score_first_chunk(self,model,data:pd.DataFrame)->np.ndarray:
+        """
+        Scores the first chunk, and for larger batches the category probe, before
+        the response is started. A batch the model cannot score raises
+        InvalidBatchRequest instead of cutting a 200 response off mid-stream.
+        return: predictions of the first chunk, for iter_predictions
+        """
+        try:
+            if len(data)>self.chunk_size:
+                model.predict(self.get_category_probe(data=data))
+            return np.asarray(model.predict(data.iloc[:self.chunk_size]),dtype=float)
+        except Exception as e:
+            error=e
+            while isinstance(error,SalesException) and error.__cause__ is not None:
+                error=error.__cause__
+            raise InvalidBatchRequest(f'Batch cannot be scored by the model: {error}') from e
+
+    def iter_predictions(self,model,data:pd.DataFrame,first_predictions:np.ndarray=None):
+        """
+        Yields one prediction array per chunk, in input order. Every chunk is a
+        single vectorized model.predict call.
+        first_predictions: the first chunk, already scored by score_first_chunk
+        """
+        try:
+            for start in range(0,len(data),self.chunk_size):
+                chunk=data.iloc[start:start+self.chunk_size]
+                if start==0 and first_predictions is not None:
+                    yield first_predictions
+                else:
+                    yield np.asarray(model.predict(chunk),dtype=float)
+                logging.info(f'Batch prediction: scored rows [{start}:{start+len(chunk)}] of [{len(data)}]')
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def stream_json(self,model,data:pd.DataFrame,first_predictions:np.ndarray=None):
+        """
+        Streams {"predictions":[...]} chunk by chunk so the response never holds
+        the whole batch as python objects.
+        """
+        yield '{"predictions":['
+        separator=''
+        for predictions in self.iter_predictions(model=model,data=data,first_predictions=first_predictions):
+            yield separator+json.dumps(predictions.tolist())[1:-1]
+            separator=','
+        yield ']}'
+
+    def stream_ndjson(self,model,data:pd.DataFrame,first_predictions:np.ndarray=None):
+        index=0
+        for predictions in self.iter_predictions(model=model,data=data,first_predictions=first_predictions):
+            lines=[]
+            for prediction in predictions.tolist():
+                lines.append(json.dumps({'index':index,'prediction':prediction}))
+                index+=1
+            yield '\n'.join(lines)+'\n'
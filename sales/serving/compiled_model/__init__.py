@@ -0,0 +1,296 @@
+import os,sys
+from sales.exception import SalesException
+from sales.logger import logging
+from sales.constant import *
+from sales.util import InvalidInputError
+from sales.serving.model_artifact import save_model_artifact
+from sales.component.data_transformation import OutlierRemover,domain_value,feature_generator,ITEM_FAT_CONTENT_MAPPING
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import StandardScaler,OneHotEncoder,OrdinalEncoder
+import pandas as pd
+import numpy as np
+
+# exported as a model artifact (compiled_model.json/.pkl5/.blob); versions exported
+# before that hold a dill pickle, COMPILED_MODEL_FILE_NAME
+COMPILED_MODEL_ARTIFACT_NAME='compiled_model'
+COMPILED_MODEL_FILE_NAME='compiled_model.pkl'
+
+LINEAR_MODEL_CLASSES=['LinearRegression','Ridge','Lasso','ElasticNet','SGDRegressor','LinearSVR','HuberRegressor','BayesianRidge']
+TREE_ENSEMBLE_CLASSES=['DecisionTreeRegressor','ExtraTreeRegressor','RandomForestRegressor','ExtraTreesRegressor']
+
+
+class UnsupportedModelError(Exception):
+    """
+    Raised when a fitted step has no compiled equivalent. Callers fall back to
+    HousingEstimatorModel.predict.
+    """
+
+
+def is_missing(values:np.ndarray)->np.ndarray:
+    return pd.isna(values)
+
+
+class CompiledBlock:
+
+    def __init__(self,name:str,columns:list,numeric_input:bool,ops:list)->None:
+        """
+        One ColumnTransformer branch flattened into a list of (op, params) tuples
+        that run on a plain (rows, columns) ndarray.
+        """
+        self.name=name
+        self.columns=columns
+        self.numeric_input=numeric_input
+        self.ops=ops
+
+    def transform(self,values:np.ndarray)->np.ndarray:
+        if self.numeric_input:
+            try:
+                values=values.astype(np.float64)
+            except (ValueError,TypeError) as e:
+                raise InvalidInputError(f'Columns {self.columns} must be numeric: {e}') from e
+        for op,params in self.ops:
+            values=getattr(self,f'op_{op}')(values,**params)
+        return values
+
+    @staticmethod
+    def op_clip(values,lower,upper):
+        return np.clip(values,lower,upper)
+
+    @staticmethod
+    def op_fill(values,fill_values):
+        mask=is_missing(values)
+        if mask.any():
+            values=np.where(mask,fill_values,values)
+        return values
+
+    @staticmethod
+    def op_map(values,column_index,mapping):
+        column=values[:,column_index]
+        if any(value in mapping for value in column):
+            values=values.copy()
+            values[:,column_index]=[mapping.get(value,value) for value in column]
+        return values
+
+    @staticmethod
+    def op_ordinal(values,lookups):
+        out=np.empty(values.shape,dtype=np.float64)
+        for index,lookup in enumerate(lookups):
+            try:
+                out[:,index]=[lookup[value] for value in values[:,index]]
+            except KeyError as e:
+                raise ValueError(f'Found unknown categories [{e.args[0]}] in column {index} during transform') from e
+        return out
+
+    @staticmethod
+    def op_one_hot(values,lookups,offsets,width):
+        out=np.zeros((values.shape[0],width),dtype=np.float64)
+        rows=np.arange(values.shape[0])
+        for index,lookup in enumerate(lookups):
+            try:
+                positions=[lookup[value] for value in values[:,index]]
+            except KeyError as e:
+                raise ValueError(f'Found unknown categories [{e.args[0]}] in column {index} during transform') from e
+            out[rows,offsets[index]+np.asarray(positions,dtype=np.intp)]=1.0
+        return out
+
+    @staticmethod
+    def op_scale(values,mean,scale):
+        return (values-mean)/scale
+
+    @staticmethod
+    def op_subtract_from(values,reference):
+        return reference-values
+
+
+class CompiledEstimator:
+
+    def __init__(self,kind:str,**arrays)->None:
+        """
+        kind 'linear': coef, intercept
+        kind 'trees': flattened node arrays of every tree plus the root offsets,
+        scored for all rows and trees at once, one tree level per iteration.
+        """
+        self.kind=kind
+        for key,value in arrays.items():
+            setattr(self,key,value)
+
+    def predict(self,X:np.ndarray)->np.ndarray:
+        if self.kind=='linear':
+            return X@self.coef+self.intercept
+
+        # sklearn trees compare float32 features against float64 thresholds
+        X=X.astype(np.float32)
+        rows=np.arange(X.shape[0])[:,None]
+        nodes=np.broadcast_to(self.roots,(X.shape[0],len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            left=self.children_left[nodes]
+            is_leaf=left==-1
+            if is_leaf.all():
+                break
+            go_left=X[rows,self.feature[nodes]]<=self.threshold[nodes]
+            nodes=np.where(is_leaf,nodes,np.where(go_left,left,self.children_right[nodes]))
+        return self.value[nodes].mean(axis=1)
+
+
+class CompiledModel:
+
+    def __init__(self,blocks:list,estimator:CompiledEstimator,n_features:int,model_name:str)->None:
+        self.blocks=blocks
+        self.estimator=estimator
+        self.n_features=n_features
+        self.model_name=model_name
+        self.columns=sorted(set(col for block in blocks for col in block.columns))
+
+    def get_block_values(self,X,columns:list)->np.ndarray:
+        if isinstance(X,pd.DataFrame):
+            return X[columns].to_numpy(dtype=object)
+        if isinstance(X,dict):
+            X=[X]
+        return np.array([[record[col] for col in columns] for record in X],dtype=object)
+
+    def transform(self,X)->np.ndarray:
+        """
+        X: one record (dict), a list of records or a DataFrame.
+        """
+        try:
+            return np.hstack([block.transform(self.get_block_values(X,block.columns)) for block in self.blocks])
+        except KeyError as e:
+            raise InvalidInputError(f'Missing columns:[{e.args[0]}]') from e
+
+    def predict(self,X)->np.ndarray:
+        return self.estimator.predict(self.transform(X))
+
+    def __repr__(self):
+        return f"Compiled{self.model_name}()"
+
+
+def compile_step(step,ops:list,columns:list,fitted_columns:int):
+    """
+    Appends the ops for one fitted pipeline step. Returns the number of output
+    columns after the step.
+    """
+    if isinstance(step,OutlierRemover):
+        ops.append(('clip',dict(lower=np.asarray(step.lower_bound,dtype=np.float64),
+                                upper=np.asarray(step.upper_bound,dtype=np.float64))))
+    elif isinstance(step,domain_value):
+        mapping=getattr(step,'mapping_',ITEM_FAT_CONTENT_MAPPING)
+        column=getattr(step,'column_','Item_Fat_Content')
+        if column in columns:
+            ops.append(('map',dict(column_index=columns.index(column),mapping=dict(mapping))))
+    elif isinstance(step,feature_generator):
+        ops.append(('subtract_from',dict(reference=float(getattr(step,'reference_year_',YEAR)))))
+    elif isinstance(step,SimpleImputer):
+        if not (isinstance(step.missing_values,float) and np.isnan(step.missing_values)):
+            raise UnsupportedModelError(f'SimpleImputer with missing_values={step.missing_values}')
+        if getattr(step,'add_indicator',False):
+            raise UnsupportedModelError('SimpleImputer with add_indicator')
+        ops.append(('fill',dict(fill_values=np.asarray(step.statistics_))))
+    elif isinstance(step,StandardScaler):
+        mean=step.mean_ if step.with_mean else np.zeros(fitted_columns)
+        scale=step.scale_ if step.with_std else np.ones(fitted_columns)
+        ops.append(('scale',dict(mean=np.asarray(mean,dtype=np.float64),scale=np.asarray(scale,dtype=np.float64))))
+    elif isinstance(step,OneHotEncoder):
+        if step.drop_idx_ is not None or step.handle_unknown!='error':
+            raise UnsupportedModelError('OneHotEncoder with drop or handle_unknown')
+        lookups=[{category:position for position,category in enumerate(categories)} for categories in step.categories_]
+        sizes=[len(categories) for categories in step.categories_]
+        offsets=np.concatenate([[0],np.cumsum(sizes)[:-1]]).astype(np.intp)
+        ops.append(('one_hot',dict(lookups=lookups,offsets=offsets,width=int(sum(sizes)))))
+        return int(sum(sizes))
+    elif isinstance(step,OrdinalEncoder):
+        if step.handle_unknown!='error':
+            raise UnsupportedModelError('OrdinalEncoder with handle_unknown')
+        lookups=[{category:float(position) for position,category in enumerate(categories)} for categories in step.categories_]
+        ops.append(('ordinal',dict(lookups=lookups)))
+    else:
+        raise UnsupportedModelError(f'No compiled form for step [{type(step).__name__}]')
+    return fitted_columns
+
+
+def compile_preprocessing(preprocessing_object:ColumnTransformer)->list:
+    if not isinstance(preprocessing_object,ColumnTransformer):
+        raise UnsupportedModelError(f'Expected a ColumnTransformer, got [{type(preprocessing_object).__name__}]')
+    blocks=[]
+    for name,transformer,columns in preprocessing_object.transformers_:
+        if transformer=='drop' or len(columns)==0:
+            continue
+        columns=list(columns)
+        if transformer=='passthrough':
+            blocks.append(CompiledBlock(name=name,columns=columns,numeric_input=True,ops=[]))
+            continue
+        steps=[step for _,step in transformer.steps] if isinstance(transformer,Pipeline) else [transformer]
+        ops=[]
+        width=len(columns)
+        for step in steps:
+            if step=='passthrough' or step is None:
+                continue
+            width=compile_step(step=step,ops=ops,columns=columns,fitted_columns=width)
+        numeric_input=not any(op in ('map','one_hot','ordinal') for op,_ in ops)
+        blocks.append(CompiledBlock(name=name,columns=columns,numeric_input=numeric_input,ops=ops))
+    return blocks
+
+
+def compile_estimator(estimator)->CompiledEstimator:
+    class_name=type(estimator).__name__
+    if class_name in LINEAR_MODEL_CLASSES and hasattr(estimator,'coef_'):
+        return CompiledEstimator(kind='linear',
+                                 coef=np.asarray(estimator.coef_,dtype=np.float64).ravel(),
+                                 intercept=float(np.ravel(estimator.intercept_)[0]))
+    if class_name in TREE_ENSEMBLE_CLASSES:
+        trees=[tree.tree_ for tree in estimator.estimators_] if hasattr(estimator,'estimators_') else [estimator.tree_]
+        offsets=np.cumsum([0]+[tree.node_count for tree in trees[:-1]])
+
+        children_left=np.concatenate([np.where(tree.children_left==-1,-1,tree.children_left+offset) for tree,offset in zip(trees,offsets)])
+        children_right=np.concatenate([np.where(tree.children_right==-1,-1,tree.children_right+offset) for tree,offset in zip(trees,offsets)])
+        feature=np.concatenate([np.maximum(tree.feature,0) for tree in trees]).astype(np.intp)
+        threshold=np.concatenate([tree.threshold for tree in trees])
+        value=np.concatenate([tree.value[:,0,0] for tree in trees])
+        return CompiledEstimator(kind='trees',
+                                 children_left=children_left.astype(np.intp),
+                                 children_right=children_right.astype(np.intp),
+                                 feature=feature,
+                                 threshold=threshold,
+                                 value=value,
+                                 roots=offsets.astype(np.intp),
+                                 max_depth=int(max(tree.max_depth for tree in trees))+1)
+    raise UnsupportedModelError(f'No compiled form for estimator [{class_name}]')
+
+
+def compile_model(model)->CompiledModel:
+    """
+    Compiles a fitted HousingEstimatorModel into plain NumPy arrays: clip bounds,
+    fill values, category lookup tables, scaler vectors and linear coefficients
+    or flattened tree arrays.
+    """
+    try:
+        blocks=compile_preprocessing(preprocessing_object=model.preprocessing_object)
+        estimator=compile_estimator(estimator=model.trained_model_object)
+        n_features=int(getattr(model.trained_model_object,'n_features_in_',0))
+        return CompiledModel(blocks=blocks,
+                             estimator=estimator,
+                             n_features=n_features,
+                             model_name=type(model.trained_model_object).__name__)
+    except UnsupportedModelError:
+        raise
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def export_compiled_model(model,dir_path:str,schema_file_path:str=None)->bool:
+    """
+    Writes the compiled plan next to the exported model as a model artifact, so
+    serving workers memory-map its arrays (flattened tree nodes, lookups,
+    coefficients) and share one copy in the page cache. Models that cannot be
+    compiled are skipped and keep being served through predict.
+    """
+    try:
+        compiled_model=compile_model(model=model)
+    except UnsupportedModelError as e:
+        logging.info(f'Model is not compiled: {e}')
+        return False
+    save_model_artifact(model=compiled_model,dir_path=dir_path,schema_file_path=schema_file_path,
+                        artifact_name=COMPILED_MODEL_ARTIFACT_NAME)
+    logging.info(f'Compiled model exported at [{dir_path}]')
+    return True
@@ -0,0 +1,145 @@
+import os,sys
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from sales.exception import SalesException
+from sales.logger import logging
+from sales.util import InvalidInputError
+from sales.serving.model_registry import ModelNotLoadedError
+import pandas as pd
+import numpy as np
+
+WAIT_TIME_WINDOW=10000
+
+
+class MicroBatcher:
+
+    def __init__(self,predict_fn,max_batch_size:int=32,max_wait_ms:float=3.0,request_timeout_s:float=30.0)->None:
+        """
+        Coalesces single-row requests into one DataFrame per batch.
+        predict_fn: callable taking a DataFrame and returning one prediction per row
+        max_batch_size: a batch is dispatched as soon as it holds this many rows
+        max_wait_ms: or when its oldest row has waited this long, whichever comes first
+        """
+        try:
+            self.predict_fn=predict_fn
+            self.max_batch_size=int(max_batch_size)
+            self.max_wait_s=float(max_wait_ms)/1000.0
+            self.request_timeout_s=float(request_timeout_s)
+
+            self.request_queue=queue.Queue()
+            self.lock=threading.Lock()
+            self.worker=None
+            self.worker_pid=None
+
+            self.batch_size_histogram={}
+            self.batch_count=0
+            self.row_count=0
+            self.wait_time_total_s=0.0
+            self.wait_time_max_s=0.0
+            self.recent_wait_times=deque(maxlen=WAIT_TIME_WINDOW)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def ensure_worker(self):
+        """
+        Starts the dispatch thread on first use. Threads do not survive fork, so
+        a pre-forked worker process starts its own on its first request.
+        """
+        if self.worker is not None and self.worker_pid==os.getpid() and self.worker.is_alive():
+            return
+        with self.lock:
+            if self.worker is not None and self.worker_pid==os.getpid() and self.worker.is_alive():
+                return
+            if self.worker_pid!=os.getpid():
+                self.request_queue=queue.Queue()
+            self.worker=threading.Thread(target=self.run,name='micro-batcher',daemon=True)
+            self.worker_pid=os.getpid()
+            self.worker.start()
+            logging.info(f'Micro batcher started: max_batch_size [{self.max_batch_size}] max_wait_ms [{self.max_wait_s*1000}]')
+
+    def submit(self,record:dict)->Future:
+        self.ensure_worker()
+        future=Future()
+        self.request_queue.put((record,future,time.perf_counter()))
+        return future
+
+    def predict(self,record:dict):
+        try:
+            return self.submit(record=record).result(timeout=self.request_timeout_s)
+        except (InvalidInputError,ModelNotLoadedError):
+            raise
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def collect_batch(self)->list:
+        batch=[self.request_queue.get()]
+        deadline=batch[0][2]+self.max_wait_s
+        while len(batch)<self.max_batch_size:
+            remaining=deadline-time.perf_counter()
+            try:
+                if remaining>0:
+                    batch.append(self.request_queue.get(timeout=remaining))
+                else:
+                    # past the deadline: only take rows that are already queued
+                    batch.append(self.request_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch=self.collect_batch()
+            self.dispatch(batch=batch)
+
+    def dispatch(self,batch:list):
+        dispatch_time=time.perf_counter()
+        records=[record for record,_,_ in batch]
+        futures=[future for _,future,_ in batch]
+        try:
+            predictions=np.asarray(self.predict_fn(pd.DataFrame.from_records(records))).ravel().tolist()
+            for future,prediction in zip(futures,predictions):
+                future.set_result(prediction)
+        except Exception as e:
+            logging.info(f'Micro batch of [{len(batch)}] rows failed, scoring rows one by one: {e}')
+            for record,future in zip(records,futures):
+                try:
+                    future.set_result(np.asarray(self.predict_fn(pd.DataFrame.from_records([record]))).ravel()[0].item())
+                except Exception as row_error:
+                    future.set_exception(row_error)
+        self.record_batch(batch=batch,dispatch_time=dispatch_time)
+
+    def record_batch(self,batch:list,dispatch_time:float):
+        with self.lock:
+            batch_size=len(batch)
+            self.batch_size_histogram[batch_size]=self.batch_size_histogram.get(batch_size,0)+1
+            self.batch_count+=1
+            self.row_count+=batch_size
+            for _,_,enqueue_time in batch:
+                wait_time=dispatch_time-enqueue_time
+                self.wait_time_total_s+=wait_time
+                self.wait_time_max_s=max(self.wait_time_max_s,wait_time)
+                self.recent_wait_times.append(wait_time)
+
+    def stats(self)->dict:
+        """
+        Queue depth, batch size histogram and the wait time added by coalescing
+        (time from enqueue until the batch is handed to predict_fn).
+        """
+        with self.lock:
+            recent_wait_times=np.array(self.recent_wait_times) if len(self.recent_wait_times)>0 else np.zeros(1)
+            return {
+                'queue_depth':self.request_queue.qsize(),
+                'batch_count':self.batch_count,
+                'row_count':self.row_count,
+                'mean_batch_size':self.row_count/self.batch_count if self.batch_count>0 else 0.0,
+                'batch_size_histogram':dict(sorted(self.batch_size_histogram.items())),
+                'added_wait_ms':{
+                    'mean':self.wait_time_total_s/self.row_count*1000 if self.row_count>0 else 0.0,
+                    'p50':float(np.percentile(recent_wait_times,50)*1000),
+                    'p99':float(np.percentile(recent_wait_times,99)*1000),
+                    'max':self.wait_time_max_s*1000,
+                },
+            }
@@ -0,0 +1,168 @@
+import os,sys
+import io
+import json
+import time
+import pickle
+import hashlib
+import importlib
+import platform
+from sales.exception import SalesException
+from sales.logger import logging
+import numpy as np
+import sklearn
+
+# an artifact is <name>.json, <name>.pkl5 and <name>.blob in one directory
+MANIFEST_SUFFIX='.json'
+PICKLE_SUFFIX='.pkl5'
+BLOB_SUFFIX='.blob'
+MODEL_ARTIFACT_NAME='model'
+MODEL_MANIFEST_FILE_NAME=f'{MODEL_ARTIFACT_NAME}{MANIFEST_SUFFIX}'
+MODEL_PICKLE_FILE_NAME=f'{MODEL_ARTIFACT_NAME}{PICKLE_SUFFIX}'
+MODEL_BLOB_FILE_NAME=f'{MODEL_ARTIFACT_NAME}{BLOB_SUFFIX}'
+MODEL_ARTIFACT_FORMAT_VERSION=1
+# buffers start on cache line boundaries, which also satisfies every NumPy dtype alignment
+BLOB_ALIGNMENT=64
+
+# classes pickled under another module path by older code, 'module.Class' -> 'module.Class'
+CLASS_ALIASES={
+    '__main__.HousingEstimatorModel':'sales.component.model_trainer.HousingEstimatorModel',
+    'src.component.model_trainer.HousingEstimatorModel':'sales.component.model_trainer.HousingEstimatorModel',
+}
+
+
+class ModelArtifactUnpickler(pickle.Unpickler):
+
+    def __init__(self,file,buffers=None,class_aliases:dict=None)->None:
+        """
+        Resolves classes through class_aliases first, so an artifact keeps loading
+        after a class moves to another module.
+        """
+        super().__init__(file,buffers=buffers)
+        self.class_aliases=dict(CLASS_ALIASES,**(class_aliases or {}))
+
+    def find_class(self,module_name:str,class_name:str):
+        alias=self.class_aliases.get(f'{module_name}.{class_name}')
+        if alias is not None:
+            module_name,class_name=alias.rsplit('.',1)
+        return super().find_class(module_name,class_name)
+
+
+def get_file_hash(file_path:str)->str:
+    try:
+        file_hash=hashlib.blake2b(digest_size=16)
+        with open(file_path,'rb') as file_obj:
+            for block in iter(lambda:file_obj.read(1<<20),b''):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def get_artifact_file_path(dir_path:str,artifact_name:str,suffix:str)->str:
+    return os.path.join(dir_path,f'{artifact_name}{suffix}')
+
+
+def is_model_artifact(dir_path:str,artifact_name:str=MODEL_ARTIFACT_NAME)->bool:
+    return os.path.exists(get_artifact_file_path(dir_path=dir_path,artifact_name=artifact_name,suffix=MANIFEST_SUFFIX))
+
+
+def read_manifest(dir_path:str,artifact_name:str=MODEL_ARTIFACT_NAME)->dict:
+    try:
+        with open(get_artifact_file_path(dir_path=dir_path,artifact_name=artifact_name,suffix=MANIFEST_SUFFIX)) as manifest_file:
+            return json.load(manifest_file)
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def save_model_artifact(model,dir_path:str,metrics:dict=None,schema_file_path:str=None,
+                        artifact_name:str=MODEL_ARTIFACT_NAME)->dict:
+    """
+    Writes model to dir_path as three files, named after artifact_name:
+        model.pkl5  pickle protocol 5 of the object graph, without its array data
+        model.blob  the array data (tree node arrays, coefficients, scaler vectors,
+                    numeric encoder categories) back to back, each at a 64 byte offset
+        model.json  manifest: format version, buffer offsets, schema hash,
+                    metrics and library versions
+    The manifest is written last, so a directory with a manifest is complete.
+    Any picklable object works, e.g. the compiled plan saved as 'compiled_model'.
+    return: the manifest
+    """
+    try:
+        os.makedirs(dir_path,exist_ok=True)
+        buffers=[]
+        pickle_data=pickle.dumps(model,protocol=5,buffer_callback=buffers.append)
+
+        blob_file_path=get_artifact_file_path(dir_path=dir_path,artifact_name=artifact_name,suffix=BLOB_SUFFIX)
+        buffer_offsets=[]
+        with open(f'{blob_file_path}.tmp','wb') as blob_file:
+            offset=0
+            for buffer in buffers:
+                data=buffer.raw()
+                padding=-offset%BLOB_ALIGNMENT
+                blob_file.write(b'\0'*padding)
+                offset+=padding
+                blob_file.write(data)
+                buffer_offsets.append([offset,data.nbytes])
+                offset+=data.nbytes
+        os.replace(f'{blob_file_path}.tmp',blob_file_path)
+
+        pickle_file_path=get_artifact_file_path(dir_path=dir_path,artifact_name=artifact_name,suffix=PICKLE_SUFFIX)
+        with open(f'{pickle_file_path}.tmp','wb') as pickle_file:
+            pickle_file.write(pickle_data)
+        os.replace(f'{pickle_file_path}.tmp',pickle_file_path)
+
+        manifest={
+            'format_version':MODEL_ARTIFACT_FORMAT_VERSION,
+            'created_at':time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'model_name':str(model),
+            'model_class':f'{type(model).__module__}.{type(model).__qualname__}',
+            'schema_hash':get_file_hash(file_path=schema_file_path) if schema_file_path is not None else None,
+            'metrics':metrics or {},
+            'pickle_bytes':len(pickle_data),
+            'blob_bytes':offset,
+            'buffers':buffer_offsets,
+            'versions':{'python':platform.python_version(),'numpy':np.__version__,'sklearn':sklearn.__version__},
+        }
+        manifest_file_path=get_artifact_file_path(dir_path=dir_path,artifact_name=artifact_name,suffix=MANIFEST_SUFFIX)
+        with open(f'{manifest_file_path}.tmp','w') as manifest_file:
+            json.dump(manifest,manifest_file,indent=4,default=str)
+        os.replace(f'{manifest_file_path}.tmp',manifest_file_path)
+        logging.info(f'Model artifact [{artifact_name}] saved at [{dir_path}]: [{len(pickle_data)}] pickle bytes, '
+                     f'[{len(buffers)}] buffers, [{offset}] blob bytes')
+        return manifest
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def load_model_artifact(dir_path:str,mmap_mode:str='r',class_aliases:dict=None,schema_file_path:str=None,
+                        artifact_name:str=MODEL_ARTIFACT_NAME):
+    """
+    Loads a model written by save_model_artifact. The arrays are views of the
+    memory-mapped blob, so processes loading the same artifact share one copy
+    in the page cache. Objects that copy their state on unpickling (sklearn's
+    tree node arrays) copy straight from the mapping.
+    mmap_mode: 'r' read-only arrays; 'c' copy-on-write, for code that writes to fitted arrays
+    schema_file_path: when given, must hash to the schema the model was exported with
+    """
+    try:
+        manifest=read_manifest(dir_path=dir_path,artifact_name=artifact_name)
+        if manifest['format_version']>MODEL_ARTIFACT_FORMAT_VERSION:
+            raise Exception(f"Model artifact format [{manifest['format_version']}] is newer than supported [{MODEL_ARTIFACT_FORMAT_VERSION}]")
+        if schema_file_path is not None and manifest['schema_hash'] is not None \
+                and get_file_hash(file_path=schema_file_path)!=manifest['schema_hash']:
+            raise Exception(f'Schema [{schema_file_path}] differs from the schema the model at [{dir_path}] was exported with')
+        if manifest['versions'].get('sklearn')!=sklearn.__version__:
+            logging.info(f"Model artifact [{dir_path}] was saved with sklearn [{manifest['versions'].get('sklearn')}], "
+                         f"loading with [{sklearn.__version__}]")
+
+        buffers=[]
+        if manifest['blob_bytes']>0:
+            blob=np.memmap(get_artifact_file_path(dir_path=dir_path,artifact_name=artifact_name,suffix=BLOB_SUFFIX),dtype=np.uint8,mode=mmap_mode,
+                           shape=(manifest['blob_bytes'],))
+            buffers=[blob[offset:offset+nbytes] for offset,nbytes in manifest['buffers']]
+
+        with open(get_artifact_file_path(dir_path=dir_path,artifact_name=artifact_name,suffix=PICKLE_SUFFIX),'rb') as pickle_file:
+            pickle_data=pickle_file.read()
+        return ModelArtifactUnpickler(io.BytesIO(pickle_data),buffers=buffers,class_aliases=class_aliases).load()
+    except Exception as e:
+        raise SalesException(e,sys) from e
@@ -0,0 +1,278 @@
+import os,sys
+import time
+import threading
+from collections import namedtuple
+from sales.exception import SalesException
+from sales.logger import logging
+from sales.util import load_object
+from sales.serving.compiled_model import COMPILED_MODEL_ARTIFACT_NAME,COMPILED_MODEL_FILE_NAME,compile_model,UnsupportedModelError
+from sales.serving.model_artifact import MODEL_MANIFEST_FILE_NAME,is_model_artifact,load_model_artifact
+import pandas as pd
+
+ModelVersion=namedtuple("ModelVersion",["version","model_file_path","model","compiled_model","loaded_at","warmup_seconds"])
+
+MAX_LOAD_ATTEMPTS=3
+
+
+class ModelNotLoadedError(Exception):
+    """
+    Raised when a prediction is requested before any model version is loaded.
+    The serving layer turns it into a 503 response.
+    """
+
+
+class NoPreviousVersionError(Exception):
+    """
+    Raised by rollback when there is no previous version to swap back in. The
+    serving layer turns it into a 409 response.
+    """
+
+
+class ModelRegistry:
+
+    def __init__(self,model_dir:str,model_file_name:str='model.pkl',poll_interval_s:float=10.0,
+                      warmup_file_path:str=None,warmup_rows:int=100,compiled_model_enabled:bool=True,
+                      model_mmap_mode:str='r',schema_file_path:str=None)->None:
+        """
+        Tracks the versions exported by ModelPusher under model_dir/<timestamp>/ and
+        serves the newest one. New versions are loaded and warmed on a background
+        thread and swapped in with a single reference assignment, so requests never
+        wait for a load. The previously active version stays in memory for rollback.
+        Versions exported with a model artifact manifest are loaded from its
+        memory-mapped blob (model_mmap_mode) and rejected when schema_file_path
+        differs from the schema they were exported with; older versions are unpickled.
+        """
+        try:
+            self.model_dir=model_dir
+            self.model_file_name=model_file_name
+            self.poll_interval_s=float(poll_interval_s)
+            self.warmup_file_path=warmup_file_path
+            self.warmup_rows=int(warmup_rows)
+            self.compiled_model_enabled=compiled_model_enabled
+            self.model_mmap_mode=model_mmap_mode
+            self.schema_file_path=schema_file_path
+
+            # (active,previous) is replaced as one tuple so readers always see a consistent pair
+            self.state=(None,None)
+            self.rejected_versions=set()
+            self.failed_attempts={}
+
+            self.lock=threading.Lock()
+            self.watcher=None
+            self.watcher_pid=None
+            self.warmup_data=None
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    @property
+    def active(self)->ModelVersion:
+        return self.state[0]
+
+    @property
+    def previous(self)->ModelVersion:
+        return self.state[1]
+
+    def get_model(self):
+        active=self.active
+        if active is None:
+            raise ModelNotLoadedError(f'No model version is loaded from [{self.model_dir}]')
+        return active.model
+
+    def get_predictor(self):
+        """
+        The compiled NumPy plan of the active version when there is one, else the
+        model itself. Both accept a DataFrame; the compiled plan also takes dicts.
+        """
+        active=self.active
+        if active is not None and active.compiled_model is not None:
+            return active.compiled_model
+        return self.get_model()
+
+    def get_compiled_model(self):
+        active=self.active
+        return active.compiled_model if active is not None else None
+
+    def list_versions(self)->list:
+        """
+        Version folders are the %Y%m%d%H%M%S timestamps written by ModelPusher,
+        oldest first. Folders without a model file yet are skipped.
+        """
+        try:
+            if not os.path.isdir(self.model_dir):
+                return []
+            versions=[]
+            for name in os.listdir(self.model_dir):
+                if name.isdigit() and self.get_model_file_path(version=name) is not None:
+                    versions.append(name)
+            return sorted(versions,key=int)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def get_model_file_path(self,version:str)->str:
+        version_dir=os.path.join(self.model_dir,version)
+        if not os.path.isdir(version_dir):
+            return None
+        if is_model_artifact(dir_path=version_dir):
+            return os.path.join(version_dir,MODEL_MANIFEST_FILE_NAME)
+        model_file_path=os.path.join(version_dir,self.model_file_name)
+        if os.path.exists(model_file_path):
+            return model_file_path
+        model_file_names=sorted([name for name in os.listdir(version_dir) if name.endswith('.pkl') and name!=COMPILED_MODEL_FILE_NAME])
+        if len(model_file_names)==0:
+            return None
+        return os.path.join(version_dir,model_file_names[0])
+
+    def get_warmup_data(self)->pd.DataFrame:
+        if self.warmup_file_path is None or not os.path.exists(self.warmup_file_path):
+            return None
+        if self.warmup_data is None:
+            self.warmup_data=pd.read_csv(self.warmup_file_path,nrows=self.warmup_rows)
+        return self.warmup_data
+
+    def load_version(self,version:str)->ModelVersion:
+        """
+        Loads a version and runs one predict over the warm-up sample so the first
+        real request does not pay for lazy initialisation.
+        """
+        try:
+            model_file_path=self.get_model_file_path(version=version)
+            logging.info(f'Loading model version [{version}] from [{model_file_path}]')
+            if os.path.basename(model_file_path)==MODEL_MANIFEST_FILE_NAME:
+                model=load_model_artifact(dir_path=os.path.dirname(model_file_path),mmap_mode=self.model_mmap_mode,
+                                          schema_file_path=self.schema_file_path)
+            else:
+                model=load_object(file_path=model_file_path)
+            compiled_model=self.load_compiled_model(version=version,model=model)
+
+            warmup_seconds=0.0
+            warmup_data=self.get_warmup_data()
+            if warmup_data is not None:
+                start=time.perf_counter()
+                model.predict(warmup_data)
+                if compiled_model is not None:
+                    compiled_model.predict(warmup_data)
+                warmup_seconds=time.perf_counter()-start
+                logging.info(f'Model version [{version}] warmed up on [{len(warmup_data)}] rows in [{warmup_seconds:.3f}]s')
+
+            return ModelVersion(version=version,
+                                model_file_path=model_file_path,
+                                model=model,
+                                compiled_model=compiled_model,
+                                loaded_at=time.time(),
+                                warmup_seconds=warmup_seconds)
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def load_compiled_model(self,version:str,model):
+        """
+        Uses the plan exported by ModelPusher when present, otherwise compiles the
+        loaded model. Returns None when the model has no compiled form.
+        An exported plan is memory-mapped (model_mmap_mode), so every worker serving
+        this version shares its arrays; sklearn copies a forest's node arrays when
+        it unpickles the model, the plan's arrays are used in place.
+        """
+        if not self.compiled_model_enabled:
+            return None
+        version_dir=os.path.join(self.model_dir,version)
+        compiled_model_file_path=os.path.join(version_dir,COMPILED_MODEL_FILE_NAME)
+        try:
+            if is_model_artifact(dir_path=version_dir,artifact_name=COMPILED_MODEL_ARTIFACT_NAME):
+                return load_model_artifact(dir_path=version_dir,mmap_mode=self.model_mmap_mode,
+                                           artifact_name=COMPILED_MODEL_ARTIFACT_NAME)
+            if os.path.exists(compiled_model_file_path):
+                return load_object(file_path=compiled_model_file_path)
+            return compile_model(model=model)
+        except UnsupportedModelError as e:
+            logging.info(f'Model version [{version}] is served without a compiled plan: {e}')
+            return None
+
+    def activate(self,model_version:ModelVersion):
+        with self.lock:
+            active=self.active
+            self.state=(model_version,active)
+        logging.info(f'Activated model version [{model_version.version}], previous version [{active.version if active else None}]')
+
+    def refresh(self)->bool:
+        """
+        Loads and activates the newest version if it is newer than the active one.
+        Returns True when a new version was activated.
+        """
+        try:
+            active=self.active
+            candidates=[version for version in self.list_versions() if version not in self.rejected_versions]
+            if active is not None:
+                candidates=[version for version in candidates if int(version)>int(active.version)]
+            if len(candidates)==0:
+                return False
+
+            version=candidates[-1]
+            try:
+                model_version=self.load_version(version=version)
+            except Exception as e:
+                attempts=self.failed_attempts.get(version,0)+1
+                self.failed_attempts[version]=attempts
+                logging.info(f'Loading model version [{version}] failed, attempt [{attempts}]: {e}')
+                if attempts>=MAX_LOAD_ATTEMPTS:
+                    self.rejected_versions.add(version)
+                    logging.info(f'Model version [{version}] rejected after [{attempts}] attempts')
+                return False
+
+            self.activate(model_version=model_version)
+            return True
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def rollback(self)->ModelVersion:
+        """
+        Swaps the previous version back in. The rolled back version is not picked
+        up again by the watcher; only a newer export replaces the rollback.
+        """
+        try:
+            with self.lock:
+                active,previous=self.state
+                if previous is None:
+                    raise NoPreviousVersionError('No previous model version is available for rollback')
+                self.state=(previous,None)
+                self.rejected_versions.add(active.version)
+            logging.info(f'Rolled back model version [{active.version}] to [{previous.version}]')
+            return previous
+        except NoPreviousVersionError:
+            raise
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def watch(self):
+        while True:
+            time.sleep(self.poll_interval_s)
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.info(f'Model registry refresh failed: {e}')
+
+    def start_watcher(self):
+        """
+        Starts the polling thread once per process. Threads do not survive fork,
+        so every pre-forked worker starts its own on first use.
+        """
+        if self.watcher is not None and self.watcher_pid==os.getpid() and self.watcher.is_alive():
+            return
+        with self.lock:
+            if self.watcher is not None and self.watcher_pid==os.getpid() and self.watcher.is_alive():
+                return
+            self.watcher=threading.Thread(target=self.watch,name='model-registry',daemon=True)
+            self.watcher_pid=os.getpid()
+            self.watcher.start()
+            logging.info(f'Model registry watching [{self.model_dir}] every [{self.poll_interval_s}]s')
+
+    def status(self)->dict:
+        active,previous=self.state
+        return {
+            'active_version':active.version if active else None,
+            'active_model':str(active.model) if active else None,
+            'compiled':active.compiled_model is not None if active else None,
+            'active_model_file_path':active.model_file_path if active else None,
+            'loaded_at':active.loaded_at if active else None,
+            'warmup_seconds':active.warmup_seconds if active else None,
+            'previous_version':previous.version if previous else None,
+            'rejected_versions':sorted(self.rejected_versions,key=int),
+        }
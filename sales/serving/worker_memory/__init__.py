@@ -0,0 +1,103 @@
+import os,sys
+import gc
+from collections import namedtuple
+from sales.exception import SalesException
+from sales.logger import logging
+
+WorkerMemory=namedtuple("WorkerMemory",
+["pid","role","rss_bytes","pss_bytes","shared_bytes","private_bytes","anonymous_bytes"])
+
+SMAPS_FIELDS=['Rss','Pss','Shared_Clean','Shared_Dirty','Private_Clean','Private_Dirty','Anonymous','Swap']
+
+
+def read_smaps_rollup(pid:int)->dict:
+    """
+    Memory totals of a process from /proc/<pid>/smaps_rollup (Linux 4.14+), in bytes.
+    """
+    try:
+        memory={}
+        with open(f'/proc/{pid}/smaps_rollup') as smaps_file:
+            for line in smaps_file:
+                fields=line.split()
+                name=fields[0].rstrip(':')
+                if name in SMAPS_FIELDS:
+                    memory[name]=int(fields[1])*1024
+        return memory
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def get_worker_memory(pid:int,role:str='worker')->WorkerMemory:
+    """
+    shared: pages also mapped by another process, i.e. inherited from the master
+    and not written to since the fork, or page cache of a shared file mapping.
+    private: pages only this process maps; the extra memory the process costs.
+    """
+    try:
+        memory=read_smaps_rollup(pid=pid)
+        return WorkerMemory(pid=pid,
+                            role=role,
+                            rss_bytes=memory.get('Rss',0),
+                            pss_bytes=memory.get('Pss',0),
+                            shared_bytes=memory.get('Shared_Clean',0)+memory.get('Shared_Dirty',0),
+                            private_bytes=memory.get('Private_Clean',0)+memory.get('Private_Dirty',0),
+                            anonymous_bytes=memory.get('Anonymous',0))
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def get_child_pids(pid:int)->list:
+    try:
+        child_pids=[]
+        task_dir=f'/proc/{pid}/task'
+        for task in os.listdir(task_dir):
+            with open(os.path.join(task_dir,task,'children')) as children_file:
+                child_pids.extend(int(child_pid) for child_pid in children_file.read().split())
+        return sorted(child_pids)
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def get_memory_report(master_pid:int,worker_pids:list=None)->list:
+    """
+    WorkerMemory of the master and of each worker; workers default to the
+    children of the master. Workers that exit while being read are left out.
+    """
+    try:
+        report=[get_worker_memory(pid=master_pid,role='master')]
+        for pid in (worker_pids if worker_pids is not None else get_child_pids(pid=master_pid)):
+            try:
+                report.append(get_worker_memory(pid=pid,role='worker'))
+            except SalesException:
+                continue
+        return report
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+
+def format_memory_report(report:list)->str:
+    header=f"{'role':>7} {'pid':>8} {'rss MB':>9} {'pss MB':>9} {'shared MB':>10} {'private MB':>11}"
+    rows=[f'{memory.role:>7} {memory.pid:>8} {memory.rss_bytes/2**20:>9.1f} {memory.pss_bytes/2**20:>9.1f} '
+          f'{memory.shared_bytes/2**20:>10.1f} {memory.private_bytes/2**20:>11.1f}' for memory in report]
+    workers=[memory for memory in report if memory.role=='worker']
+    if len(workers)>0:
+        rows.append(f'{len(workers)} workers: [{sum(memory.private_bytes for memory in workers)/2**20:.1f}] MB private, '
+                    f'total PSS [{sum(memory.pss_bytes for memory in report)/2**20:.1f}] MB')
+    return '\n'.join([header]+rows)
+
+
+def freeze_heap()->int:
+    """
+    Moves every object tracked by the garbage collector to the permanent
+    generation, so collections in forked workers never write to the inherited
+    objects' GC headers and their pages stay shared.
+    return: number of frozen objects
+    """
+    try:
+        gc.collect()
+        gc.freeze()
+        frozen_objects=gc.get_freeze_count()
+        logging.info(f'Frozen [{frozen_objects}] objects before fork in process [{os.getpid()}]')
+        return frozen_objects
+    except Exception as e:
+        raise SalesException(e,sys) from e
@@ -4,8 +4,13 @@ import os,sys
 import pandas as pd
 from sales.constant import *
 import dill
+import zipfile
+import importlib.util
 import numpy as np
+from scipy import sparse
 
+DATA_FORMATS={'csv':'.csv','parquet':'.parquet','feather':'.feather'}
+COLUMNAR_DATA_FORMATS=['parquet','feather']
 
 
 def save_object(file_path:str,obj):
@@ -24,19 +29,189 @@ def load_object(file_path:str):
     except Exception as e:
         raise SalesException(e,sys) from e        
 
-def save_numpy_array_data(file_path:str,array:np.array):
+def get_numpy_array_file_name(file_name:str,array)->str:
+    """
+    file_name with the extension save_numpy_array_data uses for array:
+    .npz for a sparse matrix, .npy otherwise.
+    """
+    return f"{os.path.splitext(file_name)[0]}{'.npz' if sparse.issparse(array) else '.npy'}"
+
+def save_numpy_array_data(file_path:str,array:np.array,order:str='C'):
+    """
+    Dense arrays are written with np.save so they can be loaded memory-mapped;
+    sparse matrices are written uncompressed with scipy.sparse.save_npz.
+    order: 'C' or 'F', the memory layout of a dense array in the file and of
+    its memory-mapped view
+    """
     try:
         dir_path=os.path.dirname(file_path)
         os.makedirs(dir_path,exist_ok=True)
+        if sparse.issparse(array):
+            sparse.save_npz(file_path,array.tocsr(),compressed=False)
+            return
+        array=np.asfortranarray(array) if order=='F' else np.ascontiguousarray(array)
         with open(file_path,'wb') as file_obj:
             np.save(file_obj,array)
     except Exception as e:
         raise SalesException(e,sys) from e        
 
-def load_numpy_array_data(file_path:str)->np.array:
+def load_numpy_array_data(file_path:str,mmap_mode:str=None)->np.array:
+    """
+    mmap_mode: passed to np.load for dense arrays ('r' maps the file read-only
+    instead of reading it into memory). Sparse .npz files are always read.
+    Older artifacts named .npz but written with np.save load as dense arrays.
+    """
     try:
-        with open(file_path,'rb') as file_obj:
-            return np.load(file_obj)
+        if zipfile.is_zipfile(file_path):
+            return sparse.load_npz(file_path)
+        return np.load(file_path,mmap_mode=mmap_mode)
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+def split_features_target(array)->tuple:
+    """
+    Splits a transformed array whose last column is the target.
+    return: (features, 1-d dense target)
+    """
+    try:
+        if sparse.issparse(array):
+            array=array.tocsc()
+            return array[:,:-1].tocsr(),array[:,-1].toarray().ravel()
+        return array[:,:-1],array[:,-1]
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+def stack_rows(parts:list):
+    """
+    Rows of DataFrames, sparse matrices or dense arrays stacked into one, so a
+    model can predict on several datasets in one call.
+    """
+    try:
+        if isinstance(parts[0],pd.DataFrame):
+            return pd.concat(parts,ignore_index=True)
+        if any(sparse.issparse(part) for part in parts):
+            return sparse.vstack(parts,format='csr')
+        return np.concatenate(parts,axis=0)
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+def get_peak_rss_bytes()->int:
+    """
+    High-water mark of the resident set size of this process, None where the
+    platform does not report it. On Linux it can be reset with reset_peak_rss.
+    """
+    try:
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])*1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak_rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak_rss if sys.platform=='darwin' else peak_rss*1024
+    except ImportError:
+        return None
+
+def reset_peak_rss()->bool:
+    """
+    Resets the peak RSS to the current RSS (Linux only), so get_peak_rss_bytes
+    measures one stage instead of the whole process.
+    """
+    try:
+        with open('/proc/self/clear_refs','w') as clear_refs_file:
+            clear_refs_file.write('5')
+        return True
+    except OSError:
+        return False
+
+def is_data_format_available(data_format:str)->bool:
+    """
+    Parquet and Feather need pyarrow, which is an optional dependency.
+    """
+    if data_format not in DATA_FORMATS:
+        return False
+    return data_format not in COLUMNAR_DATA_FORMATS or importlib.util.find_spec('pyarrow') is not None
+
+def get_data_format(file_path:str)->str:
+    try:
+        extension=os.path.splitext(file_path)[1].lower()
+        for data_format,data_format_extension in DATA_FORMATS.items():
+            if extension==data_format_extension:
+                return data_format
+        raise Exception(f'Unsupported data file [{file_path}], expected one of {list(DATA_FORMATS.values())}')
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+def get_data_file_paths(file_path:str)->list:
+    """
+    Data files of a path: the file itself, or for a partitioned dataset (a
+    directory) its csv/Parquet/Feather files in name order.
+    """
+    try:
+        if not os.path.isdir(file_path):
+            return [file_path]
+        file_paths=[os.path.join(file_path,file_name) for file_name in sorted(os.listdir(file_path))
+                    if os.path.splitext(file_name)[1].lower() in DATA_FORMATS.values()]
+        if len(file_paths)==0:
+            raise Exception(f'No data files in [{file_path}]')
+        return file_paths
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+def get_data_columns(file_path:str)->list:
+    """
+    Column names of a data file (or of the first file of a partitioned dataset),
+    read from the csv header or the Parquet/Feather schema without loading any rows.
+    """
+    try:
+        file_path=get_data_file_paths(file_path=file_path)[0]
+        data_format=get_data_format(file_path=file_path)
+        if data_format=='parquet':
+            import pyarrow.parquet
+            return pyarrow.parquet.read_schema(file_path).names
+        if data_format=='feather':
+            import pyarrow.ipc
+            with pyarrow.ipc.open_file(file_path) as reader:
+                return reader.schema.names
+        return pd.read_csv(file_path,nrows=0).columns.to_list()
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+def read_data_file(file_path:str,columns:list=None,dtype:dict=None)->pd.DataFrame:
+    """
+    Reads a csv, Parquet or Feather file. columns: only these columns are read
+    (column projection), dtype: {column: dtype} applied while reading csv and
+    after reading the columnar formats.
+    A directory is read as a partitioned dataset, its files concatenated.
+    Raises ValueError, like pandas, when a column cannot take its dtype.
+    """
+    if os.path.isdir(file_path):
+        return pd.concat([read_data_file(file_path=partition_file_path,columns=columns,dtype=dtype)
+                          for partition_file_path in get_data_file_paths(file_path=file_path)],ignore_index=True)
+    data_format=get_data_format(file_path=file_path)
+    if data_format=='csv':
+        return pd.read_csv(file_path,usecols=columns,dtype=dtype)
+    if data_format=='parquet':
+        data=pd.read_parquet(file_path,columns=columns)
+    else:
+        data=pd.read_feather(file_path,columns=columns)
+    if dtype:
+        data=data.astype({col:value for col,value in dtype.items() if col in data.columns})
+    return data
+
+def write_data_file(data:pd.DataFrame,file_path:str):
+    try:
+        os.makedirs(os.path.dirname(file_path),exist_ok=True)
+        data_format=get_data_format(file_path=file_path)
+        if data_format=='parquet':
+            data.to_parquet(file_path,index=False)
+        elif data_format=='feather':
+            data.reset_index(drop=True).to_feather(file_path)
+        else:
+            data.to_csv(file_path,index=False)
     except Exception as e:
         raise SalesException(e,sys) from e
 
@@ -60,24 +235,145 @@ def write_yaml_file(file_path:str,data:dict=None):
     except Exception as e:
         raise SalesException(e,sys) from e          
 
-def load_data(file_path:str,schema_file_path:str)->pd.DataFrame:
-    try:
-        schema_data=read_yaml_file(file_path=schema_file_path)
-        schema=schema_data[COLUMNS]
+class InvalidInputError(Exception):
+    """
+    Raised when input records do not match the schema. The serving layer turns it
+    into a 400 response instead of a server error.
+    """
+
 
-        df=pd.read_csv(file_path)
+class InputSchema:
 
+    def __init__(self,schema_file_path:str)->None:
+        """
+        Parsed form of schema.yaml used to validate and cast input data.
+        The dtype map and column order are computed once so casting a record or a
+        whole batch is a single astype call.
+        """
+        try:
+            self.schema_file_path=schema_file_path
+            self.mtime=os.path.getmtime(schema_file_path)
+            self.schema:dict=read_yaml_file(file_path=schema_file_path)
+
+            self.dtype_map:dict=dict(self.schema[COLUMNS])
+            self.columns:list=list(self.dtype_map.keys())
+            self.target_column:str=self.schema[TARGET_COLUMNS]
+            self.feature_columns:list=[col for col in self.columns if col!=self.target_column]
+            self.feature_dtype_map:dict={col:self.dtype_map[col] for col in self.feature_columns}
+        except Exception as e:
+            raise SalesException(e,sys) from e
+
+    def validate_columns(self,columns:list,require_features:bool=True):
+        """
+        Raises InvalidInputError for columns that are not in the schema and, when
+        require_features is set, for missing feature columns.
+        """
         error_message=""
-        for col in df.columns.to_list():
-            if col in list(schema.keys()):
-                df[col].astype(schema.get(col))
-            else:
-                error_message=f"{error_message} \nColumn:[{col}] is not present in the schema"
+        unknown_columns=[col for col in columns if col not in self.dtype_map]
+        if len(unknown_columns)>0:
+            error_message=f"{error_message} Columns not present in the schema:{unknown_columns}."
+        if require_features:
+            missing_columns=[col for col in self.feature_columns if col not in columns]
+            if len(missing_columns)>0:
+                error_message=f"{error_message} Missing columns:{missing_columns}."
         if len(error_message)>0:
-            raise Exception(error_message)
-        return df    
+            raise InvalidInputError(error_message.strip())
+
+    def cast(self,data:pd.DataFrame,features_only:bool=True)->pd.DataFrame:
+        """
+        Casts every schema column present in data with one astype call, in schema
+        column order. Missing values (None from JSON, NaN from CSV) become NaN.
+        """
+        columns=self.feature_columns if features_only else self.columns
+        columns=[col for col in columns if col in data.columns]
+        try:
+            return data[columns].astype({col:self.dtype_map[col] for col in columns}).fillna(value=np.nan)
+        except (ValueError,TypeError) as e:
+            raise InvalidInputError(f'Input does not match the schema dtypes: {e}') from e
+
+    def to_frame(self,records)->pd.DataFrame:
+        """
+        Builds a validated, cast feature frame from one record (dict) or a list of records.
+        """
+        if isinstance(records,dict):
+            records=[records]
+        data=pd.DataFrame.from_records(records)
+        self.validate_columns(columns=data.columns.to_list())
+        return self.cast(data=data)
 
+
+_INPUT_SCHEMA_CACHE={}
+
+def get_input_schema(schema_file_path:str)->InputSchema:
+    """
+    Returns the shared InputSchema for a schema file, parsing the YAML only at the
+    first call and again when the file modification time changes.
+    """
+    try:
+        input_schema=_INPUT_SCHEMA_CACHE.get(schema_file_path)
+        if input_schema is None or input_schema.mtime!=os.path.getmtime(schema_file_path):
+            input_schema=InputSchema(schema_file_path=schema_file_path)
+            _INPUT_SCHEMA_CACHE[schema_file_path]=input_schema
+        return input_schema
     except Exception as e:
         raise SalesException(e,sys) from e
 
+def load_data(file_path:str,schema_file_path:str,columns:list=None)->pd.DataFrame:
+    """
+    Reads a csv, Parquet or Feather data file and casts it to the schema dtypes.
+    columns: read only these columns; by default the file must hold only schema columns.
+    """
+    try:
+        input_schema=get_input_schema(schema_file_path=schema_file_path)
+
+        df=read_data_file(file_path=file_path,columns=columns)
 
+        try:
+            input_schema.validate_columns(columns=df.columns.to_list(),require_features=False)
+        except InvalidInputError as e:
+            raise Exception(str(e)) from e
+        return input_schema.cast(data=df,features_only=False)
+
+    except Exception as e:
+        raise SalesException(e,sys) from e
+
+def iter_data(file_path:str,schema_file_path:str,chunk_size:int=100000,columns:list=None,use_schema_dtypes:bool=True):
+    """
+    Yields the data file (or every file of a partitioned dataset) in DataFrames
+    of at most chunk_size rows, so only one chunk is in memory at a time (Parquet
+    is read by record batch, Feather is memory-mapped). Like load_data the file must only hold schema columns,
+    unless columns is given: then just those columns are read and the rest is
+    skipped. Columns are parsed with the schema dtypes unless use_schema_dtypes is False.
+    """
+    try:
+        input_schema=get_input_schema(schema_file_path=schema_file_path)
+
+        file_columns=get_data_columns(file_path=file_path)
+        if columns is None:
+            try:
+                input_schema.validate_columns(columns=file_columns,require_features=False)
+            except InvalidInputError as e:
+                raise Exception(str(e)) from e
+
+        usecols=[col for col in file_columns if columns is None or (col in columns and col in input_schema.dtype_map)]
+        dtype={col:input_schema.dtype_map[col] for col in usecols} if use_schema_dtypes else None
+        for partition_file_path in get_data_file_paths(file_path=file_path):
+            data_format=get_data_format(file_path=partition_file_path)
+            if data_format=='parquet':
+                import pyarrow.parquet
+                for batch in pyarrow.parquet.ParquetFile(partition_file_path).iter_batches(batch_size=chunk_size,columns=usecols):
+                    chunk=batch.to_pandas()
+                    yield chunk.astype(dtype) if dtype else chunk
+            elif data_format=='feather':
+                import pyarrow.ipc
+                with pyarrow.memory_map(partition_file_path) as source:
+                    table=pyarrow.ipc.open_file(source).read_all().select(usecols)
+                    for start in range(0,table.num_rows,chunk_size):
+                        chunk=table.slice(start,chunk_size).to_pandas()
+                        yield chunk.astype(dtype) if dtype else chunk
+            else:
+                with pd.read_csv(partition_file_path,usecols=usecols,dtype=dtype,chunksize=chunk_size) as reader:
+                    for chunk in reader:
+                        yield chunk
+    except Exception as e:
+        raise SalesException(e,sys) from e